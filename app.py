@@ -1,15 +1,28 @@
 import streamlit as st
 import hmac
 import pandas as pd
-import io
-import unicodedata
-from collections import defaultdict
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import landscape, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.colors import HexColor
-from ortools.sat.python import cp_model
+from horario import (
+    CODIFICACOES_JANELA,
+    FORMULACOES,
+    OBJETIVOS,
+    PERFIS,
+    ErroPlanilha,
+    QuadroHorario,
+    assinatura_horario,
+    calcular_capacidade,
+    construir_modelo,
+    diagnosticar,
+    gerar_json,
+    gerar_modelo_exemplo,
+    gerar_pdf_bytes,
+    ler_json,
+    parametros_perfil,
+    tabela_turma,
+    verificacoes_rapidas,
+)
+from horario import carregar_agrupamentos_em_cache as ler_agrupamentos
+from horario import carregar_dados_em_cache as ler_planilha
+from horario.jobs import EXECUTANDO, PENDENTE, GerenciadorJobs
 
 def aplicar_estilo_visual():
     st.markdown("""
@@ -145,62 +158,6 @@ elif menu_opcao == "❓ Ajuda":
     """)
 
 
-# ==========================================
-#  FUNÇÕES AUXILIARES
-# ==========================================
-def normalizar_texto(texto):
-    if not isinstance(texto, str):
-        texto = str(texto)
-    return unicodedata.normalize('NFKD', texto).encode('ASCII', 'ignore').decode('ASCII').strip().lower()
-
-def gerar_modelo_exemplo():
-    output = io.BytesIO()
-    
-    dados_turmas = {
-        'Turma': ['1º Ano - Fundamental B', '6º Ano - Fundamental', '3º Médio'],
-        'Aulas_Semanais': [25, 25, 30] 
-    }
-    df_t = pd.DataFrame(dados_turmas)
-    
-    dados_grade = {
-        'Professor': [
-            'Prof. Márcia', 'Prof. Beto ', 'Prof. Carla ',
-            'Prof. Ana ', 'Prof. Carlos', 'Prof. Beatriz ',
-            'Prof. João ', 'Prof. Ana '
-        ],
-        'Materia': [
-            'Geografia', 'Ed. Física', 'Artes',
-            'Matemática', 'História', 'Português',
-            'Física', 'Matemática'
-        ],
-        'Turmas_Alvo': [
-            '1º Ano - Fundamental B', '1º Ano - Fundamental B', '1º Ano - Fundamental B',
-            '1º Ano - Fundamental B, 3º Médio', '6º Ano - Fundamental', '6º Ano - Fundamental',
-            '3º Médio', '3º Médio'
-        ],
-        'Aulas_Por_Turma': [
-            21, 2, 2, 
-            5, 3, 4,
-            4, 5
-        ],
-        'Indisponibilidade': [
-            '', '', 'sex',
-            '', 'seg:1, seg:2', '',
-            'ter:5', ''
-        ]
-    }
-    df_g = pd.DataFrame(dados_grade)
-    
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df_t.to_excel(writer, sheet_name='Turmas', index=False)
-        df_g.to_excel(writer, sheet_name='Grade_Curricular', index=False)
-        workbook = writer.book
-        worksheet = writer.sheets['Grade_Curricular']
-        worksheet.set_column('A:A', 25) 
-        worksheet.set_column('C:C', 20) 
-        
-    return output.getvalue()
-
 # ==========================================
 # SISTEMA DE LOGIN (Versão Robusta)
 # ==========================================
@@ -252,83 +209,23 @@ def login_system():
 # ==========================================
 # LÓGICA DE DADOS
 # ==========================================
-@st.cache_data(ttl=3600, show_spinner="Lendo arquivo e sanitizando dados...")
 def carregar_dados(arquivo_upload):
+    # O cache em disco (pelo SHA-256 do arquivo) vale para todas as sessões
+    # e processos; só planilhas nunca vistas passam pelo openpyxl
     try:
-        df_turmas = pd.read_excel(arquivo_upload, sheet_name='Turmas')
-        df_grade = pd.read_excel(arquivo_upload, sheet_name='Grade_Curricular')
-        
-        cols_obrigatorias_grade = {'Professor', 'Materia', 'Turmas_Alvo', 'Aulas_Por_Turma'}
-        if not cols_obrigatorias_grade.issubset(df_grade.columns):
-            st.error(f"Erro: A planilha Grade_Curricular deve conter as colunas: {cols_obrigatorias_grade}")
-            return None, None, None, {}
-
-    except Exception as e:
-        st.error(f"Erro ao ler Excel: {e}")
+        with st.spinner("Lendo arquivo e sanitizando dados..."):
+            return ler_planilha(arquivo_upload)
+    except ErroPlanilha as e:
+        st.error(str(e))
         return None, None, None, {}
 
-    turmas_totais = {}
-    for _, row in df_turmas.iterrows():
-        t = str(row['Turma']).strip()
-        turmas_totais[t] = int(row['Aulas_Semanais'])
-
-    grade_aulas = []
-    dias_semana = ['Seg', 'Ter', 'Qua', 'Qui', 'Sex']
-    bloqueios_globais = {} 
-    mapa_dias = {
-        'seg': 'Seg', 'ter': 'Ter', 'qua': 'Qua', 'qui': 'Qui', 'sex': 'Sex',
-        'mon': 'Seg', 'tue': 'Ter', 'wed': 'Qua', 'thu': 'Qui', 'fri': 'Sex'
-    }
-
-    agrupamento_temp = {}
-
-    for _, row in df_grade.iterrows():
-        prof_raw = str(row['Professor'])
-        prof = prof_raw.lower().replace('prof.', '').replace('profª', '').replace('profa', '').strip().title()
-        materia = str(row['Materia']).strip()
-        
-        try: aulas = int(row['Aulas_Por_Turma'])
-        except: aulas = 0
-            
-        turmas_alvo = str(row['Turmas_Alvo']).split(',')
-            
-        if prof not in bloqueios_globais:
-            bloqueios_globais[prof] = set()
-
-        indisp = str(row['Indisponibilidade'])
-        if pd.notna(row['Indisponibilidade']) and str(row['Indisponibilidade']).strip() != '':
-            indisp_limpa = indisp.replace(';', ',').lower().replace(' ', '')
-            partes = indisp_limpa.split(',')
-            for p in partes:
-                if ':' in p: 
-                    try:
-                        dia_sujo, aula_str = p.split(':')
-                        chave_dia = dia_sujo[:3] 
-                        if chave_dia in mapa_dias:
-                            dia_oficial = mapa_dias[chave_dia]
-                            d_idx = dias_semana.index(dia_oficial)
-                            a_idx = int(aula_str) - 1
-                            bloqueios_globais[prof].add((d_idx, a_idx))
-                    except: pass
-                else: 
-                    chave_dia = p[:3]
-                    if chave_dia in mapa_dias:
-                        dia_oficial = mapa_dias[chave_dia]
-                        d_idx = dias_semana.index(dia_oficial)
-                        for i in range(10): bloqueios_globais[prof].add((d_idx, i))
-
-        for t_raw in turmas_alvo:
-            turma = t_raw.strip()
-            if turma in turmas_totais:
-                chave_unica = (prof, materia, turma)
-                if chave_unica not in agrupamento_temp:
-                    agrupamento_temp[chave_unica] = 0
-                agrupamento_temp[chave_unica] += aulas
-
-    for (prof, materia, turma), qtd in agrupamento_temp.items():
-        grade_aulas.append({'prof': prof, 'materia': materia, 'turma': turma, 'qtd': qtd})
-    
-    return turmas_totais, grade_aulas, dias_semana, bloqueios_globais
+def carregar_agrupamentos(arquivo_upload):
+    # Aba opcional Agrupamentos, pelo mesmo cache em disco
+    try:
+        return ler_agrupamentos(arquivo_upload)
+    except ErroPlanilha as e:
+        st.error(str(e))
+        return []
 
 # --- Função Auxiliar de Estilo (Nova) ---
 def estilizar_tabela_capacidade(df_logs):
@@ -355,48 +252,25 @@ def estilizar_tabela_capacidade(df_logs):
     )
 
 # --- Sua Função Atualizada ---
-def verificar_capacidade(grade_aulas, bloqueios_globais):
+def verificar_capacidade(turmas_totais, grade_aulas, dias_semana, bloqueios_globais):
     st.subheader("📊 Análise de Capacidade")
-    
-    carga_prof = {}
-    for item in grade_aulas:
-        p = item['prof']
-        if p not in carga_prof: carga_prof[p] = 0
-        carga_prof[p] += item['qtd']
-
-    erros_fatais = False
-    max_slots_semana = 30 
-    logs = []
-    
-    for prof, carga_total in carga_prof.items():
-        bloqueios = 0
-        if prof in bloqueios_globais:
-            bloqueios_uteis = 0
-            for (d, a) in bloqueios_globais[prof]:
-                if a < 6: bloqueios_uteis += 1
-            bloqueios = bloqueios_uteis
-
-        disponivel = max_slots_semana - bloqueios
-        saldo = disponivel - carga_total
-        status = "✅ OK"
-        
-        if saldo < 0:
-            status = "❌ CRÍTICO"
-            erros_fatais = True
-        elif saldo < 2:
-            status = "⚠️ Apertado"
-            
-        logs.append([prof, carga_total, disponivel, saldo, status])
 
-    df_logs = pd.DataFrame(logs, columns=["Professor", "Carga", "Livre", "Saldo", "Status"])
-    
+    df_logs, capacidade_ok = calcular_capacidade(grade_aulas, bloqueios_globais)
+    erros_fatais = not capacidade_ok
+
     # -------------------------------------------------------
     # AQUI ESTÁ A MUDANÇA VISUAL
     # Substituímos o st.dataframe simples pela função estilizada
     # -------------------------------------------------------
     estilizar_tabela_capacidade(df_logs)
 
-    if erros_fatais:
+    # Contas rápidas que já provam que a grade não cabe, sem montar o modelo
+    problemas = verificacoes_rapidas(turmas_totais, grade_aulas, dias_semana, bloqueios_globais)
+    if problemas:
+        st.error("A grade é impossível de cumprir. O cálculo não será iniciado:")
+        st.dataframe(pd.DataFrame(problemas), use_container_width=True, hide_index=True)
+        erros_fatais = True
+    elif erros_fatais:
         st.error("Existem professores com SALDO NEGATIVO. O cálculo não será iniciado.")
     else:
         st.success("Capacidade dos professores parece OK.")
@@ -406,71 +280,6 @@ def verificar_capacidade(grade_aulas, bloqueios_globais):
 # ==========================================
 # RELATÓRIOS E VISUALIZAÇÃO
 # ==========================================
-def gerar_pdf_bytes(turmas_totais, grade_aulas, dias_semana, vars_resolvidas):
-    # vars_resolvidas é um dict com os valores True/False já extraídos
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4))
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    estilo_tabela = TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), HexColor('#2c3e50')), 
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('GRID', (0, 0), (-1, -1), 0.5, HexColor('#d3d3d3')),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, HexColor('#f0f0f0')]),
-    ])
-
-    lista_turmas = sorted(turmas_totais.keys())
-    for turma in lista_turmas:
-        elements.append(Paragraph(f"Horário: {turma}", styles['Title']))
-        elements.append(Spacer(1, 10))
-        dados = [['Horário'] + dias_semana]
-        aulas_por_dia = turmas_totais[turma] // 5
-        linha_intervalo_idx = -1 
-
-        for aula in range(aulas_por_dia):
-            if aula == 3:
-                dados.append(["INTERVALO", "", "", "", "", ""]) 
-                linha_intervalo_idx = len(dados) - 1
-
-            linha = [f"{aula + 1}ª Aula"]
-            for d in range(len(dias_semana)):
-                conteudo = "---"
-                for item in grade_aulas:
-                    if item['turma'] == turma:
-                        prof = item['prof']
-                        materia = item['materia']
-                        # Verifica se está no dicionário de resolvidos
-                        chave_var = (item['turma'], d, aula, prof, materia)
-                        if chave_var in vars_resolvidas and vars_resolvidas[chave_var] == 1:
-                            conteudo = f"{materia}\n({prof})"
-                            break 
-                linha.append(conteudo)
-            dados.append(linha)
-            
-        t = Table(dados, colWidths=[60] + [140]*5)
-        t.setStyle(estilo_tabela)
-        if linha_intervalo_idx != -1:
-            estilo_intervalo = TableStyle([
-                ('BACKGROUND', (0, linha_intervalo_idx), (-1, linha_intervalo_idx), HexColor('#95a5a6')), 
-                ('TEXTCOLOR', (0, linha_intervalo_idx), (-1, linha_intervalo_idx), colors.white),
-                ('SPAN', (0, linha_intervalo_idx), (-1, linha_intervalo_idx)), 
-                ('FONTNAME', (0, linha_intervalo_idx), (-1, linha_intervalo_idx), 'Helvetica-Bold'),
-                ('ALIGN', (0, linha_intervalo_idx), (-1, linha_intervalo_idx), 'CENTER'),
-            ])
-            t.setStyle(estilo_intervalo)
-        elements.append(t)
-        elements.append(Spacer(1, 25))
-        elements.append(PageBreak())
-
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
-
 def exibir_detalhes_custo(detalhes_penalidades):
     st.markdown("---")
     st.subheader("💰 Auditoria do Custo")
@@ -484,428 +293,171 @@ def exibir_detalhes_custo(detalhes_penalidades):
     df = pd.DataFrame(detalhes_penalidades)
     st.dataframe(df, use_container_width=True)
 
-def exibir_estatisticas(grade_aulas, dias_semana, vars_resolvidas):
-    st.markdown("---")
-    st.subheader("📅 Distribuição de Aulas por Professor (Dia a Dia)")
-    professores = sorted(list(set(item['prof'] for item in grade_aulas)))
-    contagem = {prof: [0]*len(dias_semana) for prof in professores}
-    
-    for chave, valor in vars_resolvidas.items():
-        if valor == 1:
-            prof = chave[3]
-            dia_idx = chave[1]
-            contagem[prof][dia_idx] += 1
+# --- Saídas do horário em cache ---
+# Chaveadas pela assinatura do horário (assinatura_horario); os argumentos
+# com "_" não entram no hash do Streamlit. Cada rerun (qualquer clique)
+# reaproveita as tabelas e o PDF só é gerado quando o download é pedido.
+MAX_HORARIOS_EM_CACHE = 8
+
+@st.cache_data(max_entries=MAX_HORARIOS_EM_CACHE, show_spinner=False)
+def tabela_estatisticas(assinatura, _grade_aulas, _dias_semana, _quadro):
+    professores = sorted(list(set(item['prof'] for item in _grade_aulas)))
 
     dados_tabela = []
     for prof in professores:
         linha = {'Professor': prof}
         total = 0
-        for i, dia in enumerate(dias_semana):
-            qtd = contagem[prof][i]
+        contagem = _quadro.aulas_prof_por_dia(prof, len(_dias_semana))
+        for i, dia in enumerate(_dias_semana):
+            qtd = contagem[i]
             linha[dia] = qtd
             total += qtd
         linha['TOTAL'] = total
         dados_tabela.append(linha)
-        
-    df_stats = pd.DataFrame(dados_tabela)
+    return pd.DataFrame(dados_tabela)
+
+@st.cache_data(max_entries=MAX_HORARIOS_EM_CACHE, show_spinner=False)
+def tabelas_turmas(assinatura, _turmas_totais, _grade_aulas, _dias_semana, _quadro):
+    return {
+        turma: tabela_turma(turma, _turmas_totais, _grade_aulas, _dias_semana, _quadro)
+        for turma in sorted(_turmas_totais.keys())
+    }
+
+@st.cache_data(max_entries=MAX_HORARIOS_EM_CACHE, show_spinner=False)
+def pdf_horario(assinatura, _turmas_totais, _grade_aulas, _dias_semana, _quadro):
+    return gerar_pdf_bytes(_turmas_totais, _grade_aulas, _dias_semana, _quadro).getvalue()
+
+@st.cache_data(max_entries=MAX_HORARIOS_EM_CACHE, show_spinner=False)
+def json_horario(assinatura, custo, _dias_semana, _vars_resolvidas, auditoria):
+    # A auditoria entra na chave: o mesmo horário com outras opções de
+    # penalidade (ex: aulas vagas) tem outras linhas de custo
+    return gerar_json("OK", custo, _dias_semana, _vars_resolvidas, auditoria)
+
+def exibir_estatisticas(assinatura, grade_aulas, dias_semana, quadro):
+    st.markdown("---")
+    st.subheader("📅 Distribuição de Aulas por Professor (Dia a Dia)")
+    df_stats = tabela_estatisticas(assinatura, grade_aulas, dias_semana, quadro)
     st.dataframe(df_stats.style.background_gradient(subset=dias_semana, cmap="Blues"), use_container_width=True)
 
-def exibir_horarios_na_tela(turmas_totais, dias_semana, vars_resolvidas, grade_aulas):
+def exibir_horarios_na_tela(assinatura, turmas_totais, dias_semana, quadro, grade_aulas):
     st.markdown("---")
     st.subheader("🏫 Visualização dos Horários das Turmas")
-    lista_turmas = sorted(turmas_totais.keys())
-    abas = st.tabs(lista_turmas)
-    for aba, turma in zip(abas, lista_turmas):
+    tabelas = tabelas_turmas(assinatura, turmas_totais, grade_aulas, dias_semana, quadro)
+    abas = st.tabs(list(tabelas))
+    for aba, df_turma in zip(abas, tabelas.values()):
         with aba:
-            aulas_por_dia = turmas_totais[turma] // 5
-            dados_grade = []
-            for aula in range(aulas_por_dia):
-                if aula == 3:
-                      dados_grade.append({"Horário": "INTERVALO", "Seg": "---", "Ter": "---", "Qua": "---", "Qui": "---", "Sex": "---"})
-                linha_dict = {"Horário": f"{aula + 1}ª Aula"}
-                for d_idx, dia_nome in enumerate(dias_semana):
-                    conteudo = "---"
-                    for item in grade_aulas:
-                        if item['turma'] == turma:
-                            prof = item['prof']
-                            materia = item['materia']
-                            chave = (turma, d_idx, aula, prof, materia)
-                            if chave in vars_resolvidas and vars_resolvidas[chave] == 1:
-                                conteudo = f"{materia} ({prof})"
-                                break
-                    linha_dict[dia_nome] = conteudo
-                dados_grade.append(linha_dict)
-            st.dataframe(pd.DataFrame(dados_grade), use_container_width=True)
+            st.dataframe(df_turma, use_container_width=True)
 
 # ==========================================
-# MOTOR DE OTIMIZAÇÃO (SOLVER)
+# CÁLCULO EM SEGUNDO PLANO
 # ==========================================
-def resolver_horario(
-    turmas_totais,
-    grade_aulas,
-    dias_semana,
-    bloqueios_globais,
-    materias_para_agrupar=[],
-    mapa_aulas_vagas={}
-):
-
-    model = cp_model.CpModel()
-    horario_vars = {}
-
-    termos_custo = []
-    detalhes_audit = []
-
-    # Mapas auxiliares para facilitar a busca de variáveis
-    mapa_turma_horario = defaultdict(list)
-    mapa_prof_horario = defaultdict(list)
-    mapa_turma_prof_horario = defaultdict(list)
-    
-    # Mapa reverso para saber quais matérias/profs existem em cada turma
-    # Estrutura: mapa_conteudo_turma[turma] = set((prof, materia))
-    mapa_conteudo_turma = defaultdict(set)
-
-    aulas_por_turma_idx = {t: t_val // 5 for t, t_val in turmas_totais.items()}
-    max_aulas_escola = max(aulas_por_turma_idx.values()) if aulas_por_turma_idx else 5
-
-    # =========================
-    # 1. CRIAÇÃO DAS VARIÁVEIS
-    # =========================
-    for item in grade_aulas:
-        turma = item['turma']
-        prof = item['prof']
-        materia = item['materia']
-        aulas_dia = aulas_por_turma_idx[turma]
-        
-        mapa_conteudo_turma[turma].add((prof, materia))
-
-        for d in range(len(dias_semana)):
-            for a in range(aulas_dia):
-                key = (turma, d, a, prof, materia)
-                var = model.NewBoolVar(f"H_{turma}_{prof}_{materia}_{d}_{a}")
-                horario_vars[key] = var
-
-                mapa_turma_horario[(turma, d, a)].append(var)
-                mapa_prof_horario[(prof, d, a)].append(var)
-                mapa_turma_prof_horario[(turma, prof, d)].append(var)
-
-    # =========================
-    # 2. HARD CONSTRAINTS (Regras Rígidas)
-    # =========================
-    
-    # A) Colisão de Turma: Uma turma só tem 1 aula por horário
-    for vars_list in mapa_turma_horario.values():
-        model.Add(sum(vars_list) <= 1)
-
-    # B) Colisão de Professor: Professor só em 1 lugar ao mesmo tempo
-    for vars_list in mapa_prof_horario.values():
-        model.Add(sum(vars_list) <= 1)
-
-    # C) Quantidade de Aulas: Respeitar a grade curricular
-    for item in grade_aulas:
-        vars_materia = []
-        turma, prof, materia = item['turma'], item['prof'], item['materia']
-        aulas_dia = aulas_por_turma_idx[turma]
-        for d in range(len(dias_semana)):
-            for a in range(aulas_dia):
-                vars_materia.append(horario_vars[(turma, d, a, prof, materia)])
-        
-        # Se a grade pede X aulas, deve ter exatamente X aulas
-        model.Add(sum(vars_materia) == item['qtd'])
-
-    # D) Indisponibilidade Declarada
-    for prof, bloqueios in bloqueios_globais.items():
-        for d, a in bloqueios:
-            if (prof, d, a) in mapa_prof_horario:
-                for var in mapa_prof_horario[(prof, d, a)]:
-                    model.Add(var == 0)
-
-    # =========================
-    # 3. CONSTRAINTS AVANÇADAS (O que faltava)
-    # =========================
-
-    # --- E) JANELAS (Aulas Vagas) ---
-    # Limita o tempo ocioso do professor entre a primeira e a última aula do dia
-    
-    PESO_JANELA_EXTRA = 50  # Penalidade se estourar um pouco (soft) ou Hard se preferir
-
-    # Agrupamos todas as vars de um professor por dia e aula
-    profs_unicos = set(item['prof'] for item in grade_aulas)
-    
-    for prof in profs_unicos:
-        limite_janelas = mapa_aulas_vagas.get(prof, 2) # Padrão 2 se não definido
-        
-        for d in range(len(dias_semana)):
-            # Variáveis que indicam se o prof trabalha na aula 'a' do dia 'd'
-            trabalha_no_horario = [] 
-            
-            # Como as aulas variam por turma, pegamos o maximo global (ex: 5 ou 6 aulas)
-            for a in range(max_aulas_escola):
-                # Soma todas as turmas que esse prof pode estar nesse dia/horario
-                vars_slot = mapa_prof_horario.get((prof, d, a), [])
-                
-                if not vars_slot:
-                    # Se não tem aula nenhuma possível nesse slot, é 0 constante
-                    trabalha_no_horario.append(0)
-                else:
-                    # Cria var booleana: 1 se der aula, 0 se não
-                    var_trab = model.NewBoolVar(f"trab_{prof}_{d}_{a}")
-                    model.Add(sum(vars_slot) == var_trab) # Soma será 0 ou 1
-                    trabalha_no_horario.append(var_trab)
-            
-            # Se o professor não trabalha no dia, janelas = 0. Precisamos tratar isso.
-            tem_aula_dia = model.NewBoolVar(f"tem_aula_{prof}_{d}")
-            model.Add(sum(trabalha_no_horario) > 0).OnlyEnforceIf(tem_aula_dia)
-            model.Add(sum(trabalha_no_horario) == 0).OnlyEnforceIf(tem_aula_dia.Not())
-
-            # Definir Início (primeira aula) e Fim (última aula)
-            inicio = model.NewIntVar(0, max_aulas_escola, f"inicio_{prof}_{d}")
-            fim = model.NewIntVar(0, max_aulas_escola, f"fim_{prof}_{d}")
-            
-            # Restrições para encontrar inicio e fim
-            for idx, var_bin in enumerate(trabalha_no_horario):
-                # Se trabalha no idx, o inicio deve ser <= idx
-                if isinstance(var_bin, int) and var_bin == 0: continue
-                
-                model.Add(inicio <= idx).OnlyEnforceIf(var_bin)
-                model.Add(fim >= idx).OnlyEnforceIf(var_bin)
-            
-            # Span (Duração da estadia na escola) = Fim - Inicio + 1
-            span = model.NewIntVar(0, max_aulas_escola, f"span_{prof}_{d}")
-            model.Add(span == fim - inicio + 1).OnlyEnforceIf(tem_aula_dia)
-            model.Add(span == 0).OnlyEnforceIf(tem_aula_dia.Not())
-            
-            # Janelas = Span - Aulas Dadas
-            # Ex: Aula na 1 e na 3. Span = 3-1+1 = 3. Aulas = 2. Janelas = 1.
-            qtd_janelas = model.NewIntVar(0, max_aulas_escola, f"janelas_{prof}_{d}")
-            
-            # Precisamos somar as variaveis da lista trabalha_no_horario (tratando int 0)
-            soma_aulas = sum(v for v in trabalha_no_horario if not isinstance(v, int) or v != 0)
-            
-            model.Add(qtd_janelas == span - soma_aulas).OnlyEnforceIf(tem_aula_dia)
-            model.Add(qtd_janelas == 0).OnlyEnforceIf(tem_aula_dia.Not())
-
-            # Hard Constraint Relaxada: Se passar do limite, penaliza MUITO forte
-            # Isso evita que o Solver retorne "Impossible" se for matematicamente impossível
-            # mas tenta ao máximo respeitar.
-            excesso_janela = model.NewIntVar(0, max_aulas_escola, f"exc_jan_{prof}_{d}")
-            model.Add(excesso_janela >= qtd_janelas - limite_janelas)
-            model.Add(excesso_janela >= 0) # ReLU
-            
-            PESO_JANELA = 500 # Peso alto para funcionar quase como Hard Constraint
-            termos_custo.append(excesso_janela * PESO_JANELA)
-            
-            detalhes_audit.append({
-                "tipo": "Janelas em Excesso",
-                "desc": f"{prof} excedeu limite de janelas ({dias_semana[d]})",
-                "var": excesso_janela,
-                "peso": PESO_JANELA
-            })
-
-    # --- F) AGRUPAMENTO DE MATÉRIAS (Mesmo Dia) ---
-    # Se Matéria A e B estão no grupo, tentamos forçar que ocorram no mesmo dia na turma
-    
-    PESO_AGRUPAMENTO = 150
-
-    if materias_para_agrupar:
-        for grupo in materias_para_agrupar:
-            # O grupo é uma lista de nomes, ex: ['Artes', 'Ed. Física']
-            if len(grupo) < 2: continue
-            
-            materia_lider = grupo[0]
-            materias_seguidoras = grupo[1:]
-            
-            for turma in turmas_totais:
-                conteudos_turma = mapa_conteudo_turma[turma]
-                
-                # Verifica se essa turma tem essas matérias
-                tem_lider = any(m == materia_lider for p, m in conteudos_turma)
-                if not tem_lider: continue
-
-                for m_seg in materias_seguidoras:
-                    tem_seg = any(m == m_seg for p, m in conteudos_turma)
-                    if not tem_seg: continue
-                    
-                    # Agora sabemos que a turma tem as duas matérias.
-                    # Vamos alinhar dia a dia.
-                    for d in range(len(dias_semana)):
-                        
-                        # Bool: Lider ocorre hoje?
-                        lider_hoje = model.NewBoolVar(f"lid_{turma}_{materia_lider}_{d}")
-                        vars_lider = []
-                        # Pegar var da materia lider (pode ser qqr prof, mas geralmente é 1)
-                        for (p, m) in conteudos_turma:
-                            if m == materia_lider:
-                                aulas_dia = aulas_por_turma_idx[turma]
-                                for a in range(aulas_dia):
-                                    vars_lider.append(horario_vars.get((turma, d, a, p, m), 0))
-                        
-                        # Se soma > 0, então lider_hoje = 1
-                        # Truque CP: sum(vars) > 0 <=> lider_hoje
-                        soma_l = sum(vars_lider)
-                        if isinstance(soma_l, int) and soma_l == 0:
-                             model.Add(lider_hoje == 0)
-                        else:
-                             model.Add(soma_l > 0).OnlyEnforceIf(lider_hoje)
-                             model.Add(soma_l == 0).OnlyEnforceIf(lider_hoje.Not())
-
-                        # Bool: Seguidora ocorre hoje?
-                        seg_hoje = model.NewBoolVar(f"seg_{turma}_{m_seg}_{d}")
-                        vars_seg = []
-                        for (p, m) in conteudos_turma:
-                            if m == m_seg:
-                                aulas_dia = aulas_por_turma_idx[turma]
-                                for a in range(aulas_dia):
-                                    vars_seg.append(horario_vars.get((turma, d, a, p, m), 0))
-                        
-                        soma_s = sum(vars_seg)
-                        if isinstance(soma_s, int) and soma_s == 0:
-                             model.Add(seg_hoje == 0)
-                        else:
-                             model.Add(soma_s > 0).OnlyEnforceIf(seg_hoje)
-                             model.Add(soma_s == 0).OnlyEnforceIf(seg_hoje.Not())
-
-                        # Penalidade se forem diferentes (uma tem aula, a outra não)
-                        # abs(lider - seg)
-                        diferenca = model.NewIntVar(0, 1, f"diff_{turma}_{materia_lider}_{m_seg}_{d}")
-                        model.Add(diferenca == lider_hoje - seg_hoje).OnlyEnforceIf(lider_hoje) # Se lider=1, diff = 1 - seg
-                        model.Add(diferenca == seg_hoje - lider_hoje).OnlyEnforceIf(lider_hoje.Not()) # Se lider=0, diff = seg - 0
-                        
-                        termos_custo.append(diferenca * PESO_AGRUPAMENTO)
-                        detalhes_audit.append({
-                            "tipo": "Agrupamento Falhou",
-                            "desc": f"{turma}: {materia_lider} e {m_seg} separados em {dias_semana[d]}",
-                            "var": diferenca,
-                            "peso": PESO_AGRUPAMENTO
-                        })
-
-
-    # =========================
-    # 4. SOFT CONSTRAINTS (Qualidade de Vida)
-    # =========================
-
-    # G) Evitar Repetição no Mesmo Dia (GEMINADAS PERMITIDAS)
-    # Regra Ajustada: Até 2 aulas (dobradinha) é OK. 3 ou mais penaliza.
-    
-    PESO_REPETICAO_EXCESSIVA = 100
-
-    for turma in turmas_totais:
-        # Analisar por professor
-        profs_da_turma = set(p for p, m in mapa_conteudo_turma[turma])
-        
-        for prof in profs_da_turma:
-            for d in range(len(dias_semana)):
-                vars_dia = mapa_turma_prof_horario.get((turma, prof, d), [])
-                if not vars_dia: continue
-
-                total_no_dia = model.NewIntVar(0, max_aulas_escola, f"tot_rep_{turma}_{prof}_{d}")
-                model.Add(total_no_dia == sum(vars_dia))
-
-                # Penalidade se > 2 (permitimos geminadas)
-                excesso_geminada = model.NewIntVar(0, max_aulas_escola, f"exc_gem_{turma}_{prof}_{d}")
-                model.Add(excesso_geminada >= total_no_dia - 2)
-                model.Add(excesso_geminada >= 0)
-
-                termos_custo.append(excesso_geminada * PESO_REPETICAO_EXCESSIVA)
-                detalhes_audit.append({
-                    "tipo": "Muitas aulas seguidas",
-                    "desc": f"{prof} na {turma} ({dias_semana[d]}) > 2 aulas",
-                    "var": excesso_geminada,
-                    "peso": PESO_REPETICAO_EXCESSIVA
-                })
-
-    # ==============================================================================
-    # H & I) CARGA DIÁRIA DO PROFESSOR (Excesso e Aula Única)
-    # Agrupamos aqui para calcular 'total_dia' apenas uma vez por prof/dia
-    # ==============================================================================
-    
-    PESO_EXCESSO_DIARIO = 200    # Penaliza se der muitas aulas no dia (ex: > 4)
-    LIMITE_SUAVE_DIARIO = 4 
-    
-    PESO_AULA_UNICA = 350        # [NOVO] Penaliza forte se for para dar só 1 aula
+@st.cache_resource
+def obter_gerenciador_jobs():
+    # Um único gerenciador por servidor, compartilhado entre as sessões
+    return GerenciadorJobs()
+
+def exibir_progresso(eventos):
+    # Cada evento é uma solução melhor publicada pelo CallbackProgresso
+    if not eventos:
+        st.caption("Procurando a primeira solução viável...")
+        return
 
-    for prof in profs_unicos:
-        for d in range(len(dias_semana)):
-            
-            # Coleta todas as aulas desse prof no dia (em todas as turmas)
-            vars_dia_prof = []
-            for a in range(max_aulas_escola):
-                 vars_dia_prof.extend(mapa_prof_horario.get((prof, d, a), []))
-            
-            if not vars_dia_prof: continue
-
-            # Variável que conta quantas aulas ele tem no TOTAL neste dia
-            total_dia = model.NewIntVar(0, max_aulas_escola, f"total_prof_{prof}_{d}")
-            model.Add(total_dia == sum(vars_dia_prof))
-
-            # --- PARTE H: Penalizar Excesso (Cansaço) ---
-            excesso = model.NewIntVar(0, max_aulas_escola, f"overload_{prof}_{d}")
-            model.Add(excesso >= total_dia - LIMITE_SUAVE_DIARIO)
-            model.Add(excesso >= 0)
-
-            termos_custo.append(excesso * PESO_EXCESSO_DIARIO)
-            detalhes_audit.append({
-                "tipo": "Concentração Diária",
-                "desc": f"{prof} sobrecarregado em {dias_semana[d]}",
-                "var": excesso,
-                "peso": PESO_EXCESSO_DIARIO
-            })
-
-            # --- PARTE I: Penalizar Aula Única (Viagem Perdida) --- 
-            # Se total_dia == 1, ativa a penalidade.
-            eh_aula_unica = model.NewBoolVar(f"single_{prof}_{d}")
-            
-            # Lógica: Se total == 1, bool é True. Se total != 1 (0, 2, 3...), bool é False.
-            model.Add(total_dia == 1).OnlyEnforceIf(eh_aula_unica)
-            model.Add(total_dia != 1).OnlyEnforceIf(eh_aula_unica.Not())
-
-            termos_custo.append(eh_aula_unica * PESO_AULA_UNICA)
-            detalhes_audit.append({
-                "tipo": "Aula Isolada",
-                "desc": f"{prof} viaja p/ apenas 1 aula ({dias_semana[d]})",
-                "var": eh_aula_unica,
-                "peso": PESO_AULA_UNICA
-            })
-
-    # =========================
-    # 5. OBJETIVO E SOLUÇÃO
-    # =========================
-    if termos_custo:
-        model.Minimize(sum(termos_custo))
-
-    solver = cp_model.CpSolver()
-    # De 45 para 300 segundos (5 minutos) ou até 600 (10 minutos)
-    solver.parameters.max_time_in_seconds = 45
-    # Se estiver rodando no seu PC, 8 é bom. Na nuvem grátis, deixe 4 ou 8 mesmo
-    solver.parameters.num_search_workers = 8
-    # Linearização ajuda em problemas de agendamento
-    solver.parameters.linearization_level = 0 
-    # DICA PRO: Habilite o log para ver o progresso no terminal (tela preta)
-    solver.parameters.log_search_progress = True
-    status = solver.Solve(model)
-
-    resultados = {}
-    auditoria = []
-
-    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
-        for k, v in horario_vars.items():
-            if solver.Value(v) == 1:
-                resultados[k] = 1
-
-        for item in detalhes_audit:
-            try:
-                val = solver.Value(item['var'])
-                if val > 0:
-                    auditoria.append({
-                        "Tipo": item["tipo"],
-                        "Descrição": item["desc"],
-                        "Custo": val * item["peso"]
-                    })
-            except: pass
+    ultimo = eventos[-1]
+    m1, m2, m3, m4 = st.columns(4)
+    # No lexicográfico o custo só soma as famílias já otimizadas
+    m1.metric("Custo Parcial" if ultimo.get('parcial') else "Melhor Custo", f"{ultimo['objetivo']:.0f}")
+    m2.metric("Limite Inferior", f"{ultimo['limite']:.0f}")
+    m3.metric("Gap", f"{ultimo['gap']:.1%}")
+    m4.metric("Soluções", ultimo['solucao'])
+    if 'estagio' in ultimo:
+        st.caption(f"Otimizando agora: {ultimo['estagio']}"
+                   + (" (custo parcial: só as famílias já otimizadas e a atual)" if ultimo.get('parcial') else ""))
+
+    df_evolucao = pd.DataFrame(eventos).set_index("tempo")[["objetivo", "limite"]]
+    st.line_chart(df_evolucao)
+
+    if ultimo['penalidades']:
+        df_pen = pd.DataFrame(
+            sorted(ultimo['penalidades'].items(), key=lambda kv: -kv[1]),
+            columns=["Tipo", "Custo"]
+        )
+        st.dataframe(df_pen, use_container_width=True, hide_index=True)
 
-        return "OK", resultados, solver.ObjectiveValue(), auditoria
+@st.fragment(run_every=1)
+def acompanhar_calculo():
+    job = st.session_state.get('job_calculo')
+    if not job:
+        return
 
-    return "ERRO", {}, 0, []
+    gerenciador = obter_gerenciador_jobs()
+    try:
+        status_job = gerenciador.status(job['id'])
+    except KeyError:
+        # Job expirou ou o servidor reiniciou
+        del st.session_state['job_calculo']
+        st.rerun(scope="app")
+
+    if status_job in (PENDENTE, EXECUTANDO):
+        decorrido = gerenciador.tempo_decorrido(job['id'])
+        if status_job == PENDENTE:
+            st.info(f"⏳ Na fila, aguardando outros cálculos terminarem... ({decorrido:.0f}s)")
+        else:
+            st.info(f"🤖 Construindo modelo matemático e calculando... ({decorrido:.0f}s)")
+            exibir_progresso(gerenciador.progresso(job['id']))
+
+        col_parar, col_cancelar = st.columns(2)
+        if status_job == EXECUTANDO and col_parar.button("⏹️ Parar agora e manter o melhor"):
+            gerenciador.interromper(job['id'])
+        if col_cancelar.button("⛔ Cancelar cálculo"):
+            gerenciador.cancelar(job['id'])
+            gerenciador.descartar(job['id'])
+            del st.session_state['job_calculo']
+            st.rerun(scope="app")
+        return
 
+    del st.session_state['job_calculo']
+    try:
+        resultado = gerenciador.resultado(job['id'])
+        status, vars_resolvidas, custo, detalhes_penal = resultado[:4]
+    except Exception as e:
+        st.error(f"Erro Crítico no motor de cálculo: {e}")
+        st.write("Verifique se instalou o OR-Tools: `pip install ortools`")
+        return
+    finally:
+        gerenciador.descartar(job['id'])
+
+    if status == "OK":
+        # Salva na memória do Streamlit
+        st.session_state['resultado_otimizacao'] = {
+            'vars': vars_resolvidas,
+            # Indexado uma vez aqui; telas e PDF leem dele a cada rerun
+            'quadro': QuadroHorario(vars_resolvidas),
+            'assinatura': assinatura_horario(job['turmas'], job['grade'], job['dias'], vars_resolvidas),
+            'custo': custo,
+            'detalhes': detalhes_penal,
+            'grade': job['grade'],
+            'turmas': job['turmas'],
+            'bloqueios': job['bloqueios'],
+            # Só no recálculo incremental: o que foi liberado em cada rodada
+            'incremental': resultado[4] if job.get('tarefa') == "incremental" else None,
+            # Só na busca por vizinhanças: a trajetória do custo por iteração
+            'lns': resultado[4] if job.get('tarefa') == "lns" else None,
+            # Só no portfólio: uma linha por configuração do solver
+            'portfolio': resultado[4] if job.get('tarefa') == "portfolio" else None
+        }
+        st.rerun(scope="app")  # Recarrega a página para mostrar resultados
+    else:
+        st.error("Não foi possível gerar um horário viável. Tente relaxar as restrições.")
+        with st.spinner("Procurando as regras em conflito..."):
+            status_diag, culpados = diagnosticar(job['turmas'], job['grade'], job['dias'], job['bloqueios'])
+        if culpados:
+            st.markdown("**Estas regras, juntas, não têm solução** (tirar ou afrouxar qualquer uma resolve o conflito):")
+            st.dataframe(pd.DataFrame(culpados), use_container_width=True, hide_index=True)
+        elif status_diag in ("FEASIBLE", "OPTIMAL"):
+            st.info("As regras obrigatórias têm solução: o solver só não achou um horário a tempo.")
+        elif status_diag != "INFEASIBLE":
+            # UNKNOWN: o diagnóstico também estourou o tempo, não prova nada
+            st.warning("Diagnóstico inconclusivo: não deu tempo de saber se as regras obrigatórias têm solução.")
 
 # ==========================================
 # APP PRINCIPAL (EXECUÇÃO)
@@ -942,7 +494,7 @@ if uploaded_file is not None:
     turmas_totais, grade_aulas, dias_semana, bloqueios_globais = carregar_dados(uploaded_file)
     
     if turmas_totais:
-        dados_ok = verificar_capacidade(grade_aulas, bloqueios_globais)
+        dados_ok = verificar_capacidade(turmas_totais, grade_aulas, dias_semana, bloqueios_globais)
 
         st.markdown("### 📊 Resumo da Escola")
         kpi1, kpi2, kpi3, kpi4 = st.columns(4)
@@ -996,71 +548,285 @@ if uploaded_file is not None:
                 )
 
                 # =========================
-                # MATÉRIAS NO MESMO DIA
+                # MATÉRIAS NO MESMO DIA / EM DIAS DIFERENTES
                 # =========================
-                st.markdown("#### 🔗 Matérias que devem ocorrer no MESMO DIA")
+                st.markdown("#### 🔗 Agrupamento de Matérias (mesmo dia ou dias diferentes)")
 
                 lista_materias = sorted(list(set(g['materia'] for g in grade_aulas)))
 
+                # Grupos da aba Agrupamentos entram sempre; os da tela somam a eles
+                materias_para_agrupar = carregar_agrupamentos(uploaded_file)
+                if materias_para_agrupar:
+                    st.caption("Da aba Agrupamentos: " + "; ".join(
+                        f"{' + '.join(g['materias'])} "
+                        f"({'dias diferentes' if g['regra'] == 'dias_diferentes' else 'mesmo dia'})"
+                        for g in materias_para_agrupar
+                    ))
+
                 materias_mesmo_dia = st.multiselect(
                     "Selecione matérias que devem acontecer no mesmo dia da semana",
                     options=lista_materias,
                     help="Exemplo: Artes e Ed. Física"
                 )
 
-                materias_para_agrupar = []
+                materias_dias_diferentes = st.multiselect(
+                    "Selecione matérias que devem ficar em dias diferentes",
+                    options=lista_materias,
+                    help="Exemplo: Matemática e Física. Para mais grupos, use a aba Agrupamentos da planilha."
+                )
+
                 if len(materias_mesmo_dia) >= 2:
                     materias_para_agrupar.append(materias_mesmo_dia)
+                if len(materias_dias_diferentes) >= 2:
+                    materias_para_agrupar.append({"regra": "dias_diferentes", "materias": materias_dias_diferentes})
+
+                # =========================
+                # PARADA ANTECIPADA
+                # =========================
+                st.markdown("#### 🎯 Parada Antecipada")
+
+                perfil = st.selectbox(
+                    "Perfil de busca",
+                    options=list(PERFIS),
+                    index=list(PERFIS).index("padrao"),
+                    format_func=lambda k: PERFIS[k]["nome"],
+                    help="O tempo máximo cresce com o tamanho da escola; a busca para antes se o "
+                         "custo parar de melhorar. 'Noturno' usa todo o tempo e, em escolas grandes, todos os núcleos."
+                )
+                parametros_busca = parametros_perfil(
+                    perfil, turmas_totais, grade_aulas, dias_semana, bloqueios_globais,
+                    jobs_simultaneos=obter_gerenciador_jobs().max_jobs
+                )
+                st.caption(
+                    f"Até {parametros_busca['tempo_limite']:.0f}s com {parametros_busca['num_workers']} "
+                    f"worker(s)"
+                    + (f", parando após {parametros_busca['estagnacao']:.0f}s sem melhora"
+                       if parametros_busca['estagnacao'] else "")
+                )
+
+                gap_aceitavel_pct = st.number_input(
+                    "Aceitar solução a até X% do limite inferior (0 = usar o do perfil)",
+                    min_value=0.0, max_value=50.0, value=0.0, step=0.5,
+                    help="Em escolas grandes, 2% costuma ser atingido bem antes do tempo máximo."
+                )
+                if gap_aceitavel_pct:
+                    parametros_busca['gap_aceitavel'] = gap_aceitavel_pct / 100
+
+                formulacao = st.selectbox(
+                    "Formulação do modelo",
+                    options=list(FORMULACOES),
+                    help="'por_aula' usa uma variável inteira por aula e só as ocupações por "
+                         "horário e por dia; compare as duas com "
+                         "`python -m horario comparar --variar formulacao`."
+                )
+
+                janelas = st.selectbox(
+                    "Codificação das janelas",
+                    options=list(CODIFICACOES_JANELA),
+                    help="Mesmo resultado, modelos diferentes: 'transicoes' evita restrições "
+                         "reificadas. Compare com `python -m horario comparar --variar janelas`."
+                )
+
+                quebrar_simetria = st.checkbox(
+                    "Quebrar simetria entre turmas equivalentes",
+                    help="Turmas com a mesma grade e os mesmos professores (ex: 6º Ano A/B/C) são "
+                         "intercambiáveis; ordená-las evita que o solver explore horários repetidos. "
+                         "Meça na sua escola com `python -m horario comparar --variar quebrar_simetria`."
+                )
+
+                restricoes_redundantes = st.checkbox(
+                    "Restrições redundantes (contagens por dia)",
+                    help="Não mudam o resultado; só ajudam o solver a descobrir mais cedo quando "
+                         "a grade é impossível e a melhorar o limite inferior. Meça na sua escola com "
+                         "`python -m horario comparar --variar restricoes_redundantes`."
+                )
+
+                objetivo = st.selectbox(
+                    "Objetivo",
+                    options=list(OBJETIVOS),
+                    format_func=lambda k: {"ponderado": "Soma ponderada",
+                                           "lexicografico": "Por prioridade (lexicográfico)"}[k],
+                    help="'Por prioridade' resolve primeiro as janelas, depois as aulas isoladas, "
+                         "a concentração diária e assim por diante, sem trocar uma família mais "
+                         "importante por várias menos importantes. Vale para o modo Completo."
+                )
+
+                modo_busca = st.radio(
+                    "Modo de busca",
+                    ["Completo", "Vizinhanças (LNS)", "Portfólio"],
+                    horizontal=True,
+                    help="Em escolas grandes, 'Vizinhanças' acha uma primeira solução e depois "
+                         "reotimiza um dia, um grupo de professores ou uma série por vez, "
+                         "o que costuma chegar a custos menores no mesmo tempo. 'Portfólio' roda "
+                         "várias configurações do solver em paralelo (útil em servidores com muitos núcleos)."
+                )
+
+                if st.button("📐 Medir tamanho do modelo"):
+                    # Só monta o modelo (sem resolver) com as opções acima
+                    m_medido = construir_modelo(
+                        turmas_totais, grade_aulas, dias_semana, bloqueios_globais,
+                        materias_para_agrupar=materias_para_agrupar,
+                        mapa_aulas_vagas=mapa_aulas_vagas_user,
+                        formulacao=formulacao,
+                        quebrar_simetria=quebrar_simetria,
+                        restricoes_redundantes=restricoes_redundantes,
+                        janelas=janelas
+                    )
+                    e = m_medido.estatisticas
+                    st.caption(f"{e['variaveis']} variáveis, {e['restricoes']} restrições, "
+                               f"montado em {e['tempo_construcao']:.2f}s")
+                    df_familias = pd.DataFrame(e['familias']).rename(columns={
+                        "familia": "Família", "variaveis": "Variáveis", "restricoes": "Restrições",
+                        "penalidades": "Penalidades", "tempo": "Tempo (s)"
+                    })
+                    st.dataframe(df_familias, use_container_width=True, hide_index=True)
+
+                # =========================
+                # PARTIR DO HORÁRIO ANTERIOR
+                # =========================
+                st.markdown("#### ♻️ Partir do Horário Anterior")
+
+                opcoes_anterior = ["Não usar"]
+                if st.session_state['resultado_otimizacao']:
+                    opcoes_anterior.append("Último horário gerado nesta sessão")
+                opcoes_anterior.append("Enviar arquivo JSON")
+                origem_anterior = st.radio(
+                    "Ponto de partida",
+                    opcoes_anterior,
+                    horizontal=True,
+                    help="Pequenas mudanças (ex: uma nova indisponibilidade) recalculam bem mais rápido "
+                         "partindo do horário já publicado."
+                )
+
+                solucao_anterior = None
+                if origem_anterior == "Último horário gerado nesta sessão":
+                    solucao_anterior = st.session_state['resultado_otimizacao']['vars']
+                elif origem_anterior == "Enviar arquivo JSON":
+                    arquivo_anterior = st.file_uploader("Horário anterior (.json baixado deste sistema)", type=['json'])
+                    if arquivo_anterior is not None:
+                        try:
+                            solucao_anterior = ler_json(arquivo_anterior.getvalue(), dias_semana)
+                        except (ValueError, KeyError) as e:
+                            st.error(f"Arquivo de horário inválido: {e}")
+
+                peso_mudanca = 0
+                if solucao_anterior:
+                    peso_mudanca = st.number_input(
+                        "Custo por aula que mudar de lugar (0 = só usar como ponto de partida)",
+                        min_value=0, max_value=1000, value=0, step=10
+                    )
+
+                recalcular_so_mudancas = False
+                if origem_anterior == "Último horário gerado nesta sessão":
+                    recalcular_so_mudancas = st.checkbox(
+                        "🎯 Recalcular só o que mudou",
+                        help="Mantém fixas as turmas que não foram afetadas pela mudança na planilha "
+                             "e reotimiza apenas as turmas dos professores alterados."
+                    )
 
             st.write("---")
 
             # --- BOTÃO DE AÇÃO ---
+            # O cálculo roda num processo separado: a tela só guarda o id do job
+            # e acompanha o andamento, então cliques em outros widgets não o perdem.
             if st.button("🚀 Gerar Horário Agora", type="primary", use_container_width=True):
-                with st.spinner('🤖 Construindo modelo matemático e calculando (Isso pode demorar)...'):
-                    try:
-                        status, vars_resolvidas, custo, detalhes_penal = resolver_horario(
-                            turmas_totais,
-                            grade_aulas,
-                            dias_semana,
-                            bloqueios_globais,
-                            materias_para_agrupar=materias_para_agrupar,  # 👈 AQUI
-                            mapa_aulas_vagas=mapa_aulas_vagas_user
-                        )
-
-                        if status == "OK":
-                            # Salva na memória do Streamlit
-                            st.session_state['resultado_otimizacao'] = {
-                                'vars': vars_resolvidas,
-                                'custo': custo,
-                                'detalhes': detalhes_penal,
-                                'grade': grade_aulas,  # snapshot
-                                'turmas': turmas_totais
-                            }
-                            st.rerun()  # Recarrega a página para mostrar resultados
-                        else:
-                            st.error("Não foi possível gerar um horário viável. Tente relaxar as restrições.")
-                    except Exception as e:
-                        st.error(f"Erro Crítico no motor de cálculo: {e}")
-                        st.write("Verifique se instalou o OR-Tools: `pip install ortools`")
+                gerenciador = obter_gerenciador_jobs()
+                job_anterior = st.session_state.get('job_calculo')
+                if job_anterior:
+                    gerenciador.cancelar(job_anterior['id'])
+                    gerenciador.descartar(job_anterior['id'])
+
+                parametros = dict(
+                    materias_para_agrupar=materias_para_agrupar,  # 👈 AQUI
+                    mapa_aulas_vagas=mapa_aulas_vagas_user,
+                    formulacao=formulacao,
+                    janelas=janelas,
+                    quebrar_simetria=quebrar_simetria,
+                    restricoes_redundantes=restricoes_redundantes,
+                    solucao_anterior=solucao_anterior,
+                    peso_mudanca=peso_mudanca,
+                    **parametros_busca
+                )
+                tarefa = {"Vizinhanças (LNS)": "lns", "Portfólio": "portfolio"}.get(modo_busca, "completo")
+                if tarefa == "completo" or recalcular_so_mudancas:
+                    # LNS e portfólio só trabalham com a soma ponderada
+                    parametros["objetivo"] = objetivo
+                if recalcular_so_mudancas:
+                    tarefa = "incremental"
+                    res_anterior = st.session_state['resultado_otimizacao']
+                    job_id = gerenciador.submeter(
+                        rotulo=st.session_state.get('username', ''),
+                        tarefa=tarefa,
+                        entrada_nova=(turmas_totais, grade_aulas, dias_semana, bloqueios_globais),
+                        entrada_anterior=(res_anterior['turmas'], res_anterior['grade'], dias_semana,
+                                          res_anterior['bloqueios']),
+                        **parametros
+                    )
+                else:
+                    job_id = gerenciador.submeter(
+                        rotulo=st.session_state.get('username', ''),
+                        tarefa=tarefa,
+                        turmas_totais=turmas_totais,
+                        grade_aulas=grade_aulas,
+                        dias_semana=dias_semana,
+                        bloqueios_globais=bloqueios_globais,
+                        **parametros
+                    )
+                st.session_state['job_calculo'] = {
+                    'id': job_id,
+                    'tarefa': tarefa,
+                    'grade': grade_aulas,  # snapshot
+                    'turmas': turmas_totais,
+                    'dias': dias_semana,
+                    'bloqueios': bloqueios_globais
+                }
+
+            if st.session_state.get('job_calculo'):
+                acompanhar_calculo()
 
 # --- EXIBIÇÃO DE RESULTADOS (FORA DO BOTÃO) ---
 if st.session_state['resultado_otimizacao']:
     res = st.session_state['resultado_otimizacao']
 
     st.success(f"Horário Gerado com Sucesso! (Custo: {res['custo']})")
+    if res.get('incremental'):
+        info = res['incremental']
+        ultima = info['rodadas'][-1]
+        st.caption(
+            f"Recálculo incremental: {ultima['turmas_livres']} de {len(res['turmas'])} turmas liberadas "
+            f"em {len(info['rodadas'])} rodada(s), {info['tempo_total']:.1f}s "
+            f"(professores alterados: {', '.join(sorted(info['profs_alterados'])) or 'nenhum'})"
+        )
+    if res.get('portfolio'):
+        with st.expander("📈 Configurações do portfólio"):
+            st.dataframe(pd.DataFrame(res['portfolio']), use_container_width=True, hide_index=True)
+    if res.get('lns'):
+        trajetoria = res['lns']
+        aceitas = sum(1 for it in trajetoria[1:] if it['aceito'])
+        st.caption(
+            f"Busca por vizinhanças: custo inicial {trajetoria[0]['objetivo']:.0f}, "
+            f"{len(trajetoria) - 1} iterações ({aceitas} melhoraram) em {trajetoria[-1]['tempo']:.1f}s"
+        )
 
     # Só exibe se os dados ainda baterem
     if res['turmas'].keys() == turmas_totais.keys():
         exibir_detalhes_custo(res['detalhes'])
-        exibir_estatisticas(res['grade'], dias_semana, res['vars'])
-        exibir_horarios_na_tela(res['turmas'], dias_semana, res['vars'], res['grade'])
+        exibir_estatisticas(res['assinatura'], res['grade'], dias_semana, res['quadro'])
+        exibir_horarios_na_tela(res['assinatura'], res['turmas'], dias_semana, res['quadro'], res['grade'])
 
-        pdf_bytes = gerar_pdf_bytes(res['turmas'], res['grade'], dias_semana, res['vars'])
+        # Gerados só no clique (em outra thread) e guardados pela assinatura
         st.download_button(
             label="📥 Baixar PDF Final",
-            data=pdf_bytes,
+            data=lambda: pdf_horario(res['assinatura'], res['turmas'], res['grade'], dias_semana, res['quadro']),
             file_name="Horario_Escolar_Final.pdf",
             mime="application/pdf"
         )
+        st.download_button(
+            label="💾 Baixar Horário (JSON)",
+            data=lambda: json_horario(res['assinatura'], res['custo'], dias_semana, res['vars'], res['detalhes']),
+            file_name="Horario_Escolar.json",
+            mime="application/json",
+            help="Guarde este arquivo para usar como ponto de partida no próximo cálculo."
+        )
     else:
         st.warning("⚠️ Os dados do arquivo mudaram. Gere o horário novamente.")
@@ -0,0 +1,26 @@
+# Núcleo do gerador de horários, sem dependência do Streamlit.
+# Pode ser importado por scripts, pela linha de comando (python -m horario)
+# ou pelo app.py.
+from .dados import (
+    DIAS_SEMANA,
+    ErroPlanilha,
+    carregar_agrupamentos,
+    carregar_dados,
+    gerar_modelo_exemplo,
+    ler_abas,
+    ler_agrupamentos,
+    normalizar_texto,
+)
+from .cache import CachePlanilhas, carregar_agrupamentos_em_cache, carregar_dados_em_cache
+from .capacidade import calcular_capacidade
+from .diagnostico import diagnosticar, verificacoes_rapidas
+from .modelo import CODIFICACOES_JANELA, FORMULACOES, REGRAS_AGRUPAMENTO, ModeloHorario, construir_modelo
+from .solver import OBJETIVOS, resolver_horario, resolver_lexicografico, resolver_modelo
+from .decomposicao import componentes, resolver_decomposto
+from .perfis import PERFIS, parametros_perfil
+from .metricas import metricas_prometheus
+from .quadro import QuadroHorario, assinatura_horario, indexar_horario
+from .exportar import gerar_excel_bytes, gerar_json, gerar_pdf_bytes, ler_json, tabela_turma
+from .sintetico import gerar_escola, gerar_planilha_rede
+from .comparacao import comparar_configuracoes
+from .benchmark import CENARIOS, executar_benchmark
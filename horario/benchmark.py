@@ -0,0 +1,141 @@
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import time
+
+try:
+    import resource
+except ImportError:  # Windows: sem pico de memória
+    resource = None
+
+import ortools
+import pandas as pd
+
+from .exportar import gerar_pdf_bytes, tabela_turma
+from .modelo import construir_modelo
+from .quadro import QuadroHorario
+from .sintetico import gerar_escola
+from .solver import resolver_modelo
+
+
+# Escolas sintéticas padrão (argumentos de gerar_escola mais 'agrupar',
+# que liga a restrição de mesmo dia para Artes e Ed. Física, e
+# 'aulas_vagas', o limite de janelas por dia de todos os professores)
+CENARIOS = {
+    "pequena": {"n_turmas": 5},
+    "media": {"n_turmas": 15, "densidade_indisponibilidade": 0.1},
+    "grande": {"n_turmas": 30, "densidade_indisponibilidade": 0.1, "agrupar": True},
+    "rede": {"n_turmas": 60, "densidade_indisponibilidade": 0.2, "agrupar": True, "aulas_vagas": 1},
+}
+
+
+def _commit_atual():
+    # Para comparar linhas do arquivo de resultados entre commits
+    try:
+        pasta = os.path.dirname(os.path.abspath(__file__))
+        saida = subprocess.run(["git", "describe", "--always", "--dirty"], cwd=pasta,
+                               capture_output=True, text=True, timeout=5)
+        return saida.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def _medir_cenario(nome, parametros, tempo_limite, num_workers, opcoes_modelo, semente):
+    # Roda num processo novo: o pico de memória (ru_maxrss) é só deste cenário
+    parametros = dict(parametros)
+    agrupar = parametros.pop("agrupar", False)
+    aulas_vagas = parametros.pop("aulas_vagas", 0)
+    tempos = {}
+
+    inicio = time.perf_counter()
+    turmas_totais, grade_aulas, dias_semana, bloqueios_globais = gerar_escola(semente=semente, **parametros)
+    tempos["geracao"] = time.perf_counter() - inicio
+
+    profs = set(item['prof'] for item in grade_aulas)
+    m = construir_modelo(
+        turmas_totais, grade_aulas, dias_semana, bloqueios_globais,
+        materias_para_agrupar=[["Artes", "Ed. Física"]] if agrupar else None,
+        mapa_aulas_vagas={prof: aulas_vagas for prof in profs},
+        **opcoes_modelo
+    )
+    tempos["construcao"] = m.estatisticas["tempo_construcao"]
+
+    status, vars_resolvidas, custo, _ = resolver_modelo(
+        m, tempo_limite=tempo_limite, num_workers=num_workers, log_progresso=False
+    )
+    e = m.estatisticas
+    tempos["solver"] = e["tempo_solver"]
+
+    inicio = time.perf_counter()
+    quadro = QuadroHorario(vars_resolvidas)
+    for turma in turmas_totais:
+        tabela_turma(turma, turmas_totais, grade_aulas, dias_semana, quadro)
+    tempos["telas"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    pdf = gerar_pdf_bytes(turmas_totais, grade_aulas, dias_semana, quadro).getvalue()
+    tempos["pdf"] = time.perf_counter() - inicio
+
+    return {
+        "cenario": nome,
+        "turmas": len(turmas_totais),
+        "professores": len(profs),
+        "itens_grade": len(grade_aulas),
+        "bloqueios": sum(len(b) for b in bloqueios_globais.values()),
+        "variaveis": e["variaveis"],
+        "restricoes": e["restricoes"],
+        "status": e["status_solver"],
+        "objetivo": custo if status == "OK" else None,
+        "limite": e["limite"],
+        "primeira_solucao_s": e["tempo_primeira_solucao"],
+        **{f"{etapa}_s": round(t, 4) for etapa, t in tempos.items()},
+        "total_s": round(sum(tempos.values()), 4),
+        "pdf_kb": round(len(pdf) / 1024, 1),
+        "familias": {
+            f["familia"]: {"variaveis": f["variaveis"], "restricoes": f["restricoes"], "tempo_s": round(f["tempo"], 4)}
+            for f in e["familias"]
+        },
+        # Linux devolve KB
+        "pico_memoria_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1) if resource else None
+    }
+
+def executar_benchmark(
+    cenarios,
+    tempo_limite=30,
+    num_workers=8,
+    opcoes_modelo=None,
+    semente=0,
+    arquivo=None
+):
+    # cenarios: {nome: parâmetros} (ex: CENARIOS ou parte dele). Cada um
+    # roda num processo separado; as linhas ganham commit, data e versões
+    # e, com 'arquivo', são acrescentadas a ele em JSON Lines.
+    contexto = multiprocessing.get_context("spawn")
+    comum = {
+        "commit": _commit_atual(),
+        "data": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "ortools": ortools.__version__,
+        "cpus": os.cpu_count(),
+        "tempo_limite": tempo_limite,
+        "num_workers": num_workers,
+        "semente": semente,
+        "opcoes": opcoes_modelo or {}
+    }
+    linhas = []
+    for nome, parametros in cenarios.items():
+        with contexto.Pool(1) as pool:
+            linha = pool.apply(_medir_cenario, (nome, parametros, tempo_limite, num_workers,
+                                                opcoes_modelo or {}, semente))
+        linha = dict(comum, parametros=parametros, **linha)
+        linhas.append(linha)
+        if arquivo:
+            with open(arquivo, "a", encoding="utf-8") as f:
+                f.write(json.dumps(linha, ensure_ascii=False) + "\n")
+    return linhas
+
+def ler_resultados(arquivo):
+    # Arquivo de executar_benchmark como DataFrame, uma linha por execução
+    return pd.read_json(arquivo, lines=True)
@@ -0,0 +1,148 @@
+import hashlib
+import io
+import logging
+import marshal
+import os
+import sys
+import tempfile
+import zlib
+
+from .dados import ErroPlanilha, carregar_agrupamentos, carregar_dados
+
+
+logger = logging.getLogger("horario.cache")
+
+# Sobe quando carregar_dados mudar o que devolve: entradas antigas são ignoradas
+VERSAO_ENTRADA = 1
+# O formato do marshal muda entre versões do Python; entra no nome do arquivo
+_SUFIXO = f".v{VERSAO_ENTRADA}.py{sys.version_info[0]}{sys.version_info[1]}.bin"
+
+
+def _pasta_padrao():
+    if os.environ.get("HORARIO_CACHE_DIR"):
+        return os.environ["HORARIO_CACHE_DIR"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "horario", "planilhas")
+
+def _limite_padrao():
+    return int(float(os.environ.get("HORARIO_CACHE_MB", 200)) * 1024 * 1024)
+
+def ler_bytes(arquivo_upload):
+    # Mesmas origens aceitas por carregar_dados: caminho, bytes, UploadedFile
+    # do Streamlit ou qualquer arquivo aberto
+    if isinstance(arquivo_upload, (bytes, bytearray)):
+        return bytes(arquivo_upload)
+    if isinstance(arquivo_upload, (str, os.PathLike)):
+        # Caminho inexistente ou ilegível falha como em carregar_dados
+        try:
+            with open(arquivo_upload, 'rb') as f:
+                return f.read()
+        except OSError as e:
+            raise ErroPlanilha(f"Erro ao ler Excel: {e}") from e
+    if hasattr(arquivo_upload, 'getvalue'):
+        return arquivo_upload.getvalue()
+    arquivo_upload.seek(0)
+    return arquivo_upload.read()
+
+
+class CachePlanilhas:
+    # Entradas já lidas por carregar_dados (e carregar_agrupamentos),
+    # gravadas em disco com o SHA-256 do arquivo como nome. Vale entre
+    # sessões, processos e a linha de comando; reenviar a mesma planilha
+    # não passa de novo pelo openpyxl.
+    # Formato: marshal (só tipos básicos, sem executar código como o pickle)
+    # comprimido com zlib. Passando de 'limite_bytes', os arquivos usados
+    # há mais tempo são apagados.
+    def __init__(self, pasta=None, limite_bytes=None):
+        self.pasta = pasta or _pasta_padrao()
+        self.limite_bytes = limite_bytes or _limite_padrao()
+
+    def _caminho(self, chave):
+        return os.path.join(self.pasta, chave + _SUFIXO)
+
+    def _ler(self, chave, conferir):
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, 'rb') as f:
+                entrada = conferir(marshal.loads(zlib.decompress(f.read())))
+            # Marca como usado agora, para a remoção por antiguidade
+            os.utime(caminho)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, EOFError, TypeError, KeyError, zlib.error) as e:
+            logger.warning("Cache de planilha ilegível (%s), lendo de novo: %s", caminho, e)
+            return None
+        return entrada
+
+    def obter(self, chave):
+        def conferir(entrada):
+            turmas_totais, grade_aulas, dias_semana, bloqueios_globais = entrada
+            return turmas_totais, grade_aulas, dias_semana, bloqueios_globais
+        return self._ler(chave, conferir)
+
+    def gravar(self, chave, entrada):
+        try:
+            os.makedirs(self.pasta, exist_ok=True)
+            conteudo = zlib.compress(marshal.dumps(entrada))
+            # Grava num temporário e renomeia: quem lê ao mesmo tempo nunca
+            # vê um arquivo pela metade
+            fd, temporario = tempfile.mkstemp(dir=self.pasta, suffix=".tmp")
+            with os.fdopen(fd, 'wb') as f:
+                f.write(conteudo)
+            os.replace(temporario, self._caminho(chave))
+        except OSError as e:
+            logger.warning("Não foi possível gravar o cache de planilhas em %s: %s", self.pasta, e)
+            return
+        self._remover_excesso()
+
+    def _remover_excesso(self):
+        arquivos = []
+        for nome in os.listdir(self.pasta):
+            if not nome.endswith(".bin"):
+                continue
+            caminho = os.path.join(self.pasta, nome)
+            try:
+                info = os.stat(caminho)
+            except FileNotFoundError:
+                continue
+            arquivos.append((info.st_mtime, info.st_size, caminho))
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        for _, tamanho, caminho in sorted(arquivos):
+            if total <= self.limite_bytes:
+                break
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+            total -= tamanho
+
+    def carregar(self, arquivo_upload):
+        # carregar_dados com cache. ErroPlanilha não é guardada.
+        conteudo = ler_bytes(arquivo_upload)
+        chave = hashlib.sha256(conteudo).hexdigest()
+        entrada = self.obter(chave)
+        if entrada is not None:
+            logger.info("Planilha %s... lida do cache", chave[:12])
+            return entrada
+        entrada = carregar_dados(io.BytesIO(conteudo))
+        self.gravar(chave, entrada)
+        return entrada
+
+    def carregar_agrupamentos(self, arquivo_upload):
+        # carregar_agrupamentos com cache, na mesma pasta: com a planilha já
+        # vista, nem a aba Agrupamentos faz abrir o arquivo de novo
+        conteudo = ler_bytes(arquivo_upload)
+        chave = hashlib.sha256(conteudo).hexdigest() + "-agrupamentos"
+        grupos = self._ler(chave, lambda grupos: [{'regra': g['regra'], 'materias': list(g['materias'])} for g in grupos])
+        if grupos is not None:
+            return grupos
+        grupos = carregar_agrupamentos(io.BytesIO(conteudo))
+        self.gravar(chave, grupos)
+        return grupos
+
+
+def carregar_dados_em_cache(arquivo_upload, pasta=None, limite_bytes=None):
+    return CachePlanilhas(pasta, limite_bytes).carregar(arquivo_upload)
+
+def carregar_agrupamentos_em_cache(arquivo_upload, pasta=None, limite_bytes=None):
+    return CachePlanilhas(pasta, limite_bytes).carregar_agrupamentos(arquivo_upload)
@@ -0,0 +1,38 @@
+import pandas as pd
+
+
+def calcular_capacidade(grade_aulas, bloqueios_globais):
+    # Compara a carga de cada professor com os horários livres da semana.
+    # Retorna a tabela de análise e se não há nenhum caso crítico.
+    carga_prof = {}
+    for item in grade_aulas:
+        p = item['prof']
+        if p not in carga_prof: carga_prof[p] = 0
+        carga_prof[p] += item['qtd']
+
+    erros_fatais = False
+    max_slots_semana = 30
+    logs = []
+
+    for prof, carga_total in carga_prof.items():
+        bloqueios = 0
+        if prof in bloqueios_globais:
+            bloqueios_uteis = 0
+            for (d, a) in bloqueios_globais[prof]:
+                if a < 6: bloqueios_uteis += 1
+            bloqueios = bloqueios_uteis
+
+        disponivel = max_slots_semana - bloqueios
+        saldo = disponivel - carga_total
+        status = "✅ OK"
+
+        if saldo < 0:
+            status = "❌ CRÍTICO"
+            erros_fatais = True
+        elif saldo < 2:
+            status = "⚠️ Apertado"
+
+        logs.append([prof, carga_total, disponivel, saldo, status])
+
+    df_logs = pd.DataFrame(logs, columns=["Professor", "Carga", "Livre", "Saldo", "Status"])
+    return df_logs, not erros_fatais
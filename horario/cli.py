@@ -0,0 +1,600 @@
+import argparse
+import io
+import logging
+import os
+import time
+
+import pandas as pd
+
+from .benchmark import CENARIOS, executar_benchmark, ler_resultados
+from .cache import carregar_agrupamentos_em_cache, carregar_dados_em_cache
+from .capacidade import calcular_capacidade
+from .comparacao import OPCOES_MODELO, combinacoes, comparar_configuracoes
+from .dados import ErroPlanilha, carregar_agrupamentos, carregar_dados, ler_abas, ler_abas_por_linha
+from .decomposicao import componentes, resolver_decomposto
+from .diagnostico import diagnosticar, verificacoes_rapidas
+from .exportar import gerar_excel_bytes, gerar_json, gerar_pdf_bytes, ler_json
+from .incremental import resolver_incremental
+from .lns import ESTRATEGIAS, resolver_lns
+from .metricas import metricas_prometheus
+from .sintetico import gerar_escola, gerar_planilha_rede
+from .modelo import CODIFICACOES_JANELA, FORMULACOES, construir_modelo, normalizar_agrupamentos
+from .perfis import PERFIS, parametros_perfil
+from .portfolio import configuracoes_portfolio, resolver_portfolio
+from .quadro import QuadroHorario
+from .solver import OBJETIVOS, resolver_lexicografico, resolver_modelo
+
+
+FORMATOS = ('pdf', 'xlsx', 'json')
+
+
+def _lista_formatos(texto):
+    formatos = [f.strip().lower() for f in texto.split(',') if f.strip()]
+    invalidos = [f for f in formatos if f not in FORMATOS]
+    if invalidos:
+        raise argparse.ArgumentTypeError(f"formato(s) inválido(s): {', '.join(invalidos)}")
+    return formatos
+
+def _grupo_materias(texto):
+    return [m.strip() for m in texto.split(',') if m.strip()]
+
+def _lista_estrategias(texto):
+    estrategias = [e.strip().lower() for e in texto.split(',') if e.strip()]
+    invalidas = [e for e in estrategias if e not in ESTRATEGIAS]
+    if invalidas or not estrategias:
+        raise argparse.ArgumentTypeError(f"estratégia(s) inválida(s): {', '.join(invalidas) or texto}")
+    return estrategias
+
+def _montar_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m horario",
+        description="Gerador de horários escolares sem interface gráfica."
+    )
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("resolver", help="Lê a planilha, calcula o horário e grava os arquivos de saída")
+    p.add_argument("planilha", help="Arquivo .xlsx com as abas Turmas e Grade_Curricular")
+    p.add_argument("-o", "--saida", default=".", help="Pasta onde os resultados serão gravados (padrão: pasta atual)")
+    p.add_argument("--nome", default=None, help="Prefixo dos arquivos gerados (padrão: nome da planilha)")
+    p.add_argument("--formatos", type=_lista_formatos, default=list(FORMATOS),
+                   help="Lista separada por vírgula entre pdf, xlsx e json (padrão: todos)")
+    p.add_argument("--agrupar", type=_grupo_materias, action="append", default=[],
+                   metavar="MAT1,MAT2", help="Matérias que devem ocorrer no mesmo dia (pode repetir)")
+    p.add_argument("--separar", type=_grupo_materias, action="append", default=[],
+                   metavar="MAT1,MAT2", help="Matérias que devem ficar em dias diferentes (pode repetir)")
+    p.add_argument("--aulas-vagas", type=int, default=0,
+                   help="Limite de janelas por dia para todos os professores (padrão: 0, igual à tela)")
+    p.add_argument("--formulacao", choices=FORMULACOES, default="booleana",
+                   help="Formulação do modelo (padrão: booleana)")
+    p.add_argument("--janelas", choices=CODIFICACOES_JANELA, default="span",
+                   help="Codificação da restrição de janelas dos professores (padrão: span)")
+    p.add_argument("--quebrar-simetria", action="store_true",
+                   help="Ordena turmas equivalentes para podar buscas repetidas")
+    p.add_argument("--redundantes", action="store_true",
+                   help="Acrescenta contagens por dia implicadas pela grade (provam inviabilidade mais cedo)")
+    p.add_argument("--objetivo", choices=OBJETIVOS, default="ponderado",
+                   help="'lexicografico' otimiza uma família de penalidade por vez, da mais pesada "
+                        "para a mais leve (não vale com --lns nem --portfolio)")
+    p.add_argument("--anterior", metavar="JSON",
+                   help="Horário anterior (JSON gerado por este comando) usado como ponto de partida")
+    p.add_argument("--peso-mudanca", type=int, default=0,
+                   help="Custo por aula que sair do lugar do horário anterior (padrão: 0, só dica)")
+    p.add_argument("--planilha-anterior", metavar="XLSX",
+                   help="Planilha que gerou o --anterior; recalcula só as turmas afetadas pela diferença")
+    p.add_argument("--lns", action="store_true",
+                   help="Busca por vizinhanças: depois da 1ª solução, reotimiza um pedaço do horário por vez")
+    p.add_argument("--tempo-iteracao", type=float, default=5,
+                   help="Tempo máximo de cada iteração do --lns em segundos (padrão: 5)")
+    p.add_argument("--estrategias", type=_lista_estrategias, default=list(ESTRATEGIAS),
+                   help=f"Vizinhanças do --lns, separadas por vírgula (padrão: {','.join(ESTRATEGIAS)})")
+    p.add_argument("--trajetoria", metavar="CSV",
+                   help="Grava o custo de cada iteração do --lns neste arquivo")
+    p.add_argument("--portfolio", type=int, metavar="N", default=0,
+                   help="Roda N configurações do CP-SAT em processos separados e fica com o melhor "
+                        "(--workers é dividido entre elas)")
+    p.add_argument("--rodadas", type=int, default=1,
+                   help="Divide o --tempo do --portfolio em rodadas; cada uma parte do melhor horário anterior")
+    p.add_argument("--estatisticas", metavar="CSV",
+                   help="Grava as estatísticas por configuração do --portfolio neste arquivo")
+    p.add_argument("--sem-decompor", action="store_true",
+                   help="Resolve tudo num modelo só mesmo se houver grupos de turmas sem professor em comum")
+    p.add_argument("--perfil", choices=sorted(PERFIS), default="padrao",
+                   help="Define tempo, workers, gap e estagnação pelo tamanho da escola e CPUs da máquina "
+                        "(as opções abaixo têm precedência)")
+    p.add_argument("--tempo", type=float, default=None, help="Tempo máximo do solver em segundos")
+    p.add_argument("--workers", type=int, default=None, help="Número de workers do CP-SAT")
+    p.add_argument("--gap", type=float, default=None,
+                   help="Para ao atingir esse gap relativo (ex: 0.02 para 2%%)")
+    p.add_argument("--estagnacao", type=float, default=None,
+                   help="Para se o custo não melhorar por esse número de segundos")
+    p.add_argument("--log", action="store_true", help="Mostra o log de busca do CP-SAT")
+    p.add_argument("--progresso", action="store_true",
+                   help="Imprime cada solução melhor como uma linha JSON (logger horario.progresso)")
+    p.add_argument("--sem-cache", action="store_true",
+                   help="Lê a planilha de novo mesmo que ela já esteja no cache (HORARIO_CACHE_DIR)")
+    p.add_argument("--familias", action="store_true",
+                   help="Mostra variáveis, restrições e tempo de construção de cada família de restrições")
+    p.add_argument("--metricas", metavar="ARQUIVO",
+                   help="Grava tamanho do modelo por família e tempos no formato texto do Prometheus")
+    p.add_argument("--nomes-variaveis", action="store_true",
+                   help="Dá nomes legíveis às variáveis do CP-SAT (depuração; deixa a construção mais lenta)")
+    p.add_argument("--ignorar-capacidade", action="store_true",
+                   help="Resolve mesmo com professores em saldo negativo ou grade impossível")
+
+    p = sub.add_parser("comparar", help="Resolve a mesma escola com várias configurações do modelo")
+    origem = p.add_mutually_exclusive_group(required=True)
+    origem.add_argument("--planilha", help="Arquivo .xlsx da escola")
+    origem.add_argument("--sintetica", type=int, metavar="TURMAS",
+                        help="Gera uma escola sintética com esse número de turmas")
+    p.add_argument("--densidade", type=float, default=0.1,
+                   help="Fração de horários indisponíveis por professor na escola sintética")
+    p.add_argument("--semente", type=int, default=0, help="Semente da escola sintética")
+    p.add_argument("--variar", action="append", choices=sorted(OPCOES_MODELO), required=True,
+                   help="Opção do modelo a variar (pode repetir; testa todas as combinações)")
+    p.add_argument("--agrupar", type=_grupo_materias, action="append", default=[],
+                   metavar="MAT1,MAT2", help="Matérias que devem ocorrer no mesmo dia (pode repetir)")
+    p.add_argument("--separar", type=_grupo_materias, action="append", default=[],
+                   metavar="MAT1,MAT2", help="Matérias que devem ficar em dias diferentes (pode repetir)")
+    p.add_argument("--aulas-vagas", type=int, default=0, help="Limite de janelas por dia para todos")
+    p.add_argument("--tempo", type=float, default=45, help="Tempo máximo do solver por configuração")
+    p.add_argument("--workers", type=int, default=8, help="Número de workers do CP-SAT")
+    p.add_argument("--csv", help="Grava a tabela de comparação neste arquivo")
+    p.add_argument("--sem-cache", action="store_true", help="Lê a planilha de novo mesmo que ela já esteja no cache")
+
+    p = sub.add_parser("medir-leitura", help="Mede a leitura da planilha numa rede sintética grande")
+    p.add_argument("--linhas", type=int, default=10000, help="Linhas da aba Grade_Curricular")
+    p.add_argument("--semente", type=int, default=0, help="Semente da planilha sintética")
+    p.add_argument("--repeticoes", type=int, default=3, help="Fica com o melhor tempo de N execuções")
+
+    p = sub.add_parser("benchmark", help="Mede construção, solver, telas e PDF em escolas sintéticas")
+    p.add_argument("--cenarios", type=_lista_cenarios, default=["pequena", "media"],
+                   help=f"Cenários separados por vírgula ({', '.join(CENARIOS)}); padrão: pequena,media")
+    p.add_argument("--turmas", type=int, help="Cenário próprio com este número de turmas (no lugar de --cenarios)")
+    p.add_argument("--materias", type=int, help="Matérias por turma no cenário próprio (até 10)")
+    p.add_argument("--carga-max-prof", type=int, default=20, help="Carga máxima por professor no cenário próprio")
+    p.add_argument("--densidade", type=float, default=0.1, help="Indisponibilidade no cenário próprio")
+    p.add_argument("--agrupar", action="store_true", help="Artes e Ed. Física no mesmo dia no cenário próprio")
+    p.add_argument("--aulas-vagas", type=int, default=0, help="Limite de janelas por dia no cenário próprio")
+    p.add_argument("--semente", type=int, default=0, help="Semente das escolas sintéticas")
+    p.add_argument("--formulacao", choices=FORMULACOES, default="booleana")
+    p.add_argument("--janelas", choices=CODIFICACOES_JANELA, default="span")
+    p.add_argument("--redundantes", action="store_true")
+    p.add_argument("--quebrar-simetria", action="store_true")
+    p.add_argument("--nomes-variaveis", action="store_true", help="Variáveis do CP-SAT com nomes legíveis")
+    p.add_argument("--tempo", type=float, default=30, help="Tempo máximo do solver por cenário")
+    p.add_argument("--workers", type=int, default=8, help="Número de workers do CP-SAT")
+    p.add_argument("--saida", default="benchmark.jsonl",
+                   help="Arquivo JSON Lines onde os resultados são acrescentados (padrão: benchmark.jsonl)")
+    p.add_argument("--historico", action="store_true",
+                   help="Só mostra o arquivo --saida comparando os commits, sem rodar nada")
+    return parser
+
+def _lista_cenarios(texto):
+    nomes = [n.strip() for n in texto.split(',') if n.strip()]
+    invalidos = [n for n in nomes if n not in CENARIOS]
+    if invalidos:
+        raise argparse.ArgumentTypeError(f"cenário(s) desconhecido(s): {', '.join(invalidos)}")
+    return nomes
+
+def _ler_planilha(args, caminho):
+    if args.sem_cache:
+        return carregar_dados(caminho)
+    return carregar_dados_em_cache(caminho)
+
+def _agrupamentos(args):
+    # Grupos da aba Agrupamentos mais os de --agrupar e --separar
+    # (escola sintética do 'comparar': só os da linha de comando)
+    if not args.planilha:
+        grupos = []
+    elif args.sem_cache:
+        grupos = carregar_agrupamentos(args.planilha)
+    else:
+        grupos = carregar_agrupamentos_em_cache(args.planilha)
+    grupos += [g for g in args.agrupar if len(g) >= 2]
+    grupos += [{"regra": "dias_diferentes", "materias": g} for g in args.separar if len(g) >= 2]
+    return normalizar_agrupamentos(grupos)
+
+def _comando_resolver(args):
+    if args.progresso:
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.nomes_variaveis:
+        # Pelo ambiente chega também aos processos de decomposição/portfólio
+        os.environ["HORARIO_NOMES_VARIAVEIS"] = "1"
+    inicio = time.perf_counter()
+    try:
+        turmas_totais, grade_aulas, dias_semana, bloqueios_globais = _ler_planilha(args, args.planilha)
+        agrupamentos = _agrupamentos(args)
+    except ErroPlanilha as e:
+        print(e)
+        return 2
+
+    df_capacidade, capacidade_ok = calcular_capacidade(grade_aulas, bloqueios_globais)
+    if not capacidade_ok:
+        criticos = df_capacidade[df_capacidade["Saldo"] < 0]
+        print("Existem professores com SALDO NEGATIVO:")
+        print(criticos.to_string(index=False))
+        if not args.ignorar_capacidade:
+            return 1
+
+    problemas = verificacoes_rapidas(turmas_totais, grade_aulas, dias_semana, bloqueios_globais)
+    if problemas:
+        print("A grade é impossível de cumprir:")
+        for p in problemas:
+            print(f"  [{p['Tipo']}] {p['Descrição']}")
+        if not args.ignorar_capacidade:
+            return 1
+
+    perfil = parametros_perfil(args.perfil, turmas_totais, grade_aulas, dias_semana, bloqueios_globais)
+    if args.tempo is None:
+        args.tempo = perfil["tempo_limite"]
+    if args.workers is None:
+        args.workers = perfil["num_workers"]
+    if args.gap is None:
+        args.gap = perfil["gap_aceitavel"]
+    if args.estagnacao is None and PERFIS[args.perfil]["estagnacao"]:
+        # Fração do tempo em vigor (o do --tempo, se veio), não do tempo do perfil
+        args.estagnacao = round(PERFIS[args.perfil]["estagnacao"] * args.tempo, 1)
+    print(f"Perfil {PERFIS[args.perfil]['nome']}: {args.tempo:.0f}s, {args.workers} workers, "
+          f"gap {args.gap or 0:.0%}, estagnação "
+          + (f"{args.estagnacao:.0f}s" if args.estagnacao else "desligada"))
+
+    if agrupamentos:
+        print("Grupos de matérias: " + "; ".join(
+            f"{', '.join(g['materias'])} ({g['regra'].replace('_', ' ')})" for g in agrupamentos
+        ))
+
+    profs = set(item['prof'] for item in grade_aulas)
+    mapa_aulas_vagas = {prof: args.aulas_vagas for prof in profs}
+
+    solucao_anterior = None
+    if args.anterior:
+        with open(args.anterior, 'rb') as f:
+            solucao_anterior = ler_json(f.read(), dias_semana)
+
+    # Os outros caminhos (incremental, LNS, portfólio, decomposição) montam
+    # os próprios modelos; o relatório usa o modelo da escola inteira
+    modelo_relatorio = None
+    if args.familias or args.metricas:
+        modelo_relatorio = construir_modelo(
+            turmas_totais,
+            grade_aulas,
+            dias_semana,
+            bloqueios_globais,
+            materias_para_agrupar=agrupamentos,
+            mapa_aulas_vagas=mapa_aulas_vagas,
+            formulacao=args.formulacao,
+            solucao_anterior=solucao_anterior,
+            peso_mudanca=args.peso_mudanca,
+            quebrar_simetria=args.quebrar_simetria,
+            restricoes_redundantes=args.redundantes,
+            janelas=args.janelas
+        )
+        if args.familias:
+            df = pd.DataFrame(modelo_relatorio.estatisticas["familias"])
+            df["tempo"] = df["tempo"].round(4)
+            print(df.to_string(index=False))
+        if args.metricas:
+            _gravar_metricas(args, modelo_relatorio)
+
+    if args.planilha_anterior:
+        if solucao_anterior is None:
+            print("--planilha-anterior exige --anterior com o horário gerado a partir dela")
+            return 2
+        try:
+            entrada_anterior = _ler_planilha(args, args.planilha_anterior)
+        except ErroPlanilha as e:
+            print(e)
+            return 2
+        status, vars_resolvidas, custo, auditoria, info = resolver_incremental(
+            (turmas_totais, grade_aulas, dias_semana, bloqueios_globais),
+            solucao_anterior,
+            entrada_anterior,
+            materias_para_agrupar=agrupamentos,
+            mapa_aulas_vagas=mapa_aulas_vagas,
+            tempo_limite=args.tempo,
+            num_workers=args.workers,
+            log_progresso=args.log,
+            gap_aceitavel=args.gap,
+            formulacao=args.formulacao,
+            peso_mudanca=args.peso_mudanca,
+            quebrar_simetria=args.quebrar_simetria,
+            restricoes_redundantes=args.redundantes,
+            janelas=args.janelas,
+            estagnacao=args.estagnacao,
+            objetivo=args.objetivo
+        )
+        for i, rodada in enumerate(info["rodadas"], start=1):
+            print(f"Rodada {i}: {rodada['turmas_livres']} turmas e {rodada['profs_livres']} professores livres, "
+                  f"{rodada['variaveis_fixadas']} variáveis fixas, {rodada['tempo_solver']:.2f}s "
+                  f"({rodada['status_solver']})")
+        return _gravar_resultados(args, inicio, status, vars_resolvidas, custo, auditoria,
+                                  turmas_totais, grade_aulas, dias_semana, bloqueios_globais, solucao_anterior)
+
+    if args.objetivo != "ponderado" and (args.lns or args.portfolio):
+        print("--objetivo lexicografico não pode ser combinado com --lns ou --portfolio")
+        return 2
+
+    if args.lns:
+        status, vars_resolvidas, custo, auditoria, trajetoria = resolver_lns(
+            turmas_totais,
+            grade_aulas,
+            dias_semana,
+            bloqueios_globais,
+            materias_para_agrupar=agrupamentos,
+            mapa_aulas_vagas=mapa_aulas_vagas,
+            tempo_limite=args.tempo,
+            tempo_iteracao=args.tempo_iteracao,
+            estrategias=args.estrategias,
+            num_workers=args.workers,
+            log_progresso=args.log,
+            gap_aceitavel=args.gap,
+            formulacao=args.formulacao,
+            solucao_anterior=solucao_anterior,
+            peso_mudanca=args.peso_mudanca,
+            quebrar_simetria=args.quebrar_simetria,
+            restricoes_redundantes=args.redundantes,
+            janelas=args.janelas,
+            estagnacao=args.estagnacao
+        )
+        if trajetoria:
+            aceitas = sum(1 for it in trajetoria[1:] if it['aceito'])
+            print(f"LNS: custo inicial {trajetoria[0]['objetivo']:.0f}, {len(trajetoria) - 1} iterações "
+                  f"({aceitas} melhoraram)")
+            if args.trajetoria:
+                colunas = ["solucao", "tempo", "estrategia", "vizinhanca", "objetivo", "aceito", "limite", "gap"]
+                pd.DataFrame(trajetoria, columns=colunas).to_csv(args.trajetoria, index=False)
+        return _gravar_resultados(args, inicio, status, vars_resolvidas, custo, auditoria,
+                                  turmas_totais, grade_aulas, dias_semana, bloqueios_globais, solucao_anterior)
+
+    if args.portfolio:
+        status, vars_resolvidas, custo, auditoria, estatisticas = resolver_portfolio(
+            turmas_totais,
+            grade_aulas,
+            dias_semana,
+            bloqueios_globais,
+            materias_para_agrupar=agrupamentos,
+            mapa_aulas_vagas=mapa_aulas_vagas,
+            tempo_limite=args.tempo,
+            num_workers=args.workers,
+            gap_aceitavel=args.gap,
+            formulacao=args.formulacao,
+            solucao_anterior=solucao_anterior,
+            peso_mudanca=args.peso_mudanca,
+            quebrar_simetria=args.quebrar_simetria,
+            restricoes_redundantes=args.redundantes,
+            janelas=args.janelas,
+            estagnacao=args.estagnacao,
+            configuracoes=configuracoes_portfolio(args.portfolio),
+            rodadas=args.rodadas
+        )
+        df = pd.DataFrame(estatisticas)
+        print(df.to_string(index=False))
+        if args.estatisticas:
+            df.to_csv(args.estatisticas, index=False)
+        return _gravar_resultados(args, inicio, status, vars_resolvidas, custo, auditoria,
+                                  turmas_totais, grade_aulas, dias_semana, bloqueios_globais, solucao_anterior)
+
+    grupos = componentes(turmas_totais, grade_aulas)
+    if len(grupos) > 1 and not args.sem_decompor:
+        print(f"Escola dividida em {len(grupos)} grupos de turmas sem professor em comum: "
+              + ", ".join(f"{len(g)} ({g[0]}...)" for g in grupos))
+        status, vars_resolvidas, custo, auditoria = resolver_decomposto(
+            turmas_totais,
+            grade_aulas,
+            dias_semana,
+            bloqueios_globais,
+            materias_para_agrupar=agrupamentos,
+            mapa_aulas_vagas=mapa_aulas_vagas,
+            tempo_limite=args.tempo,
+            num_workers=args.workers,
+            log_progresso=args.log,
+            gap_aceitavel=args.gap,
+            formulacao=args.formulacao,
+            solucao_anterior=solucao_anterior,
+            peso_mudanca=args.peso_mudanca,
+            quebrar_simetria=args.quebrar_simetria,
+            restricoes_redundantes=args.redundantes,
+            janelas=args.janelas,
+            estagnacao=args.estagnacao,
+            objetivo=args.objetivo
+        )
+        return _gravar_resultados(args, inicio, status, vars_resolvidas, custo, auditoria,
+                                  turmas_totais, grade_aulas, dias_semana, bloqueios_globais, solucao_anterior)
+
+    m = modelo_relatorio or construir_modelo(
+        turmas_totais,
+        grade_aulas,
+        dias_semana,
+        bloqueios_globais,
+        materias_para_agrupar=agrupamentos,
+        mapa_aulas_vagas=mapa_aulas_vagas,
+        formulacao=args.formulacao,
+        solucao_anterior=solucao_anterior,
+        peso_mudanca=args.peso_mudanca,
+        quebrar_simetria=args.quebrar_simetria,
+        restricoes_redundantes=args.redundantes,
+        janelas=args.janelas
+    )
+    resolver = resolver_lexicografico if args.objetivo == "lexicografico" else resolver_modelo
+    status, vars_resolvidas, custo, auditoria = resolver(
+        m,
+        tempo_limite=args.tempo,
+        num_workers=args.workers,
+        log_progresso=args.log,
+        gap_aceitavel=args.gap,
+        estagnacao=args.estagnacao
+    )
+    if args.metricas:
+        # Regrava com os números do solver
+        _gravar_metricas(args, m)
+    e = m.estatisticas
+    print(f"Modelo {e['formulacao']}, janelas {e['janelas']}: {e['variaveis']} variáveis, "
+          f"{e['restricoes']} restrições, "
+          f"construção {e['tempo_construcao']:.2f}s, solver {e['tempo_solver']:.2f}s ({e['status_solver']})")
+    print(f"Presolve: {e['variaveis_evitadas']} variáveis de horário não criadas por indisponibilidade, "
+          f"{e['dias_sem_janela']} dias de professor sem controle de janela")
+    maior = max(e['familias'], key=lambda f: f['restricoes'])
+    print(f"Família com mais restrições: {maior['familia']} ({maior['restricoes']} restrições, "
+          f"{maior['variaveis']} variáveis, {maior['tempo']:.2f}s; detalhes com --familias)")
+    for i, estagio in enumerate(e.get('estagios', []), start=1):
+        print(f"Estágio {i} ({estagio['estagio']}): custo {estagio['objetivo'] or 0:.0f}, "
+              f"{estagio['tempo_solver']:.2f}s ({estagio['status_solver']})")
+    if e['parada'] == "estagnacao":
+        print(f"Busca encerrada por estagnação: custo sem melhora por {args.estagnacao:.0f}s")
+    if 'secoes_ordenadas' in e:
+        print(f"Simetria: {e['secoes_ordenadas']} turmas equivalentes ordenadas")
+    return _gravar_resultados(args, inicio, status, vars_resolvidas, custo, auditoria,
+                              turmas_totais, grade_aulas, dias_semana, bloqueios_globais, solucao_anterior)
+
+def _gravar_metricas(args, m):
+    nome = args.nome or os.path.splitext(os.path.basename(args.planilha))[0]
+    with open(args.metricas, 'w', encoding='utf-8') as f:
+        f.write(metricas_prometheus(m.estatisticas, {"escola": nome}))
+
+def _gravar_resultados(args, inicio, status, vars_resolvidas, custo, auditoria,
+                       turmas_totais, grade_aulas, dias_semana, bloqueios_globais, solucao_anterior):
+    duracao = time.perf_counter() - inicio
+    if status != "OK":
+        print(f"{args.planilha}: não foi possível gerar um horário viável ({duracao:.1f}s)")
+        status_diag, culpados = diagnosticar(turmas_totais, grade_aulas, dias_semana, bloqueios_globais)
+        if culpados:
+            print(f"Conjunto mínimo de regras em conflito ({len(culpados)}):")
+            for c in culpados:
+                print(f"  [{c['Tipo']}] {c['Descrição']}")
+        elif status_diag in ("FEASIBLE", "OPTIMAL"):
+            print("As regras rígidas têm solução; falta tempo ao solver (aumente --tempo).")
+        elif status_diag != "INFEASIBLE":
+            # UNKNOWN: o diagnóstico também estourou o tempo, não prova nada
+            print("Diagnóstico inconclusivo: não deu tempo de saber se as regras rígidas têm solução.")
+        return 1
+
+    os.makedirs(args.saida, exist_ok=True)
+    nome = args.nome or os.path.splitext(os.path.basename(args.planilha))[0]
+    gravados = []
+    quadro = QuadroHorario(vars_resolvidas)
+    for formato in args.formatos:
+        caminho = os.path.join(args.saida, f"{nome}.{formato}")
+        if formato == 'pdf':
+            conteudo = gerar_pdf_bytes(turmas_totais, grade_aulas, dias_semana, quadro).getvalue()
+        elif formato == 'xlsx':
+            conteudo = gerar_excel_bytes(turmas_totais, grade_aulas, dias_semana, quadro, auditoria)
+        else:
+            conteudo = gerar_json(status, custo, dias_semana, vars_resolvidas, auditoria).encode('utf-8')
+        with open(caminho, 'wb') as f:
+            f.write(conteudo)
+        gravados.append(caminho)
+
+    if solucao_anterior:
+        mantidas = sum(1 for k in vars_resolvidas if solucao_anterior.get(k) == 1)
+        print(f"Horário anterior: {mantidas} de {len(solucao_anterior)} aulas mantidas no mesmo lugar")
+    print(f"{args.planilha}: custo {custo:.0f} em {duracao:.1f}s -> {', '.join(gravados)}")
+    return 0
+
+def _comando_comparar(args):
+    if args.planilha:
+        try:
+            entrada = _ler_planilha(args, args.planilha)
+            agrupamentos = _agrupamentos(args)
+        except ErroPlanilha as e:
+            print(e)
+            return 2
+    else:
+        entrada = gerar_escola(
+            n_turmas=args.sintetica,
+            densidade_indisponibilidade=args.densidade,
+            semente=args.semente
+        )
+        agrupamentos = _agrupamentos(args)
+
+    profs = set(item['prof'] for item in entrada[1])
+    df = comparar_configuracoes(
+        entrada,
+        combinacoes(args.variar),
+        materias_para_agrupar=agrupamentos,
+        mapa_aulas_vagas={prof: args.aulas_vagas for prof in profs},
+        tempo_limite=args.tempo,
+        num_workers=args.workers
+    )
+    print(df.to_string(index=False))
+    if args.csv:
+        df.to_csv(args.csv, index=False)
+    return 0
+
+def _comando_medir_leitura(args):
+    conteudo = gerar_planilha_rede(args.linhas, semente=args.semente)
+    inicio = time.perf_counter()
+    abas = pd.read_excel(io.BytesIO(conteudo), sheet_name=['Turmas', 'Grade_Curricular'])
+    print(f"Planilha sintética: {args.linhas} linhas, {len(conteudo) / 1024:.0f} KB, "
+          f"leitura do Excel {time.perf_counter() - inicio:.2f}s")
+
+    resultados = {}
+    for nome, ler in (("por linha", ler_abas_por_linha), ("em colunas", ler_abas)):
+        tempos = []
+        for _ in range(args.repeticoes):
+            inicio = time.perf_counter()
+            resultados[nome] = ler(abas['Turmas'], abas['Grade_Curricular'])
+            tempos.append(time.perf_counter() - inicio)
+        print(f"{nome}: {min(tempos):.3f}s")
+
+    if resultados["por linha"] != resultados["em colunas"]:
+        print("As duas leituras deram resultados DIFERENTES")
+        return 1
+    turmas_totais, grade_aulas, _, bloqueios_globais = resultados["em colunas"]
+    print(f"Mesmo resultado: {len(turmas_totais)} turmas, {len(grade_aulas)} itens de grade, "
+          f"{len(bloqueios_globais)} professores")
+    return 0
+
+def _comando_benchmark(args):
+    if not args.historico:
+        if args.turmas:
+            cenarios = {f"{args.turmas} turmas": {
+                "n_turmas": args.turmas,
+                "n_materias": args.materias,
+                "carga_max_prof": args.carga_max_prof,
+                "densidade_indisponibilidade": args.densidade,
+                "agrupar": args.agrupar,
+                "aulas_vagas": args.aulas_vagas
+            }}
+        else:
+            cenarios = {nome: CENARIOS[nome] for nome in args.cenarios}
+        linhas = executar_benchmark(
+            cenarios,
+            tempo_limite=args.tempo,
+            num_workers=args.workers,
+            opcoes_modelo=dict(
+                formulacao=args.formulacao,
+                janelas=args.janelas,
+                restricoes_redundantes=args.redundantes,
+                quebrar_simetria=args.quebrar_simetria,
+                nomes_variaveis=args.nomes_variaveis
+            ),
+            semente=args.semente,
+            arquivo=args.saida
+        )
+        colunas = ["cenario", "variaveis", "status", "objetivo", "construcao_s", "solver_s",
+                   "telas_s", "pdf_s", "pico_memoria_mb"]
+        print(pd.DataFrame(linhas)[colunas].to_string(index=False))
+        print(f"Resultados acrescentados a {args.saida}")
+
+    if not os.path.exists(args.saida):
+        print(f"{args.saida} não existe")
+        return 2
+    df = ler_resultados(args.saida)
+    # Última execução de cada cenário por commit, lado a lado
+    df["commit"] = df["commit"].fillna("?")
+    ultimas = df.groupby(["cenario", "commit"], sort=False).last()
+    historico = ultimas[["objetivo", "total_s", "pico_memoria_mb"]].unstack("commit")
+    print(historico.to_string())
+    return 0
+
+def main(argv=None):
+    args = _montar_parser().parse_args(argv)
+    if args.comando == "resolver":
+        return _comando_resolver(args)
+    if args.comando == "comparar":
+        return _comando_comparar(args)
+    if args.comando == "medir-leitura":
+        return _comando_medir_leitura(args)
+    if args.comando == "benchmark":
+        return _comando_benchmark(args)
+    return 2
@@ -0,0 +1,60 @@
+import itertools
+
+import pandas as pd
+
+from .modelo import CODIFICACOES_JANELA, FORMULACOES, construir_modelo
+from .solver import resolver_modelo
+
+
+# Opções de construir_modelo que podem ser comparadas lado a lado
+OPCOES_MODELO = {
+    "formulacao": FORMULACOES,
+    "quebrar_simetria": (False, True),
+    "restricoes_redundantes": (False, True),
+    "janelas": CODIFICACOES_JANELA,
+}
+
+
+def combinacoes(variar):
+    # ["formulacao"] -> [{"formulacao": "booleana"}, {"formulacao": "por_aula"}]
+    nomes = list(variar)
+    valores = [OPCOES_MODELO[nome] for nome in nomes]
+    return [dict(zip(nomes, combinacao)) for combinacao in itertools.product(*valores)]
+
+def rotulo_configuracao(opcoes):
+    return ", ".join(f"{k}={v}" for k, v in opcoes.items()) or "padrão"
+
+def comparar_configuracoes(
+    entrada,
+    configuracoes,
+    materias_para_agrupar=None,
+    mapa_aulas_vagas=None,
+    tempo_limite=45,
+    num_workers=8
+):
+    # entrada = (turmas_totais, grade_aulas, dias_semana, bloqueios_globais)
+    # Constrói e resolve a mesma escola com cada configuração e devolve uma
+    # linha por configuração com tamanho do modelo e tempos.
+    linhas = []
+    for opcoes in configuracoes:
+        m = construir_modelo(
+            *entrada,
+            materias_para_agrupar=materias_para_agrupar,
+            mapa_aulas_vagas=mapa_aulas_vagas,
+            **opcoes
+        )
+        resolver_modelo(m, tempo_limite=tempo_limite, num_workers=num_workers, log_progresso=False)
+        e = m.estatisticas
+        linhas.append({
+            "Configuração": rotulo_configuracao(opcoes),
+            "Variáveis": e["variaveis"],
+            "Restrições": e["restricoes"],
+            "Evitadas": e["variaveis_evitadas"],
+            "Construção (s)": round(e["tempo_construcao"], 3),
+            "1ª Solução (s)": e["tempo_primeira_solucao"],
+            "Solver (s)": round(e["tempo_solver"], 3),
+            "Status": e["status_solver"],
+            "Custo": e["objetivo"],
+            "Limite": e["limite"]
+        })
+    return pd.DataFrame(linhas)
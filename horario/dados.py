@@ -0,0 +1,293 @@
+import io
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+
+DIAS_SEMANA = ['Seg', 'Ter', 'Qua', 'Qui', 'Sex']
+
+MAPA_DIAS = {
+    'seg': 'Seg', 'ter': 'Ter', 'qua': 'Qua', 'qui': 'Qui', 'sex': 'Sex',
+    'mon': 'Seg', 'tue': 'Ter', 'wed': 'Qua', 'thu': 'Qui', 'fri': 'Sex'
+}
+
+# Aba opcional com grupos de matérias (restrição F): coluna Materias
+# ("Artes, Ed. Física") e Regra ("Mesmo dia", o padrão, ou "Dias diferentes")
+ABA_AGRUPAMENTOS = 'Agrupamentos'
+MAPA_REGRAS = {
+    '': 'mesmo_dia', 'mesmo dia': 'mesmo_dia', 'mesmo_dia': 'mesmo_dia',
+    'dias diferentes': 'dias_diferentes', 'dias_diferentes': 'dias_diferentes'
+}
+
+
+class ErroPlanilha(Exception):
+    """Planilha enviada não pôde ser lida ou não tem o formato esperado."""
+
+
+# ==========================================
+#  FUNÇÕES AUXILIARES
+# ==========================================
+def normalizar_texto(texto):
+    if not isinstance(texto, str):
+        texto = str(texto)
+    return unicodedata.normalize('NFKD', texto).encode('ASCII', 'ignore').decode('ASCII').strip().lower()
+
+def gerar_modelo_exemplo():
+    output = io.BytesIO()
+
+    dados_turmas = {
+        'Turma': ['1º Ano - Fundamental B', '6º Ano - Fundamental', '3º Médio'],
+        'Aulas_Semanais': [25, 25, 30]
+    }
+    df_t = pd.DataFrame(dados_turmas)
+
+    dados_grade = {
+        'Professor': [
+            'Prof. Márcia', 'Prof. Beto ', 'Prof. Carla ',
+            'Prof. Ana ', 'Prof. Carlos', 'Prof. Beatriz ',
+            'Prof. João ', 'Prof. Ana '
+        ],
+        'Materia': [
+            'Geografia', 'Ed. Física', 'Artes',
+            'Matemática', 'História', 'Português',
+            'Física', 'Matemática'
+        ],
+        'Turmas_Alvo': [
+            '1º Ano - Fundamental B', '1º Ano - Fundamental B', '1º Ano - Fundamental B',
+            '1º Ano - Fundamental B, 3º Médio', '6º Ano - Fundamental', '6º Ano - Fundamental',
+            '3º Médio', '3º Médio'
+        ],
+        'Aulas_Por_Turma': [
+            21, 2, 2,
+            5, 3, 4,
+            4, 5
+        ],
+        'Indisponibilidade': [
+            '', '', 'sex',
+            '', 'seg:1, seg:2', '',
+            'ter:5', ''
+        ]
+    }
+    df_g = pd.DataFrame(dados_grade)
+
+    dados_agrupamentos = {
+        'Materias': ['Artes, Ed. Física', 'Matemática, Física'],
+        'Regra': ['Mesmo dia', 'Dias diferentes']
+    }
+    df_a = pd.DataFrame(dados_agrupamentos)
+
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        df_t.to_excel(writer, sheet_name='Turmas', index=False)
+        df_g.to_excel(writer, sheet_name='Grade_Curricular', index=False)
+        df_a.to_excel(writer, sheet_name=ABA_AGRUPAMENTOS, index=False)
+        worksheet = writer.sheets['Grade_Curricular']
+        worksheet.set_column('A:A', 25)
+        worksheet.set_column('C:C', 20)
+        writer.sheets[ABA_AGRUPAMENTOS].set_column('A:B', 25)
+
+    return output.getvalue()
+
+# ==========================================
+# LÓGICA DE DADOS
+# ==========================================
+# Um item de indisponibilidade depois da limpeza: "seg", "segunda" (dia
+# inteiro) ou "seg:2" (só a 2ª aula). Mais de um ':' é ignorado.
+_RE_INDISPONIBILIDADE = re.compile(r'^(?P<dia>[^:]*)(?::(?P<aula>[^:]*))?$')
+_RE_INTEIRO = re.compile(r'\s*[+-]?\d+\s*')
+# Um bloqueio de dia inteiro cobre até a 10ª aula
+_AULAS_DIA_INTEIRO = 10
+
+
+def carregar_dados(arquivo_upload):
+    # Aceita caminho, bytes em memória ou o UploadedFile do Streamlit.
+    # Levanta ErroPlanilha em vez de exibir a mensagem: quem chama decide
+    # se mostra no Streamlit ou imprime no terminal.
+    try:
+        # As duas abas numa leitura só do arquivo
+        abas = pd.read_excel(arquivo_upload, sheet_name=['Turmas', 'Grade_Curricular'])
+    except Exception as e:
+        raise ErroPlanilha(f"Erro ao ler Excel: {e}") from e
+    return ler_abas(abas['Turmas'], abas['Grade_Curricular'])
+
+def carregar_agrupamentos(arquivo_upload):
+    # Grupos da aba Agrupamentos; planilha sem a aba não tem grupos
+    try:
+        with pd.ExcelFile(arquivo_upload) as planilha:
+            if ABA_AGRUPAMENTOS not in planilha.sheet_names:
+                return []
+            df_agrupamentos = planilha.parse(ABA_AGRUPAMENTOS)
+    except Exception as e:
+        raise ErroPlanilha(f"Erro ao ler Excel: {e}") from e
+    return ler_agrupamentos(df_agrupamentos)
+
+def ler_agrupamentos(df_agrupamentos):
+    # Uma linha por grupo, no formato de construir_modelo(materias_para_agrupar=...).
+    # Linhas com menos de duas matérias são ignoradas.
+    if 'Materias' not in df_agrupamentos.columns:
+        raise ErroPlanilha(f"Erro: A planilha {ABA_AGRUPAMENTOS} deve conter a coluna Materias (e, opcional, Regra)")
+
+    grupos = []
+    regras = df_agrupamentos['Regra'] if 'Regra' in df_agrupamentos.columns else [None] * len(df_agrupamentos)
+    for linha, (materias, regra) in enumerate(zip(df_agrupamentos['Materias'], regras), start=2):
+        if pd.isna(materias):
+            continue
+        materias = [m.strip() for m in str(materias).replace(';', ',').split(',') if m.strip()]
+        chave_regra = '' if pd.isna(regra) else normalizar_texto(regra)
+        if chave_regra not in MAPA_REGRAS:
+            raise ErroPlanilha(
+                f"Erro: Regra '{regra}' na linha {linha} da planilha {ABA_AGRUPAMENTOS} "
+                "(use 'Mesmo dia' ou 'Dias diferentes')"
+            )
+        if len(materias) >= 2:
+            grupos.append({'regra': MAPA_REGRAS[chave_regra], 'materias': materias})
+    return grupos
+
+def _validar_grade(df_grade):
+    cols_obrigatorias_grade = {'Professor', 'Materia', 'Turmas_Alvo', 'Aulas_Por_Turma'}
+    if not cols_obrigatorias_grade.issubset(df_grade.columns):
+        raise ErroPlanilha(f"Erro: A planilha Grade_Curricular deve conter as colunas: {cols_obrigatorias_grade}")
+
+def _texto(serie):
+    # Igual a str(valor) célula a célula; no pandas 3 astype(str) mantém NaN
+    return serie.astype(str).fillna('nan')
+
+def _inteiro_ou_zero(serie):
+    # int(valor) com 'except: 0' célula a célula: número é truncado, texto
+    # só vale se for um inteiro ("3", não "3.0"), vazio ou infinito vira 0
+    numeros = pd.to_numeric(serie, errors='coerce').astype(float)
+    eh_texto = serie.map(lambda v: isinstance(v, str)).astype(bool)
+    if eh_texto.any():
+        inteiro = _texto(serie).str.fullmatch(_RE_INTEIRO.pattern).fillna(False).astype(bool)
+        numeros = numeros.where(~eh_texto | inteiro)
+    numeros = numeros.where(np.isfinite(numeros), 0)
+    return np.trunc(numeros).astype('int64')
+
+def _nome_professor(serie):
+    return (
+        _texto(serie).str.lower()
+        .str.replace('prof.', '', regex=False)
+        .str.replace('profª', '', regex=False)
+        .str.replace('profa', '', regex=False)
+        .str.strip().str.title()
+    )
+
+def ler_abas(df_turmas, df_grade):
+    # Versão em colunas de ler_abas_por_linha: mesmo resultado, com as
+    # operações .str do pandas, explode das Turmas_Alvo e groupby no lugar
+    # do laço por linha (planilhas de rede com milhares de linhas).
+    _validar_grade(df_grade)
+
+    turmas = _texto(df_turmas['Turma']).str.strip()
+    turmas_totais = dict(zip(turmas, (int(v) for v in df_turmas['Aulas_Semanais'])))
+    dias_semana = list(DIAS_SEMANA)
+
+    grade = pd.DataFrame({
+        'prof': _nome_professor(df_grade['Professor']),
+        'materia': _texto(df_grade['Materia']).str.strip(),
+        'turma': _texto(df_grade['Turmas_Alvo']).str.split(','),
+        'qtd': _inteiro_ou_zero(df_grade['Aulas_Por_Turma'])
+    })
+
+    # Todo professor da grade tem entrada, mesmo sem indisponibilidade
+    bloqueios_globais = {prof: set() for prof in grade['prof'].tolist()}
+    if 'Indisponibilidade' in df_grade.columns:
+        indisp = df_grade['Indisponibilidade']
+        preenchida = indisp.notna() & (_texto(indisp).str.strip() != '')
+        itens = pd.DataFrame({
+            'prof': grade['prof'][preenchida],
+            'item': _texto(indisp[preenchida]).str.replace(';', ',', regex=False).str.lower()
+                    .str.replace(' ', '', regex=False).str.split(',')
+        }).explode('item')
+        if len(itens):
+            partes = itens['item'].str.extract(_RE_INDISPONIBILIDADE)
+            itens['d'] = partes['dia'].str[:3].map(MAPA_DIAS).map({dia: d for d, dia in enumerate(dias_semana)})
+            itens['aula'] = partes['aula']
+            itens = itens[itens['d'].notna() & partes['dia'].notna()]
+
+            com_aula = itens['aula'].notna()
+            aula_valida = itens['aula'].str.fullmatch(_RE_INTEIRO.pattern).fillna(False).astype(bool)
+            por_aula = itens[com_aula & aula_valida]
+            for prof, d, aula in zip(por_aula['prof'].tolist(), por_aula['d'].tolist(), por_aula['aula'].tolist()):
+                bloqueios_globais[prof].add((int(d), int(aula) - 1))
+            dia_inteiro = itens[~com_aula]
+            for prof, d in zip(dia_inteiro['prof'].tolist(), dia_inteiro['d'].tolist()):
+                bloqueios_globais[prof].update((int(d), i) for i in range(_AULAS_DIA_INTEIRO))
+
+    grade = grade.explode('turma')
+    grade['turma'] = grade['turma'].str.strip()
+    grade = grade[grade['turma'].isin(turmas_totais.keys())]
+    # sort=False mantém a ordem da primeira aparição, como o laço original
+    somas = grade.groupby(['prof', 'materia', 'turma'], sort=False)['qtd'].sum().reset_index()
+    # tolist() já devolve str/int do Python, bem mais rápido que iterar a Series
+    grade_aulas = [
+        {'prof': prof, 'materia': materia, 'turma': turma, 'qtd': qtd}
+        for prof, materia, turma, qtd in zip(*(somas[c].tolist() for c in ('prof', 'materia', 'turma', 'qtd')))
+    ]
+
+    return turmas_totais, grade_aulas, dias_semana, bloqueios_globais
+
+def ler_abas_por_linha(df_turmas, df_grade):
+    # Leitura original, linha a linha. Fica como referência para conferir
+    # ler_abas (ver 'python -m horario medir-leitura').
+    _validar_grade(df_grade)
+
+    turmas_totais = {}
+    for _, row in df_turmas.iterrows():
+        t = str(row['Turma']).strip()
+        turmas_totais[t] = int(row['Aulas_Semanais'])
+
+    grade_aulas = []
+    dias_semana = list(DIAS_SEMANA)
+    bloqueios_globais = {}
+
+    agrupamento_temp = {}
+
+    for _, row in df_grade.iterrows():
+        prof_raw = str(row['Professor'])
+        prof = prof_raw.lower().replace('prof.', '').replace('profª', '').replace('profa', '').strip().title()
+        materia = str(row['Materia']).strip()
+
+        try: aulas = int(row['Aulas_Por_Turma'])
+        except: aulas = 0
+
+        turmas_alvo = str(row['Turmas_Alvo']).split(',')
+
+        if prof not in bloqueios_globais:
+            bloqueios_globais[prof] = set()
+
+        indisp = str(row.get('Indisponibilidade'))
+        if pd.notna(row.get('Indisponibilidade')) and indisp.strip() != '':
+            indisp_limpa = indisp.replace(';', ',').lower().replace(' ', '')
+            partes = indisp_limpa.split(',')
+            for p in partes:
+                if ':' in p:
+                    try:
+                        dia_sujo, aula_str = p.split(':')
+                        chave_dia = dia_sujo[:3]
+                        if chave_dia in MAPA_DIAS:
+                            dia_oficial = MAPA_DIAS[chave_dia]
+                            d_idx = dias_semana.index(dia_oficial)
+                            a_idx = int(aula_str) - 1
+                            bloqueios_globais[prof].add((d_idx, a_idx))
+                    except: pass
+                else:
+                    chave_dia = p[:3]
+                    if chave_dia in MAPA_DIAS:
+                        dia_oficial = MAPA_DIAS[chave_dia]
+                        d_idx = dias_semana.index(dia_oficial)
+                        for i in range(_AULAS_DIA_INTEIRO): bloqueios_globais[prof].add((d_idx, i))
+
+        for t_raw in turmas_alvo:
+            turma = t_raw.strip()
+            if turma in turmas_totais:
+                chave_unica = (prof, materia, turma)
+                if chave_unica not in agrupamento_temp:
+                    agrupamento_temp[chave_unica] = 0
+                agrupamento_temp[chave_unica] += aulas
+
+    for (prof, materia, turma), qtd in agrupamento_temp.items():
+        grade_aulas.append({'prof': prof, 'materia': materia, 'turma': turma, 'qtd': qtd})
+
+    return turmas_totais, grade_aulas, dias_semana, bloqueios_globais
@@ -0,0 +1,196 @@
+import logging
+import multiprocessing
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .progresso import calcular_gap
+from .solver import resolver_horario
+
+
+logger = logging.getLogger("horario.decomposicao")
+
+
+def componentes(turmas_totais, grade_aulas):
+    # Grupos de turmas ligadas por professores em comum (ex: fundamental de
+    # manhã e médio à noite com equipes diferentes). Nenhuma restrição do
+    # modelo liga dois grupos, então cada um pode ser resolvido sozinho.
+    pai = {turma: turma for turma in turmas_totais}
+
+    def raiz(turma):
+        while pai[turma] != turma:
+            pai[turma] = pai[pai[turma]]
+            turma = pai[turma]
+        return turma
+
+    primeira_turma_prof = {}
+    for item in grade_aulas:
+        turma = item['turma']
+        if turma not in pai:
+            continue
+        prof = item['prof']
+        if prof not in primeira_turma_prof:
+            primeira_turma_prof[prof] = turma
+        else:
+            pai[raiz(turma)] = raiz(primeira_turma_prof[prof])
+
+    grupos = defaultdict(list)
+    for turma in turmas_totais:
+        grupos[raiz(turma)].append(turma)
+    # Maiores primeiro: são as que mais demoram, melhor começarem antes
+    return sorted((sorted(g) for g in grupos.values()), key=lambda g: (-len(g), g[0]))
+
+def dividir_entrada(turmas_totais, grade_aulas, dias_semana, bloqueios_globais, turmas):
+    turmas = set(turmas)
+    grade = [item for item in grade_aulas if item['turma'] in turmas]
+    profs = set(item['prof'] for item in grade)
+    return (
+        {t: v for t, v in turmas_totais.items() if t in turmas},
+        grade,
+        dias_semana,
+        {p: v for p, v in bloqueios_globais.items() if p in profs}
+    )
+
+# Tempo mínimo de um componente que só saiu da fila com o prazo já vencido
+_TEMPO_MINIMO_COMPONENTE = 1
+
+def _resolver_componente(indice, entrada, parar, eventos, parametros, prazo):
+    # Roda no processo filho; cada solução melhor vai para a lista
+    # compartilhada marcada com o índice do componente. 'prazo' (time.time())
+    # é o mesmo para todos: quem esperou na fila fica com o que sobrou dele.
+    parametros = dict(parametros, tempo_limite=max(_TEMPO_MINIMO_COMPONENTE, prazo - time.time()))
+    return resolver_horario(
+        *entrada,
+        parar=parar,
+        publicar=lambda evento: eventos.append((indice, evento)),
+        **parametros
+    )
+
+def _evento_combinado(ultimos, total, contador):
+    # Só dá para falar do custo da escola quando todo componente já tem solução
+    if len(ultimos) < total:
+        return None
+    objetivo = sum(e["objetivo"] for e in ultimos.values())
+    limite = sum(e["limite"] for e in ultimos.values())
+    penalidades = defaultdict(int)
+    for e in ultimos.values():
+        for tipo, custo in e["penalidades"].items():
+            penalidades[tipo] += custo
+    return {
+        "solucao": contador,
+        "tempo": max(e["tempo"] for e in ultimos.values()),
+        "objetivo": objetivo,
+        "limite": limite,
+        "gap": round(calcular_gap(objetivo, limite), 4),
+        "penalidades": dict(penalidades)
+    }
+
+def resolver_decomposto(
+    turmas_totais,
+    grade_aulas,
+    dias_semana,
+    bloqueios_globais,
+    materias_para_agrupar=None,
+    mapa_aulas_vagas=None,
+    tempo_limite=45,
+    num_workers=8,
+    log_progresso=True,
+    parar=None,
+    publicar=None,
+    gap_aceitavel=None,
+    formulacao="booleana",
+    solucao_anterior=None,
+    peso_mudanca=0,
+    quebrar_simetria=False,
+    restricoes_redundantes=False,
+    janelas="span",
+    estagnacao=None,
+    objetivo="ponderado",
+    max_processos=None
+):
+    # Mesmo contrato de resolver_horario. Se a escola se divide em grupos
+    # de turmas sem professor em comum, cada grupo é resolvido num processo
+    # próprio (os workers do CP-SAT são repartidos entre eles) e os
+    # resultados e a auditoria são juntados no fim.
+    grupos = componentes(turmas_totais, grade_aulas)
+    parametros = dict(
+        materias_para_agrupar=materias_para_agrupar,
+        mapa_aulas_vagas=mapa_aulas_vagas,
+        tempo_limite=tempo_limite,
+        log_progresso=log_progresso,
+        gap_aceitavel=gap_aceitavel,
+        formulacao=formulacao,
+        peso_mudanca=peso_mudanca,
+        quebrar_simetria=quebrar_simetria,
+        restricoes_redundantes=restricoes_redundantes,
+        janelas=janelas,
+        estagnacao=estagnacao,
+        objetivo=objetivo
+    )
+    if len(grupos) <= 1:
+        return resolver_horario(
+            turmas_totais, grade_aulas, dias_semana, bloqueios_globais,
+            num_workers=num_workers, parar=parar, publicar=publicar,
+            solucao_anterior=solucao_anterior, **parametros
+        )
+
+    processos = min(len(grupos), max_processos or os.cpu_count() or 1)
+    parametros["num_workers"] = max(1, num_workers // processos)
+    logger.info("Escola dividida em %d componentes independentes (%s turmas), %d processo(s)",
+                len(grupos), "/".join(str(len(g)) for g in grupos), processos)
+
+    # Com mais componentes que processos, os da fila começam depois; todos
+    # dividem o mesmo prazo para o total não passar de tempo_limite
+    prazo = time.time() + tempo_limite
+
+    # 'spawn' pelo mesmo motivo do GerenciadorJobs; o Manager leva o pedido
+    # de parada e o progresso entre os processos
+    contexto = multiprocessing.get_context("spawn")
+    with contexto.Manager() as manager, \
+            ProcessPoolExecutor(max_workers=processos, mp_context=contexto) as executor:
+        parar_filhos = manager.Event()
+        eventos = manager.list()
+        futures = []
+        for i, turmas in enumerate(grupos):
+            entrada = dividir_entrada(turmas_totais, grade_aulas, dias_semana, bloqueios_globais, turmas)
+            parametros_grupo = dict(parametros)
+            if solucao_anterior:
+                parametros_grupo["solucao_anterior"] = {
+                    k: v for k, v in solucao_anterior.items() if k[0] in entrada[0]
+                }
+            futures.append(executor.submit(_resolver_componente, i, entrada, parar_filhos, eventos,
+                                           parametros_grupo, prazo))
+
+        ultimos = {}
+        lidos = 0
+        contador = 0
+        pendentes = set(futures)
+        while pendentes:
+            _, pendentes = wait(pendentes, timeout=0.5, return_when=FIRST_COMPLETED)
+            if parar is not None and parar.is_set():
+                parar_filhos.set()
+            novos = eventos[lidos:]
+            lidos += len(novos)
+            for indice, evento in novos:
+                ultimos[indice] = evento
+            if novos and publicar is not None:
+                # A numeração só avança quando um evento sai de fato
+                combinado = _evento_combinado(ultimos, len(grupos), contador + 1)
+                if combinado is not None:
+                    contador += 1
+                    publicar(combinado)
+
+        respostas = [f.result() for f in futures]
+
+    resultados = {}
+    auditoria = []
+    custo = 0
+    for turmas, (status, vars_grupo, custo_grupo, auditoria_grupo) in zip(grupos, respostas):
+        if status != "OK":
+            logger.info("Componente com %d turmas (%s...) sem solução viável", len(turmas), turmas[0])
+            return "ERRO", {}, 0, []
+        resultados.update(vars_grupo)
+        auditoria.extend(auditoria_grupo)
+        custo += custo_grupo
+    return "OK", resultados, custo, auditoria
@@ -0,0 +1,175 @@
+import time
+from collections import defaultdict
+
+from ortools.sat.python import cp_model
+
+
+# ==========================================
+# DIAGNÓSTICO DE INVIABILIDADE
+# ==========================================
+def verificacoes_rapidas(turmas_totais, grade_aulas, dias_semana, bloqueios_globais):
+    # Contas de pombos feitas antes de montar o modelo. Cada problema
+    # encontrado já basta para o horário ser impossível.
+    n_dias = len(dias_semana)
+    problemas = []
+
+    def problema(tipo, desc):
+        problemas.append({"Tipo": tipo, "Descrição": desc})
+
+    aulas_dia = {turma: total // 5 for turma, total in turmas_totais.items()}
+    carga_turma = defaultdict(int)
+    carga_prof = defaultdict(int)
+    turmas_prof = defaultdict(set)
+    itens_turma = defaultdict(list)
+    for item in grade_aulas:
+        carga_turma[item['turma']] += item['qtd']
+        carga_prof[item['prof']] += item['qtd']
+        turmas_prof[item['prof']].add(item['turma'])
+        itens_turma[item['turma']].append(item)
+
+    def livres(prof, max_aula):
+        bloqueios = bloqueios_globais.get(prof, ())
+        return [(d, a) for d in range(n_dias) for a in range(max_aula) if (d, a) not in bloqueios]
+
+    for turma, itens in itens_turma.items():
+        if turma not in aulas_dia:
+            problema("Turma", f"{turma} aparece na grade mas não na aba Turmas")
+            continue
+        slots = aulas_dia[turma] * n_dias
+        if carga_turma[turma] > slots:
+            problema("Capacidade da Turma",
+                     f"{turma}: {carga_turma[turma]} aulas na grade para {slots} horários")
+
+        # Horários em que pelo menos um professor da turma está livre
+        possiveis = set()
+        for item in itens:
+            livres_item = livres(item['prof'], aulas_dia[turma])
+            possiveis.update(livres_item)
+            if item['qtd'] > len(livres_item):
+                problema("Indisponibilidade",
+                         f"{item['prof']} tem só {len(livres_item)} horários livres na {turma} "
+                         f"para {item['qtd']} aulas de {item['materia']}")
+        if carga_turma[turma] <= slots and carga_turma[turma] > len(possiveis):
+            problema("Indisponibilidade",
+                     f"{turma}: {carga_turma[turma]} aulas, mas só {len(possiveis)} horários "
+                     f"com algum professor da turma livre")
+
+    for prof, carga in carga_prof.items():
+        # O prof só pode dar aula até a última aula das turmas dele
+        max_aula = max((aulas_dia.get(t, 0) for t in turmas_prof[prof]), default=0)
+        disponiveis = len(livres(prof, max_aula))
+        if carga > disponiveis:
+            problema("Capacidade do Professor",
+                     f"{prof}: {carga} aulas para {disponiveis} horários livres")
+
+    return problemas
+
+def diagnosticar(
+    turmas_totais,
+    grade_aulas,
+    dias_semana,
+    bloqueios_globais,
+    tempo_limite=10,
+    minimizar=True
+):
+    # Só as regras rígidas, cada família ligada a um literal de suposição:
+    #   indisponibilidade de cada professor (D), cada item da grade (C) e
+    #   o limite de uma aula por horário de cada turma (A).
+    # A colisão de professor (B) fica sempre ativa. Se for inviável, o
+    # CP-SAT devolve um conjunto de suposições responsável, que ainda é
+    # enxugado retirando uma de cada vez enquanto o tempo deixar.
+    # Devolve (status, lista de culpados no formato de verificacoes_rapidas).
+    inicio = time.perf_counter()
+    model = cp_model.CpModel()
+    n_dias = len(dias_semana)
+
+    suposicoes = {}
+
+    def suposicao(chave, tipo, desc):
+        if chave not in suposicoes:
+            lit = model.NewBoolVar(f"sup_{len(suposicoes)}")
+            suposicoes[chave] = (lit, tipo, desc)
+        return suposicoes[chave][0]
+
+    por_turma = defaultdict(list)
+    por_prof = defaultdict(list)
+    for item in grade_aulas:
+        turma, prof, materia = item['turma'], item['prof'], item['materia']
+        if turma not in turmas_totais:
+            continue
+        bloqueios = bloqueios_globais.get(prof, ())
+        vars_item = []
+        for d in range(n_dias):
+            for a in range(turmas_totais[turma] // 5):
+                var = model.NewBoolVar(f"H_{turma}_{prof}_{materia}_{d}_{a}")
+                vars_item.append(var)
+                por_turma[(turma, d, a)].append(var)
+                por_prof[(prof, d, a)].append(var)
+                if (d, a) in bloqueios:
+                    lit = suposicao(("bloqueio", prof), "Indisponibilidade",
+                                    f"Indisponibilidade declarada de {prof}")
+                    model.Add(var == 0).OnlyEnforceIf(lit)
+
+        lit = suposicao(("item", turma, prof, materia), "Grade",
+                        f"{item['qtd']} aulas de {materia} com {prof} na {turma}")
+        model.Add(sum(vars_item) == item['qtd']).OnlyEnforceIf(lit)
+
+    for (turma, d, a), vars_slot in por_turma.items():
+        lit = suposicao(("turma", turma), "Capacidade da Turma",
+                        f"{turma} com no máximo {turmas_totais[turma] // 5} aulas por dia")
+        model.Add(sum(vars_slot) <= 1).OnlyEnforceIf(lit)
+
+    for vars_slot in por_prof.values():
+        model.Add(sum(vars_slot) <= 1)
+
+    # Implicadas (como em restricoes_redundantes): turma de grade cheia tem
+    # uma aula em cada horário. Valem só se a turma e todos os itens dela
+    # estiverem ativos, então herdam todas essas suposições.
+    lits_turma = defaultdict(list)
+    for chave, (lit, _, _) in suposicoes.items():
+        if chave[0] == "item":
+            lits_turma[chave[1]].append(lit)
+    for turma, lits in lits_turma.items():
+        aulas_dia = turmas_totais[turma] // 5
+        carga = sum(item['qtd'] for item in grade_aulas if item['turma'] == turma)
+        if carga != aulas_dia * n_dias:
+            continue
+        lits = lits + [suposicoes[("turma", turma)][0]]
+        for d in range(n_dias):
+            for a in range(aulas_dia):
+                model.Add(sum(por_turma[(turma, d, a)]) == 1).OnlyEnforceIf(lits)
+
+    indice = {lit.Index(): chave for chave, (lit, _, _) in suposicoes.items()}
+
+    def resolver(chaves, tempo):
+        model.ClearAssumptions()
+        model.AddAssumptions([suposicoes[c][0] for c in chaves])
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = max(0.1, tempo)
+        # O núcleo de suposições só é devolvido com um worker
+        solver.parameters.num_search_workers = 1
+        status = solver.Solve(model)
+        return status, solver
+
+    status, solver = resolver(list(suposicoes), tempo_limite)
+    if status != cp_model.INFEASIBLE:
+        return solver.StatusName(status), []
+
+    nucleo = [indice[i] for i in solver.SufficientAssumptionsForInfeasibility()]
+    if minimizar:
+        # Retira um culpado por vez; se continuar inviável sem ele, ele não
+        # era necessário e o novo núcleo (às vezes bem menor) substitui o atual
+        for chave in list(nucleo):
+            restante = tempo_limite - (time.perf_counter() - inicio)
+            if restante <= 0:
+                break
+            if chave not in nucleo:
+                continue
+            teste = [c for c in nucleo if c != chave]
+            status_teste, solver_teste = resolver(teste, min(restante, 1))
+            if status_teste == cp_model.INFEASIBLE:
+                menor = set(indice[i] for i in solver_teste.SufficientAssumptionsForInfeasibility())
+                nucleo = [c for c in teste if c in menor] or teste
+
+    culpados = [{"Tipo": suposicoes[c][1], "Descrição": suposicoes[c][2]} for c in nucleo]
+    return "INFEASIBLE", sorted(culpados, key=lambda c: (c["Tipo"], c["Descrição"]))
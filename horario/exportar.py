@@ -0,0 +1,163 @@
+import io
+import json
+import re
+
+import pandas as pd
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import landscape, A4
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.colors import HexColor
+
+from .quadro import indexar_horario
+
+
+# ==========================================
+# RELATÓRIOS E EXPORTAÇÃO
+# ==========================================
+def gerar_pdf_bytes(turmas_totais, grade_aulas, dias_semana, vars_resolvidas):
+    # vars_resolvidas é um dict com os valores True/False já extraídos ou
+    # um QuadroHorario (ver quadro.py)
+    quadro = indexar_horario(vars_resolvidas)
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4))
+    elements = []
+    styles = getSampleStyleSheet()
+
+    estilo_tabela = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), HexColor('#2c3e50')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('GRID', (0, 0), (-1, -1), 0.5, HexColor('#d3d3d3')),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, HexColor('#f0f0f0')]),
+    ])
+
+    lista_turmas = sorted(turmas_totais.keys())
+    for turma in lista_turmas:
+        elements.append(Paragraph(f"Horário: {turma}", styles['Title']))
+        elements.append(Spacer(1, 10))
+        dados = [['Horário'] + dias_semana]
+        aulas_por_dia = turmas_totais[turma] // 5
+        linha_intervalo_idx = -1
+
+        for aula in range(aulas_por_dia):
+            if aula == 3:
+                dados.append(["INTERVALO", "", "", "", "", ""])
+                linha_intervalo_idx = len(dados) - 1
+
+            linha = [f"{aula + 1}ª Aula"]
+            for d in range(len(dias_semana)):
+                conteudo = "---"
+                alocada = quadro.aula_turma(turma, d, aula)
+                if alocada:
+                    prof, materia = alocada
+                    conteudo = f"{materia}\n({prof})"
+                linha.append(conteudo)
+            dados.append(linha)
+
+        t = Table(dados, colWidths=[60] + [140]*5)
+        t.setStyle(estilo_tabela)
+        if linha_intervalo_idx != -1:
+            estilo_intervalo = TableStyle([
+                ('BACKGROUND', (0, linha_intervalo_idx), (-1, linha_intervalo_idx), HexColor('#95a5a6')),
+                ('TEXTCOLOR', (0, linha_intervalo_idx), (-1, linha_intervalo_idx), colors.white),
+                ('SPAN', (0, linha_intervalo_idx), (-1, linha_intervalo_idx)),
+                ('FONTNAME', (0, linha_intervalo_idx), (-1, linha_intervalo_idx), 'Helvetica-Bold'),
+                ('ALIGN', (0, linha_intervalo_idx), (-1, linha_intervalo_idx), 'CENTER'),
+            ])
+            t.setStyle(estilo_intervalo)
+        elements.append(t)
+        elements.append(Spacer(1, 25))
+        elements.append(PageBreak())
+
+    doc.build(elements)
+    buffer.seek(0)
+    return buffer
+
+def tabela_turma(turma, turmas_totais, grade_aulas, dias_semana, vars_resolvidas):
+    # Mesma grade mostrada na tela: uma linha por aula, com a linha do INTERVALO
+    quadro = indexar_horario(vars_resolvidas)
+    aulas_por_dia = turmas_totais[turma] // 5
+    dados_grade = []
+    for aula in range(aulas_por_dia):
+        if aula == 3:
+            dados_grade.append({"Horário": "INTERVALO", **{dia: "---" for dia in dias_semana}})
+        linha_dict = {"Horário": f"{aula + 1}ª Aula"}
+        for d_idx, dia_nome in enumerate(dias_semana):
+            conteudo = "---"
+            alocada = quadro.aula_turma(turma, d_idx, aula)
+            if alocada:
+                prof, materia = alocada
+                conteudo = f"{materia} ({prof})"
+            linha_dict[dia_nome] = conteudo
+        dados_grade.append(linha_dict)
+    return pd.DataFrame(dados_grade)
+
+def _nome_aba(nome, usados):
+    # O Excel limita o nome da aba a 31 caracteres e proíbe alguns símbolos
+    base = re.sub(r'[\[\]\:\*\?\/\\]', '-', nome)[:31] or "Turma"
+    candidato = base
+    n = 2
+    while candidato.lower() in usados:
+        sufixo = f" ({n})"
+        candidato = base[:31 - len(sufixo)] + sufixo
+        n += 1
+    usados.add(candidato.lower())
+    return candidato
+
+def gerar_excel_bytes(turmas_totais, grade_aulas, dias_semana, vars_resolvidas, auditoria=None):
+    quadro = indexar_horario(vars_resolvidas)
+    output = io.BytesIO()
+    usados = set()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        for turma in sorted(turmas_totais.keys()):
+            df = tabela_turma(turma, turmas_totais, grade_aulas, dias_semana, quadro)
+            aba = _nome_aba(turma, usados)
+            df.to_excel(writer, sheet_name=aba, index=False)
+            writer.sheets[aba].set_column(0, len(dias_semana), 28)
+
+        df_audit = pd.DataFrame(auditoria or [], columns=["Tipo", "Descrição", "Custo"])
+        aba = _nome_aba("Auditoria", usados)
+        df_audit.to_excel(writer, sheet_name=aba, index=False)
+        writer.sheets[aba].set_column(0, 1, 45)
+    return output.getvalue()
+
+def gerar_json(status, custo, dias_semana, vars_resolvidas, auditoria=None):
+    # Lista plana de aulas alocadas, fácil de reaproveitar em outros sistemas
+    aulas = [
+        {
+            "turma": turma,
+            "dia": dias_semana[d],
+            "aula": a + 1,
+            "prof": prof,
+            "materia": materia
+        }
+        for (turma, d, a, prof, materia), valor in sorted(vars_resolvidas.items())
+        if valor == 1
+    ]
+    dados = {
+        "status": status,
+        "custo": custo,
+        "aulas": aulas,
+        "auditoria": auditoria or []
+    }
+    return json.dumps(dados, ensure_ascii=False, indent=2)
+
+def ler_json(conteudo, dias_semana):
+    # Caminho inverso de gerar_json: devolve o dict de vars resolvidas
+    # {(turma, d, a, prof, materia): 1}, usado como horário anterior
+    if isinstance(conteudo, bytes):
+        conteudo = conteudo.decode('utf-8')
+    dados = json.loads(conteudo)
+    indice_dia = {dia: d for d, dia in enumerate(dias_semana)}
+    vars_resolvidas = {}
+    for aula in dados.get("aulas", []):
+        d = indice_dia.get(aula["dia"])
+        if d is None:
+            continue
+        chave = (aula["turma"], d, int(aula["aula"]) - 1, aula["prof"], aula["materia"])
+        vars_resolvidas[chave] = 1
+    return vars_resolvidas
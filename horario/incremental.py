@@ -0,0 +1,147 @@
+import logging
+import time
+
+from .modelo import construir_modelo, fixar_variaveis
+from .solver import resolver_lexicografico, resolver_modelo
+
+
+logger = logging.getLogger("horario.incremental")
+
+
+def _itens_por_chave(grade_aulas):
+    return {(item['prof'], item['materia'], item['turma']): item['qtd'] for item in grade_aulas}
+
+def _turmas_do_prof(grade_aulas):
+    turmas = {}
+    for item in grade_aulas:
+        turmas.setdefault(item['prof'], set()).add(item['turma'])
+    return turmas
+
+def diferenca_entradas(entrada_anterior, entrada_nova):
+    # Compara duas leituras da planilha (saídas de carregar_dados) e diz
+    # quais professores mudaram e quais turmas precisam ser recalculadas:
+    # as que mudaram e todas as que os professores alterados atendem.
+    turmas_ant, grade_ant, _, bloq_ant = entrada_anterior
+    turmas_nov, grade_nov, _, bloq_nov = entrada_nova
+
+    turmas_alteradas = set()
+    for turma in set(turmas_ant) | set(turmas_nov):
+        if turmas_ant.get(turma) != turmas_nov.get(turma):
+            turmas_alteradas.add(turma)
+
+    profs_alterados = set()
+    itens_ant = _itens_por_chave(grade_ant)
+    itens_nov = _itens_por_chave(grade_nov)
+    for chave in set(itens_ant) | set(itens_nov):
+        if itens_ant.get(chave) != itens_nov.get(chave):
+            prof, _, turma = chave
+            profs_alterados.add(prof)
+            turmas_alteradas.add(turma)
+
+    for prof in set(bloq_ant) | set(bloq_nov):
+        if set(bloq_ant.get(prof, ())) != set(bloq_nov.get(prof, ())):
+            profs_alterados.add(prof)
+
+    turmas_afetadas = set(turmas_alteradas)
+    for prof, turmas in _turmas_do_prof(grade_nov).items():
+        if prof in profs_alterados:
+            turmas_afetadas |= turmas
+
+    return {
+        "profs_alterados": profs_alterados,
+        "turmas_alteradas": turmas_alteradas,
+        "turmas_afetadas": turmas_afetadas & set(turmas_nov)
+    }
+
+def _vizinhancas(turmas_afetadas, grade_aulas, todas):
+    # Sequência de vizinhanças cada vez maiores, como pares
+    # (turmas livres, professores livres). Uma aula fica livre se a turma
+    # ou o professor dela estiver livre.
+    turmas_prof = _turmas_do_prof(grade_aulas)
+    profs = set(item['prof'] for item in grade_aulas if item['turma'] in turmas_afetadas)
+    vizinhas = set(turmas_afetadas)
+    for prof in profs:
+        vizinhas |= turmas_prof[prof]
+
+    # 1) só as turmas afetadas
+    yield turmas_afetadas, set()
+    # 2) + as aulas, em outras turmas, dos professores dessas turmas
+    yield turmas_afetadas, profs
+    # 3) + as turmas inteiras que dividem professor com as afetadas
+    yield vizinhas, set()
+    # 4) tudo, com o horário anterior só como dica
+    yield todas, set()
+
+def resolver_incremental(
+    entrada_nova,
+    solucao_anterior,
+    entrada_anterior,
+    materias_para_agrupar=None,
+    mapa_aulas_vagas=None,
+    tempo_limite=5,
+    num_workers=8,
+    log_progresso=False,
+    parar=None,
+    publicar=None,
+    gap_aceitavel=None,
+    formulacao="booleana",
+    peso_mudanca=0,
+    quebrar_simetria=False,
+    restricoes_redundantes=False,
+    janelas="span",
+    estagnacao=None,
+    objetivo="ponderado"
+):
+    # Re-otimiza só a vizinhança da mudança: as turmas fora de
+    # 'turmas_afetadas' ficam fixas no horário anterior. Se o modelo
+    # residual for inviável, a vizinhança cresce (ver _vizinhancas) e, em
+    # último caso, resolve tudo com o anterior como dica.
+    # Devolve a tupla de resolver_horario mais um dict com o que foi liberado.
+    diff = diferenca_entradas(entrada_anterior, entrada_nova)
+    todas = set(entrada_nova[0])
+    rodadas = []
+    inicio = time.perf_counter()
+
+    for turmas_livres, profs_livres in _vizinhancas(diff["turmas_afetadas"], entrada_nova[1], todas):
+        m = construir_modelo(
+            *entrada_nova,
+            materias_para_agrupar=materias_para_agrupar,
+            mapa_aulas_vagas=mapa_aulas_vagas,
+            formulacao=formulacao,
+            solucao_anterior=solucao_anterior,
+            peso_mudanca=peso_mudanca,
+            quebrar_simetria=quebrar_simetria,
+            restricoes_redundantes=restricoes_redundantes,
+            janelas=janelas
+        )
+        fixadas = fixar_variaveis(
+            m,
+            solucao_anterior,
+            lambda key: key[0] not in turmas_livres and key[3] not in profs_livres
+        )
+        resolver = resolver_lexicografico if objetivo == "lexicografico" else resolver_modelo
+        status, resultados, custo, auditoria = resolver(
+            m,
+            tempo_limite=tempo_limite,
+            num_workers=num_workers,
+            log_progresso=log_progresso,
+            parar=parar,
+            publicar=publicar,
+            gap_aceitavel=gap_aceitavel,
+            estagnacao=estagnacao
+        )
+        rodadas.append({
+            "turmas_livres": len(turmas_livres),
+            "profs_livres": len(profs_livres),
+            "variaveis_fixadas": fixadas,
+            "status_solver": m.estatisticas["status_solver"],
+            "tempo_solver": m.estatisticas["tempo_solver"]
+        })
+        logger.info("Rodada incremental: %d turmas e %d profs livres, %d variáveis fixas, %s",
+                    len(turmas_livres), len(profs_livres), fixadas, m.estatisticas["status_solver"])
+
+        if status == "OK" or (parar is not None and parar.is_set()):
+            break
+
+    info = dict(diff, rodadas=rodadas, tempo_total=time.perf_counter() - inicio)
+    return status, resultados, custo, auditoria, info
@@ -0,0 +1,172 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from .decomposicao import resolver_decomposto
+from .incremental import resolver_incremental
+from .lns import resolver_lns
+from .portfolio import resolver_portfolio
+
+
+PENDENTE = "pendente"
+EXECUTANDO = "executando"
+CONCLUIDO = "concluido"
+ERRO = "erro"
+CANCELADO = "cancelado"
+
+FINALIZADOS = (CONCLUIDO, ERRO, CANCELADO)
+
+# Funções que um job pode executar; todas aceitam 'parar' e 'publicar'
+TAREFAS = {
+    # Escolas que se dividem em grupos sem professor em comum são resolvidas
+    # por partes; as demais caem direto em resolver_horario
+    "completo": resolver_decomposto,
+    "incremental": resolver_incremental,
+    "lns": resolver_lns,
+    "portfolio": resolver_portfolio,
+}
+
+
+def _max_jobs_padrao():
+    # Um job por 8 CPUs: os solves grandes usam até 8 workers ou mais (ver
+    # workers_por_tamanho em perfis.py, que divide os CPUs entre os jobs);
+    # mais jobs que isso só disputa CPU
+    if os.environ.get("HORARIO_MAX_JOBS"):
+        return max(1, int(os.environ["HORARIO_MAX_JOBS"]))
+    return max(1, (os.cpu_count() or 1) // 8)
+
+def _executar_job(job_id, estados, parar, progresso, tarefa, parametros):
+    # Roda no processo filho: só dados simples entram e saem daqui
+    estados[job_id] = EXECUTANDO
+    return TAREFAS[tarefa](parar=parar, publicar=progresso.append, **parametros)
+
+
+class Job:
+    def __init__(self, job_id, future, parar, progresso, rotulo):
+        self.id = job_id
+        self.future = future
+        self.parar = parar
+        self.progresso = progresso
+        self.rotulo = rotulo
+        self.criado_em = time.time()
+        self.finalizado_em = None
+        self.cancelado = False
+
+
+class GerenciadorJobs:
+    # Fila de cálculos em processos separados. O app guarda só o id do job
+    # no session_state, então um rerun do Streamlit não perde o cálculo.
+    def __init__(self, max_jobs=None, tempo_retencao=3600):
+        self.max_jobs = max_jobs or _max_jobs_padrao()
+        self.tempo_retencao = tempo_retencao
+        # 'spawn' evita herdar as threads do servidor do Streamlit no fork
+        contexto = multiprocessing.get_context("spawn")
+        self._manager = contexto.Manager()
+        self._estados = self._manager.dict()
+        self._executor = ProcessPoolExecutor(max_workers=self.max_jobs, mp_context=contexto)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submeter(self, rotulo="", tarefa="completo", **parametros):
+        # parametros são os argumentos da função em TAREFAS[tarefa]
+        if tarefa not in TAREFAS:
+            raise ValueError(f"Tarefa desconhecida: {tarefa}")
+        self._remover_antigos()
+        job_id = uuid.uuid4().hex
+        parar = self._manager.Event()
+        progresso = self._manager.list()
+        self._estados[job_id] = PENDENTE
+        future = self._executor.submit(_executar_job, job_id, self._estados, parar, progresso, tarefa, parametros)
+        job = Job(job_id, future, parar, progresso, rotulo)
+        future.add_done_callback(lambda _f, job=job: setattr(job, "finalizado_em", time.time()))
+        with self._lock:
+            self._jobs[job_id] = job
+        return job_id
+
+    def _obter(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise KeyError(f"Job desconhecido: {job_id}")
+        return job
+
+    def status(self, job_id):
+        job = self._obter(job_id)
+        if job.cancelado:
+            return CANCELADO
+        if job.future.done():
+            return ERRO if job.future.exception() is not None else CONCLUIDO
+        return self._estados.get(job_id, PENDENTE)
+
+    def cancelar(self, job_id):
+        # Se ainda está na fila, nem começa; se já está rodando, o solver
+        # é interrompido pelo evento 'parar' e o resultado é descartado.
+        job = self._obter(job_id)
+        if job.future.done():
+            return False
+        job.cancelado = True
+        if not job.future.cancel():
+            job.parar.set()
+        return True
+
+    def interromper(self, job_id):
+        # "Parar agora e manter o melhor": o solver para, mas o job termina
+        # normalmente com a melhor solução encontrada até aqui.
+        job = self._obter(job_id)
+        if job.future.done():
+            return False
+        job.parar.set()
+        return True
+
+    def progresso(self, job_id):
+        # Eventos publicados pelo CallbackProgresso, do mais antigo ao mais novo
+        return list(self._obter(job_id).progresso)
+
+    def resultado(self, job_id):
+        # Tupla devolvida pela tarefa; começa sempre por (status, vars, custo, auditoria)
+        job = self._obter(job_id)
+        if job.cancelado:
+            raise RuntimeError("O cálculo foi cancelado.")
+        if not job.future.done():
+            return None
+        return job.future.result()
+
+    def tempo_decorrido(self, job_id):
+        job = self._obter(job_id)
+        return (job.finalizado_em or time.time()) - job.criado_em
+
+    def listar(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [
+            {"id": job.id, "rotulo": job.rotulo, "status": self.status(job.id), "criado_em": job.criado_em}
+            for job in jobs
+        ]
+
+    def descartar(self, job_id):
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is not None:
+            self._estados.pop(job_id, None)
+
+    def _remover_antigos(self):
+        limite = time.time() - self.tempo_retencao
+        with self._lock:
+            antigos = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finalizado_em is not None and job.finalizado_em < limite
+            ]
+        for job_id in antigos:
+            self.descartar(job_id)
+
+    def encerrar(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            if not job.future.done():
+                self.cancelar(job.id)
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._manager.shutdown()
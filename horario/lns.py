@@ -0,0 +1,198 @@
+import logging
+import random
+import re
+import time
+
+from .modelo import aplicar_dicas, construir_modelo, liberar_dominios, restringir_dominios
+from .progresso import calcular_gap
+from .solver import resolver_modelo
+
+
+logger = logging.getLogger("horario.lns")
+
+# Como escolher o pedaço do horário que é liberado a cada iteração:
+#   "dia": todas as aulas de um dia sorteado
+#   "professores": um grupo de professores que dividem turmas entre si
+#   "serie": as turmas de uma ou mais séries (ex: todos os "6º Ano")
+ESTRATEGIAS = ("dia", "professores", "serie")
+
+
+def serie_da_turma(turma):
+    # "6º Ano A" -> "6º Ano"; "1º Ano - Fundamental B" -> "1º Ano - Fundamental"
+    return re.sub(r'[\s\-]+[A-Z]$', '', turma.strip())
+
+def _vizinhanca_dia(entrada, rng, fracao):
+    d = rng.randrange(len(entrada[2]))
+    return f"dia {entrada[2][d]}", lambda key: key[1] != d
+
+def _vizinhanca_professores(entrada, rng, fracao):
+    # Cresce a partir de um professor sorteado, pelos colegas de turma,
+    # até atingir a fração desejada do corpo docente
+    grade_aulas = entrada[1]
+    turmas_prof, profs_turma = {}, {}
+    for item in grade_aulas:
+        turmas_prof.setdefault(item['prof'], set()).add(item['turma'])
+        profs_turma.setdefault(item['turma'], set()).add(item['prof'])
+
+    alvo = max(2, int(len(turmas_prof) * fracao))
+    escolhidos = set()
+    fronteira = [rng.choice(sorted(turmas_prof))]
+    while fronteira and len(escolhidos) < alvo:
+        prof = fronteira.pop(rng.randrange(len(fronteira)))
+        if prof in escolhidos:
+            continue
+        escolhidos.add(prof)
+        for turma in turmas_prof[prof]:
+            fronteira.extend(p for p in profs_turma[turma] if p not in escolhidos)
+
+    return f"{len(escolhidos)} professores", lambda key: key[3] not in escolhidos
+
+def _vizinhanca_serie(entrada, rng, fracao):
+    series = {}
+    for turma in entrada[0]:
+        series.setdefault(serie_da_turma(turma), []).append(turma)
+
+    alvo = max(1, int(len(entrada[0]) * fracao))
+    ordem = sorted(series)
+    rng.shuffle(ordem)
+    escolhidas = set()
+    for serie in ordem:
+        escolhidas.update(series[serie])
+        if len(escolhidas) >= alvo:
+            break
+
+    return f"{len(escolhidas)} turmas", lambda key: key[0] not in escolhidas
+
+VIZINHANCAS = {
+    "dia": _vizinhanca_dia,
+    "professores": _vizinhanca_professores,
+    "serie": _vizinhanca_serie,
+}
+
+def resolver_lns(
+    turmas_totais,
+    grade_aulas,
+    dias_semana,
+    bloqueios_globais,
+    materias_para_agrupar=None,
+    mapa_aulas_vagas=None,
+    tempo_limite=120,
+    tempo_iteracao=5,
+    estrategias=ESTRATEGIAS,
+    fracao=0.2,
+    num_workers=8,
+    semente=0,
+    log_progresso=False,
+    parar=None,
+    publicar=None,
+    gap_aceitavel=None,
+    formulacao="booleana",
+    solucao_anterior=None,
+    peso_mudanca=0,
+    quebrar_simetria=False,
+    restricoes_redundantes=False,
+    janelas="span",
+    estagnacao=None
+):
+    # Large Neighborhood Search: acha uma primeira solução com o modelo
+    # completo e depois, até esgotar tempo_limite, libera um pedaço do
+    # horário (ver ESTRATEGIAS), fixa o resto e re-otimiza só esse pedaço.
+    # O modelo é construído uma vez; cada iteração só troca domínios e dicas.
+    # Devolve a tupla de resolver_horario mais a trajetória do objetivo.
+    inicio = time.perf_counter()
+    rng = random.Random(semente)
+    entrada = (turmas_totais, grade_aulas, dias_semana, bloqueios_globais)
+    m = construir_modelo(
+        *entrada,
+        materias_para_agrupar=materias_para_agrupar,
+        mapa_aulas_vagas=mapa_aulas_vagas,
+        formulacao=formulacao,
+        solucao_anterior=solucao_anterior,
+        peso_mudanca=peso_mudanca,
+        quebrar_simetria=quebrar_simetria,
+        restricoes_redundantes=restricoes_redundantes,
+        janelas=janelas
+    )
+
+    status, atual, custo, auditoria = resolver_modelo(
+        m,
+        tempo_limite=tempo_limite,
+        num_workers=num_workers,
+        log_progresso=log_progresso,
+        parar=parar,
+        primeira_solucao=True
+    )
+    if status != "OK":
+        return status, atual, custo, auditoria, []
+
+    # O limite inferior só vale para o modelo completo; as sub-buscas com
+    # parte fixa não provam nada sobre o ótimo global
+    limite = m.estatisticas["limite"]
+    otimo = m.estatisticas["status_solver"] == "OPTIMAL"
+    trajetoria = []
+
+    def registrar(iteracao, estrategia, descricao, objetivo, aceito, auditoria):
+        # objetivo e penalidades são sempre da mesma solução: a da iteração,
+        # ou a atual quando a sub-busca não achou nenhuma
+        evento = {
+            "solucao": iteracao,
+            "tempo": round(time.perf_counter() - inicio, 3),
+            "objetivo": objetivo,
+            "limite": limite,
+            "gap": round(calcular_gap(objetivo, limite), 4),
+            "estrategia": estrategia,
+            "vizinhanca": descricao,
+            "aceito": aceito,
+            "penalidades": _penalidades(auditoria)
+        }
+        trajetoria.append(evento)
+        logger.info("Iteração %d (%s, %s): custo %.0f%s", iteracao, estrategia, descricao,
+                    objetivo, " (aceito)" if aceito else "")
+        if aceito and publicar is not None:
+            publicar(evento)
+
+    registrar(0, "inicial", "modelo completo", custo, True, auditoria)
+
+    iteracao = 0
+    ultima_melhora = time.perf_counter()
+    while not otimo:
+        restante = tempo_limite - (time.perf_counter() - inicio)
+        if restante <= 0.5 or (parar is not None and parar.is_set()):
+            break
+        # Nenhuma vizinhança melhorou o custo há 'estagnacao' segundos
+        if estagnacao and time.perf_counter() - ultima_melhora > estagnacao:
+            logger.info("LNS parado por estagnação após %d iterações", iteracao)
+            break
+        if calcular_gap(custo, limite) <= (gap_aceitavel or 0):
+            break
+        iteracao += 1
+
+        estrategia = estrategias[(iteracao - 1) % len(estrategias)]
+        descricao, manter = VIZINHANCAS[estrategia](entrada, rng, fracao)
+        restringir_dominios(m, atual, manter)
+        aplicar_dicas(m, atual)
+
+        status_viz, nova, custo_viz, auditoria_viz = resolver_modelo(
+            m,
+            tempo_limite=min(tempo_iteracao, restante),
+            num_workers=num_workers,
+            log_progresso=False,
+            parar=parar
+        )
+        aceito = status_viz == "OK" and custo_viz < custo
+        if aceito:
+            atual, custo, auditoria = nova, custo_viz, auditoria_viz
+            ultima_melhora = time.perf_counter()
+        if status_viz == "OK":
+            registrar(iteracao, estrategia, descricao, custo_viz, aceito, auditoria_viz)
+        else:
+            registrar(iteracao, estrategia, descricao, custo, aceito, auditoria)
+
+    liberar_dominios(m)
+    return "OK", atual, custo, auditoria, trajetoria
+
+def _penalidades(auditoria):
+    por_tipo = {}
+    for linha in auditoria:
+        por_tipo[linha["Tipo"]] = por_tipo.get(linha["Tipo"], 0) + linha["Custo"]
+    return por_tipo
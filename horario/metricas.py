@@ -0,0 +1,49 @@
+# ==========================================
+# MÉTRICAS NO FORMATO DO PROMETHEUS
+# ==========================================
+# Texto no formato de exposição do Prometheus (para o textfile collector do
+# node_exporter ou um Pushgateway), sem depender do prometheus_client.
+
+def _rotulos(rotulos):
+    if not rotulos:
+        return ""
+    itens = []
+    for chave, valor in sorted(rotulos.items()):
+        valor = str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        itens.append(f'{chave}="{valor}"')
+    return "{" + ",".join(itens) + "}"
+
+def metricas_prometheus(estatisticas, rotulos=None):
+    # estatisticas: o dict de ModeloHorario.estatisticas, depois de
+    # construir_modelo e, se houver, do solver. 'rotulos' vão em toda
+    # série (ex: {"escola": "rede_norte"}).
+    rotulos = dict(rotulos or {})
+    linhas = []
+
+    def metrica(nome, ajuda, valores):
+        linhas.append(f"# HELP {nome} {ajuda}")
+        linhas.append(f"# TYPE {nome} gauge")
+        for extras, valor in valores:
+            if valor is None:
+                continue
+            linhas.append(f"{nome}{_rotulos(dict(rotulos, **extras))} {float(valor):g}")
+
+    familias = estatisticas.get("familias", [])
+    metrica("horario_familia_variaveis", "Variáveis criadas por família de restrições",
+            [({"familia": f["familia"]}, f["variaveis"]) for f in familias])
+    metrica("horario_familia_restricoes", "Restrições criadas por família de restrições",
+            [({"familia": f["familia"]}, f["restricoes"]) for f in familias])
+    metrica("horario_familia_penalidades", "Termos de penalidade criados por família de restrições",
+            [({"familia": f["familia"]}, f["penalidades"]) for f in familias])
+    metrica("horario_familia_construcao_segundos", "Tempo de construção por família de restrições",
+            [({"familia": f["familia"]}, f["tempo"]) for f in familias])
+
+    metrica("horario_modelo_variaveis", "Variáveis do modelo", [({}, estatisticas.get("variaveis"))])
+    metrica("horario_modelo_restricoes", "Restrições do modelo", [({}, estatisticas.get("restricoes"))])
+    metrica("horario_construcao_segundos", "Tempo total de construção do modelo",
+            [({}, estatisticas.get("tempo_construcao"))])
+    if "tempo_solver" in estatisticas:
+        metrica("horario_solver_segundos", "Tempo do solver", [({}, estatisticas.get("tempo_solver"))])
+        metrica("horario_objetivo", "Custo da melhor solução", [({}, estatisticas.get("objetivo"))])
+        metrica("horario_limite_inferior", "Limite inferior provado", [({}, estatisticas.get("limite"))])
+    return "\n".join(linhas) + "\n"
@@ -0,0 +1,1038 @@
+import bisect
+import os
+import time
+from collections import defaultdict
+
+from ortools.sat.python import cp_model
+
+
+PESO_JANELA = 500 # Peso alto para funcionar quase como Hard Constraint
+PESO_AGRUPAMENTO = 150
+PESO_SEPARACAO = 150         # Matérias que deviam ficar em dias diferentes
+PESO_REPETICAO_EXCESSIVA = 100
+PESO_EXCESSO_DIARIO = 200    # Penaliza se der muitas aulas no dia (ex: > 4)
+LIMITE_SUAVE_DIARIO = 4
+PESO_AULA_UNICA = 350        # Penaliza forte se for para dar só 1 aula
+
+# Codificações da restrição E (janelas do professor):
+# "span": início/fim/span do dia com restrições reificadas (a original)
+# "transicoes": Bools de "já começou" e "ainda vai ter aula" por horário,
+#               ligadas só por desigualdades lineares, sem reificação
+CODIFICACOES_JANELA = ("span", "transicoes")
+
+# Formulações do horário:
+# "booleana": uma Bool por (turma, dia, aula, prof, matéria) (a original)
+# "por_aula": uma IntVar por cópia de aula com o horário global
+#             (dia * max_aulas_escola + aula), colisões por AllDifferent e só
+#             as Bools agregadas que as penalidades leem: ocupação do prof
+#             por horário e dia de cada aula
+FORMULACOES = ("booleana", "por_aula")
+
+# Regras de um grupo de matérias (restrição F). Um grupo é uma lista de
+# matérias (mesmo dia, o formato da tela e do --agrupar) ou um dict
+# {"materias": [...], "regra": "mesmo_dia" | "dias_diferentes"}
+REGRAS_AGRUPAMENTO = ("mesmo_dia", "dias_diferentes")
+
+
+def _nomes_padrao():
+    # Em produção as variáveis do CP-SAT ficam sem nome (ver ModeloHorario);
+    # HORARIO_NOMES_VARIAVEIS=1 devolve os nomes legíveis para depuração
+    return os.environ.get("HORARIO_NOMES_VARIAVEIS", "").lower() in ("1", "sim", "true")
+
+
+class ModeloHorario:
+    # Guarda o CpModel e tudo que as famílias de restrições compartilham:
+    # variáveis de horário, mapas de busca e os termos do custo.
+    def __init__(self, turmas_totais, grade_aulas, dias_semana, bloqueios_globais, nomes_variaveis=True,
+                 formulacao="booleana"):
+        self.model = cp_model.CpModel()
+        self.formulacao = formulacao
+        self.turmas_totais = turmas_totais
+        self.grade_aulas = grade_aulas
+        self.dias_semana = dias_semana
+        self.bloqueios_globais = bloqueios_globais
+
+        self.horario_vars = {}
+        self.termos_custo = []
+        self.detalhes_audit = []
+
+        # Mapas auxiliares para facilitar a busca de variáveis
+        self.mapa_turma_horario = defaultdict(list)
+        self.mapa_prof_horario = defaultdict(list)
+        self.mapa_turma_prof_horario = defaultdict(list)
+        # Agrupamentos usados por C, F e H/I, montados junto com os de cima
+        self.mapa_turma_materia_dia = defaultdict(list)
+        self.mapa_prof_dia = defaultdict(list)
+        # vars_por_item[i]: Bools do item i da grade, em ordem de (dia, aula)
+        self.vars_por_item = []
+        # materia_no_dia[(turma, materia, d)]: Bool "a matéria tem aula na
+        # turma nesse dia", criada uma vez e usada por todos os grupos de F
+        self.materia_no_dia = {}
+
+        # Só na formulação "por_aula" (ver _criar_aulas):
+        # aulas_por_item[i]: cópias do item i, cada uma (IntVar do horário
+        # global, {dia: Bool "a cópia cai nesse dia"}), em ordem crescente
+        self.aulas_por_item = []
+        # slots_item[i]: horários globais permitidos ao item i
+        self.slots_item = []
+        self.indice_item = {}
+        # ocupacao_prof[(prof, d, a)]: Bool "o prof dá aula nesse horário"
+        self.ocupacao_prof = {}
+        self.mapa_turma_dia = defaultdict(list)
+
+        # Mapa reverso para saber quais matérias/profs existem em cada turma
+        # Estrutura: mapa_conteudo_turma[turma] = set((prof, materia))
+        self.mapa_conteudo_turma = defaultdict(set)
+
+        self.aulas_por_turma_idx = {t: t_val // 5 for t, t_val in turmas_totais.items()}
+        self.max_aulas_escola = max(self.aulas_por_turma_idx.values()) if self.aulas_por_turma_idx else 5
+        self.profs_unicos = set(item['prof'] for item in grade_aulas)
+
+        # Tamanho do modelo e tempos, preenchido por construir_modelo e pelo solver
+        self.estatisticas = {}
+
+        # Com nomes_variaveis=False as variáveis vão para o proto sem nome
+        # (formatar centenas de milhares de strings pesa na construção). As
+        # de horário continuam identificadas pela chave em horario_vars; as
+        # demais guardam molde e partes do nome em 'rotulos', em ordem de
+        # índice, e nome_variavel monta o nome quando alguém pede.
+        self.nomes_variaveis = nomes_variaveis
+        self.rotulos = []
+
+    def nova_bool(self, formato, *partes):
+        if self.nomes_variaveis:
+            return self.model.NewBoolVar(formato.format(*partes))
+        var = self.model.NewBoolVar("")
+        self.rotulos.append((var.Index(), formato, partes))
+        return var
+
+    def nova_int(self, minimo, maximo, formato, *partes):
+        if self.nomes_variaveis:
+            return self.model.NewIntVar(minimo, maximo, formato.format(*partes))
+        var = self.model.NewIntVar(minimo, maximo, "")
+        self.rotulos.append((var.Index(), formato, partes))
+        return var
+
+    def nova_int_dominio(self, dominio, formato, *partes):
+        if self.nomes_variaveis:
+            return self.model.NewIntVarFromDomain(dominio, formato.format(*partes))
+        var = self.model.NewIntVarFromDomain(dominio, "")
+        self.rotulos.append((var.Index(), formato, partes))
+        return var
+
+    def nome_variavel(self, var):
+        # Nome legível de uma variável (ou do seu índice) nos dois modos.
+        # Só para depuração: sem nomes, procura em 'rotulos' e horario_vars.
+        indice = var if isinstance(var, int) else var.Index()
+        nome = self.model.Proto().variables[indice].name
+        if nome or self.nomes_variaveis:
+            return nome
+        posicao = bisect.bisect_left(self.rotulos, (indice,))
+        if posicao < len(self.rotulos) and self.rotulos[posicao][0] == indice:
+            _, formato, partes = self.rotulos[posicao]
+            return formato.format(*partes)
+        for (turma, d, a, prof, materia), var_h in self.horario_vars.items():
+            if var_h.Index() == indice:
+                return f"H_{turma}_{prof}_{materia}_{d}_{a}"
+        return f"v{indice}"
+
+    def ocorre_no_dia(self, turma, materia, d):
+        chave = (turma, materia, d)
+        literal = self.materia_no_dia.get(chave)
+        if literal is not None:
+            return literal
+        literal = self.nova_bool("ocorre_{}_{}_{}", turma, materia, d)
+        vars_dia = self.mapa_turma_materia_dia.get(chave)
+        if not vars_dia:
+            # Nenhum horário possível nesse dia (prof bloqueado)
+            self.model.Add(literal == 0)
+        else:
+            # Truque CP: sum(vars) > 0 <=> literal
+            self.model.Add(sum(vars_dia) > 0).OnlyEnforceIf(literal)
+            self.model.Add(sum(vars_dia) == 0).OnlyEnforceIf(literal.Not())
+        self.materia_no_dia[chave] = literal
+        return literal
+
+    def penalizar(self, tipo, desc, var, peso):
+        self.termos_custo.append(var * peso)
+        self.detalhes_audit.append({
+            "tipo": tipo,
+            "desc": desc,
+            "var": var,
+            "peso": peso
+        })
+
+
+# =========================
+# 1. CRIAÇÃO DAS VARIÁVEIS
+# =========================
+def _criar_variaveis(m):
+    # D) Indisponibilidade Declarada: em vez de criar a Bool e depois fixar
+    # var == 0, os horários bloqueados do professor simplesmente não ganham
+    # variável. Quem busca em horario_vars/mapas trata a ausência como 0.
+    model = m.model
+    nomear = m.nomes_variaveis
+    evitadas = 0
+    for item in m.grade_aulas:
+        turma = item['turma']
+        prof = item['prof']
+        materia = item['materia']
+        aulas_dia = m.aulas_por_turma_idx[turma]
+        bloqueios = m.bloqueios_globais.get(prof, ())
+
+        m.mapa_conteudo_turma[turma].add((prof, materia))
+        vars_item = []
+
+        for d in range(len(m.dias_semana)):
+            for a in range(aulas_dia):
+                if (d, a) in bloqueios:
+                    evitadas += 1
+                    continue
+                key = (turma, d, a, prof, materia)
+                # Sem rótulo: a chave já identifica a variável (ver nome_variavel)
+                var = model.NewBoolVar(f"H_{turma}_{prof}_{materia}_{d}_{a}" if nomear else "")
+                m.horario_vars[key] = var
+                vars_item.append(var)
+
+                m.mapa_turma_horario[(turma, d, a)].append(var)
+                m.mapa_prof_horario[(prof, d, a)].append(var)
+                m.mapa_turma_prof_horario[(turma, prof, d)].append(var)
+                m.mapa_turma_materia_dia[(turma, materia, d)].append(var)
+
+        m.vars_por_item.append(vars_item)
+
+    # Aulas do prof no dia em ordem de horário (todas as turmas)
+    for (prof, d, a), vars_slot in sorted(m.mapa_prof_horario.items(), key=lambda kv: kv[0][2]):
+        m.mapa_prof_dia[(prof, d)].extend(vars_slot)
+
+    m.estatisticas["variaveis_evitadas"] = evitadas
+
+def _criar_aulas(m):
+    # Formulação "por_aula": cada cópia de um item da grade é uma IntVar com
+    # o horário global dia * max_aulas_escola + aula, cujo domínio já exclui
+    # os bloqueios do professor (D). As cópias do item vão em ordem
+    # crescente, então a quantidade (C) vem de graça e não há simetria entre
+    # elas. As penalidades leem só dois agregados:
+    #   - um literal por cópia e dia (G, F, redundantes);
+    #   - a ocupação do prof por horário (E, H/I), ligada às cópias por
+    #     AddElement e pela contagem (sum == número de aulas do prof).
+    model = m.model
+    max_aulas_escola = m.max_aulas_escola
+    evitadas = 0
+    aulas_prof = defaultdict(list)
+    slots_prof = defaultdict(set)
+
+    for i, item in enumerate(m.grade_aulas):
+        turma = item['turma']
+        prof = item['prof']
+        materia = item['materia']
+        aulas_dia = m.aulas_por_turma_idx[turma]
+        bloqueios = m.bloqueios_globais.get(prof, ())
+
+        m.mapa_conteudo_turma[turma].add((prof, materia))
+        m.indice_item.setdefault((turma, prof, materia), i)
+
+        slots = []
+        for d in range(len(m.dias_semana)):
+            for a in range(aulas_dia):
+                if (d, a) in bloqueios:
+                    evitadas += 1
+                    continue
+                slots.append(d * max_aulas_escola + a)
+        m.slots_item.append(slots)
+        slots_prof[prof].update(slots)
+
+        copias = []
+        if not slots and item['qtd'] > 0:
+            # Nenhum horário possível: o mesmo "0 aulas == qtd" da booleana
+            model.AddBoolOr([])
+        elif slots:
+            dominio = cp_model.Domain.FromValues(slots)
+            dias = sorted(set(s // max_aulas_escola for s in slots))
+            anterior = None
+            for k in range(item['qtd']):
+                inicio = m.nova_int_dominio(dominio, "aula_{}_{}_{}_{}", turma, prof, materia, k)
+                if anterior is not None:
+                    model.Add(anterior < inicio)
+                anterior = inicio
+
+                no_dia = {}
+                for d in dias:
+                    literal = m.nova_bool("aula_{}_{}_{}_{}_dia_{}", turma, prof, materia, k, d)
+                    no_dia[d] = literal
+                    m.mapa_turma_dia[(turma, d)].append(literal)
+                    m.mapa_turma_prof_horario[(turma, prof, d)].append(literal)
+                    m.mapa_turma_materia_dia[(turma, materia, d)].append(literal)
+                model.AddExactlyOne(no_dia.values())
+                # inicio - max_aulas * dia fica entre 0 e max_aulas - 1
+                inicio_dia = sum(d * max_aulas_escola * literal for d, literal in no_dia.items())
+                model.Add(inicio >= inicio_dia)
+                model.Add(inicio <= inicio_dia + max_aulas_escola - 1)
+                copias.append((inicio, no_dia))
+                aulas_prof[prof].append(inicio)
+        m.aulas_por_item.append(copias)
+
+    n_slots = len(m.dias_semana) * max_aulas_escola
+    for prof, inicios in aulas_prof.items():
+        # ocupacao[s] = 1 em todo horário com aula do prof; como as cópias
+        # do prof são distintas (B) e a soma é o número delas, vale 1 só aí
+        ocupacao = [0] * n_slots
+        for s in sorted(slots_prof[prof]):
+            d, a = divmod(s, max_aulas_escola)
+            var = m.nova_bool("ocupa_{}_{}_{}", prof, d, a)
+            ocupacao[s] = var
+            m.ocupacao_prof[(prof, d, a)] = var
+            m.mapa_prof_horario[(prof, d, a)].append(var)
+        model.Add(sum(v for v in ocupacao if not isinstance(v, int)) == len(inicios))
+        for inicio in inicios:
+            model.AddElement(inicio, ocupacao, 1)
+
+    # Aulas do prof no dia em ordem de horário (todas as turmas)
+    for (prof, d, a), vars_slot in sorted(m.mapa_prof_horario.items(), key=lambda kv: kv[0][2]):
+        m.mapa_prof_dia[(prof, d)].extend(vars_slot)
+
+    m.estatisticas["variaveis_evitadas"] = evitadas
+
+# =========================
+# 2. HARD CONSTRAINTS (Regras Rígidas)
+# =========================
+def _restricoes_colisao(m):
+    model = m.model
+    if m.formulacao == "por_aula":
+        # A e B: as cópias de aula da turma (e do professor) em horários distintos
+        por_turma = defaultdict(list)
+        por_prof = defaultdict(list)
+        for item, copias in zip(m.grade_aulas, m.aulas_por_item):
+            por_turma[item['turma']].extend(inicio for inicio, _ in copias)
+            por_prof[item['prof']].extend(inicio for inicio, _ in copias)
+        for inicios in list(por_turma.values()) + list(por_prof.values()):
+            if len(inicios) > 1:
+                model.AddAllDifferent(inicios)
+        return
+
+    # A) Colisão de Turma: Uma turma só tem 1 aula por horário
+    # (AddAtMostOne em vez de sum(...) <= 1: não monta a expressão linear
+    # em Python e vai direto para o proto como at_most_one)
+    for vars_list in m.mapa_turma_horario.values():
+        model.AddAtMostOne(vars_list)
+
+    # B) Colisão de Professor: Professor só em 1 lugar ao mesmo tempo
+    for vars_list in m.mapa_prof_horario.values():
+        model.AddAtMostOne(vars_list)
+
+def _restricoes_quantidade(m):
+    # C) Quantidade de Aulas: Respeitar a grade curricular
+    for item, vars_materia in zip(m.grade_aulas, m.vars_por_item):
+        # Se a grade pede X aulas, deve ter exatamente X aulas
+        m.model.Add(sum(vars_materia) == item['qtd'])
+
+def _restricoes_redundantes(m):
+    # Restrições implicadas por A-D (não mudam o conjunto de soluções), mas
+    # que o CP-SAT não deduz sozinho das somas por horário: contagens por
+    # dia da turma e do professor, com os limites que a indisponibilidade
+    # impõe. Ajudam a provar inviabilidade e a subir o limite inferior.
+    model = m.model
+    n_dias = len(m.dias_semana)
+
+    carga_turma = defaultdict(int)
+    carga_prof = defaultdict(int)
+    for item in m.grade_aulas:
+        carga_turma[item['turma']] += item['qtd']
+        carga_prof[item['prof']] += item['qtd']
+
+    for turma in m.turmas_totais:
+        aulas_dia = m.aulas_por_turma_idx[turma]
+        if carga_turma[turma] == aulas_dia * n_dias and m.formulacao == "booleana":
+            # Grade cheia: todo horário da turma tem exatamente uma aula
+            # (em "por_aula" o AllDifferent já diz isso; o mínimo por dia
+            # abaixo vira aulas_dia)
+            for d in range(n_dias):
+                for a in range(aulas_dia):
+                    model.Add(sum(m.mapa_turma_horario.get((turma, d, a), [])) == 1)
+            continue
+
+        # Pombos: o que não cabe nos outros dias tem que cair neste
+        minimo_dia = max(0, carga_turma[turma] - (n_dias - 1) * aulas_dia)
+        por_dia = []
+        for d in range(n_dias):
+            if m.formulacao == "por_aula":
+                vars_dia = m.mapa_turma_dia.get((turma, d), [])
+            else:
+                vars_dia = [v for a in range(aulas_dia) for v in m.mapa_turma_horario.get((turma, d, a), [])]
+            total = m.nova_int(0, aulas_dia, "red_turma_{}_{}", turma, d)
+            model.Add(total == sum(vars_dia))
+            model.Add(total >= minimo_dia)
+            por_dia.append(total)
+        model.Add(sum(por_dia) == carga_turma[turma])
+
+    for prof in m.profs_unicos:
+        # Cada dia comporta no máximo os horários em que o prof está livre;
+        # a soma da semana é a carga dele (a mesma conta de calcular_capacidade)
+        por_dia = []
+        for d in range(n_dias):
+            livres = [a for a in range(m.max_aulas_escola) if (prof, d, a) in m.mapa_prof_horario]
+            total = m.nova_int(0, len(livres), "red_prof_{}_{}", prof, d)
+            model.Add(total == sum(v for a in livres for v in m.mapa_prof_horario[(prof, d, a)]))
+            por_dia.append(total)
+        model.Add(sum(por_dia) == carga_prof[prof])
+
+# =========================
+# 3. CONSTRAINTS AVANÇADAS
+# =========================
+def _restricoes_janelas(m, mapa_aulas_vagas):
+    # --- E) JANELAS (Aulas Vagas) ---
+    # Limita o tempo ocioso do professor entre a primeira e a última aula do dia
+    model = m.model
+    max_aulas_escola = m.max_aulas_escola
+
+    dias_bloqueados = 0
+    for prof in m.profs_unicos:
+        limite_janelas = mapa_aulas_vagas.get(prof, 2) # Padrão 2 se não definido
+
+        for d in range(len(m.dias_semana)):
+            # Dia inteiro bloqueado: não há como ter janela, nem variáveis
+            if (prof, d) not in m.mapa_prof_dia:
+                dias_bloqueados += 1
+                continue
+
+            # Variáveis que indicam se o prof trabalha na aula 'a' do dia 'd'
+            trabalha_no_horario = []
+
+            # Como as aulas variam por turma, pegamos o maximo global (ex: 5 ou 6 aulas)
+            for a in range(max_aulas_escola):
+                # Soma todas as turmas que esse prof pode estar nesse dia/horario
+                vars_slot = m.mapa_prof_horario.get((prof, d, a), [])
+
+                if not vars_slot:
+                    # Se não tem aula nenhuma possível nesse slot, é 0 constante
+                    trabalha_no_horario.append(0)
+                elif (prof, d, a) in m.ocupacao_prof:
+                    # "por_aula": a ocupação já é essa variável
+                    trabalha_no_horario.append(m.ocupacao_prof[(prof, d, a)])
+                else:
+                    # Cria var booleana: 1 se der aula, 0 se não
+                    var_trab = m.nova_bool("trab_{}_{}_{}", prof, d, a)
+                    model.Add(sum(vars_slot) == var_trab) # Soma será 0 ou 1
+                    trabalha_no_horario.append(var_trab)
+
+            # Se o professor não trabalha no dia, janelas = 0. Precisamos tratar isso.
+            tem_aula_dia = m.nova_bool("tem_aula_{}_{}", prof, d)
+            model.Add(sum(trabalha_no_horario) > 0).OnlyEnforceIf(tem_aula_dia)
+            model.Add(sum(trabalha_no_horario) == 0).OnlyEnforceIf(tem_aula_dia.Not())
+
+            # Definir Início (primeira aula) e Fim (última aula)
+            inicio = m.nova_int(0, max_aulas_escola, "inicio_{}_{}", prof, d)
+            fim = m.nova_int(0, max_aulas_escola, "fim_{}_{}", prof, d)
+
+            # Restrições para encontrar inicio e fim
+            for idx, var_bin in enumerate(trabalha_no_horario):
+                # Se trabalha no idx, o inicio deve ser <= idx
+                if isinstance(var_bin, int) and var_bin == 0: continue
+
+                model.Add(inicio <= idx).OnlyEnforceIf(var_bin)
+                model.Add(fim >= idx).OnlyEnforceIf(var_bin)
+
+            # Span (Duração da estadia na escola) = Fim - Inicio + 1
+            span = m.nova_int(0, max_aulas_escola, "span_{}_{}", prof, d)
+            model.Add(span == fim - inicio + 1).OnlyEnforceIf(tem_aula_dia)
+            model.Add(span == 0).OnlyEnforceIf(tem_aula_dia.Not())
+
+            # Janelas = Span - Aulas Dadas
+            # Ex: Aula na 1 e na 3. Span = 3-1+1 = 3. Aulas = 2. Janelas = 1.
+            qtd_janelas = m.nova_int(0, max_aulas_escola, "janelas_{}_{}", prof, d)
+
+            # Precisamos somar as variaveis da lista trabalha_no_horario (tratando int 0)
+            soma_aulas = sum(v for v in trabalha_no_horario if not isinstance(v, int) or v != 0)
+
+            model.Add(qtd_janelas == span - soma_aulas).OnlyEnforceIf(tem_aula_dia)
+            model.Add(qtd_janelas == 0).OnlyEnforceIf(tem_aula_dia.Not())
+
+            # Hard Constraint Relaxada: Se passar do limite, penaliza MUITO forte
+            # Isso evita que o Solver retorne "Impossible" se for matematicamente impossível
+            # mas tenta ao máximo respeitar.
+            excesso_janela = m.nova_int(0, max_aulas_escola, "exc_jan_{}_{}", prof, d)
+            model.Add(excesso_janela >= qtd_janelas - limite_janelas)
+            model.Add(excesso_janela >= 0) # ReLU
+
+            m.penalizar(
+                "Janelas em Excesso",
+                f"{prof} excedeu limite de janelas ({m.dias_semana[d]})",
+                excesso_janela,
+                PESO_JANELA
+            )
+
+    m.estatisticas["dias_sem_janela"] = dias_bloqueados
+
+def _restricoes_janelas_transicoes(m, mapa_aulas_vagas):
+    # --- E) JANELAS, codificação por transições ---
+    # comecou[a] = o prof já deu aula em algum horário <= a (prefixo)
+    # falta[a]   = o prof ainda dá aula em algum horário >= a (sufixo)
+    # Num dia com aula, um horário vago é janela exatamente quando está
+    # entre a primeira e a última aula, ou seja, comecou[a] + falta[a] = 2.
+    # Fora do intervalo só um dos dois vale, então
+    #   janelas = soma(comecou + falta - 1 - trabalha)
+    # e num dia sem aula a expressão fica negativa (o excesso vai a 0).
+    # Como no 'span' (início só limitado por cima), comecou/falta só têm
+    # limite inferior: valer 1 à toa só aumenta o custo, e o solver evita.
+    model = m.model
+    max_aulas_escola = m.max_aulas_escola
+
+    dias_bloqueados = 0
+    for prof in m.profs_unicos:
+        limite_janelas = mapa_aulas_vagas.get(prof, 2)
+
+        for d in range(len(m.dias_semana)):
+            trabalha = [sum(m.mapa_prof_horario.get((prof, d, a), [])) for a in range(max_aulas_escola)]
+            possiveis = [a for a in range(max_aulas_escola) if (prof, d, a) in m.mapa_prof_horario]
+            if not possiveis:
+                dias_bloqueados += 1
+                continue
+
+            # Só os horários entre o primeiro e o último possível contam;
+            # horário sem variável repete o prefixo/sufixo do vizinho
+            trecho = range(possiveis[0], possiveis[-1] + 1)
+            comecou = {}
+            anterior = None
+            for a in trecho:
+                if (prof, d, a) not in m.mapa_prof_horario:
+                    comecou[a] = anterior
+                    continue
+                var = m.nova_bool("comecou_{}_{}_{}", prof, d, a)
+                model.Add(var >= trabalha[a])
+                if anterior is not None:
+                    model.Add(var >= anterior)
+                comecou[a] = anterior = var
+
+            falta = {}
+            seguinte = None
+            for a in reversed(trecho):
+                if (prof, d, a) not in m.mapa_prof_horario:
+                    falta[a] = seguinte
+                    continue
+                var = m.nova_bool("falta_{}_{}_{}", prof, d, a)
+                model.Add(var >= trabalha[a])
+                if seguinte is not None:
+                    model.Add(var >= seguinte)
+                falta[a] = seguinte = var
+
+            # Vago entre duas aulas: comecou e falta valem 1, trabalha 0
+            qtd_janelas = sum(comecou[a] + falta[a] - 1 - trabalha[a] for a in trecho)
+
+            excesso_janela = m.nova_int(0, max_aulas_escola, "exc_jan_{}_{}", prof, d)
+            model.Add(excesso_janela >= qtd_janelas - limite_janelas)
+
+            m.penalizar(
+                "Janelas em Excesso",
+                f"{prof} excedeu limite de janelas ({m.dias_semana[d]})",
+                excesso_janela,
+                PESO_JANELA
+            )
+
+    m.estatisticas["dias_sem_janela"] = dias_bloqueados
+
+def normalizar_agrupamentos(grupos):
+    # Lista de grupos nos dois formatos -> [{"regra": ..., "materias": [...]}]
+    normalizados = []
+    for grupo in grupos or []:
+        if isinstance(grupo, dict):
+            regra = grupo.get("regra") or "mesmo_dia"
+            materias = list(grupo["materias"])
+        else:
+            regra = "mesmo_dia"
+            materias = list(grupo)
+        if regra not in REGRAS_AGRUPAMENTO:
+            raise ValueError(f"Regra de agrupamento desconhecida: {regra} (use {', '.join(REGRAS_AGRUPAMENTO)})")
+        normalizados.append({"regra": regra, "materias": materias})
+    return normalizados
+
+def _restricoes_agrupamento(m, materias_para_agrupar):
+    # --- F) AGRUPAMENTO DE MATÉRIAS ---
+    # "mesmo_dia": as matérias do grupo devem ocorrer nos mesmos dias na turma
+    # (todas alinhadas com a primeira, a líder).
+    # "dias_diferentes": duas matérias do grupo nunca no mesmo dia da turma.
+    # Os dois usam o literal de m.ocorre_no_dia, então vários grupos com a
+    # mesma matéria não repetem variáveis nem restrições.
+    model = m.model
+    materias_turma = {
+        turma: set(mat for p, mat in m.mapa_conteudo_turma[turma]) for turma in m.turmas_totais
+    }
+
+    # construir_modelo já normalizou os grupos
+    for grupo in materias_para_agrupar:
+        materias = grupo["materias"]
+        if len(materias) < 2: continue
+
+        if grupo["regra"] == "dias_diferentes":
+            for turma in m.turmas_totais:
+                # Só as matérias do grupo que a turma tem
+                presentes = [mat for mat in materias if mat in materias_turma[turma]]
+                for i, mat_a in enumerate(presentes):
+                    for mat_b in presentes[i + 1:]:
+                        for d in range(len(m.dias_semana)):
+                            # juntas >= a + b - 1: vale 1 quando as duas caem no dia
+                            juntas = m.nova_bool("juntas_{}_{}_{}_{}", turma, mat_a, mat_b, d)
+                            model.Add(juntas >= m.ocorre_no_dia(turma, mat_a, d) + m.ocorre_no_dia(turma, mat_b, d) - 1)
+
+                            m.penalizar(
+                                "Matérias no Mesmo Dia",
+                                f"{turma}: {mat_a} e {mat_b} juntas em {m.dias_semana[d]}",
+                                juntas,
+                                PESO_SEPARACAO
+                            )
+            continue
+
+        materia_lider = materias[0]
+        materias_seguidoras = materias[1:]
+
+        for turma in m.turmas_totais:
+            # Verifica se essa turma tem essas matérias
+            if materia_lider not in materias_turma[turma]: continue
+
+            for m_seg in materias_seguidoras:
+                if m_seg not in materias_turma[turma]: continue
+
+                # Agora sabemos que a turma tem as duas matérias.
+                # Vamos alinhar dia a dia.
+                for d in range(len(m.dias_semana)):
+                    lider_hoje = m.ocorre_no_dia(turma, materia_lider, d)
+                    seg_hoje = m.ocorre_no_dia(turma, m_seg, d)
+
+                    # Penalidade se forem diferentes (uma tem aula, a outra não)
+                    # abs(lider - seg)
+                    diferenca = m.nova_int(0, 1, "diff_{}_{}_{}_{}", turma, materia_lider, m_seg, d)
+                    model.Add(diferenca == lider_hoje - seg_hoje).OnlyEnforceIf(lider_hoje) # Se lider=1, diff = 1 - seg
+                    model.Add(diferenca == seg_hoje - lider_hoje).OnlyEnforceIf(lider_hoje.Not()) # Se lider=0, diff = seg - 0
+
+                    m.penalizar(
+                        "Agrupamento Falhou",
+                        f"{turma}: {materia_lider} e {m_seg} separados em {m.dias_semana[d]}",
+                        diferenca,
+                        PESO_AGRUPAMENTO
+                    )
+
+# =========================
+# 4. SOFT CONSTRAINTS (Qualidade de Vida)
+# =========================
+def _restricoes_geminadas(m):
+    # G) Evitar Repetição no Mesmo Dia (GEMINADAS PERMITIDAS)
+    # Regra Ajustada: Até 2 aulas (dobradinha) é OK. 3 ou mais penaliza.
+    model = m.model
+
+    # Aulas semanais do prof na turma: com 2 ou menos o excesso é sempre 0,
+    # então nem a variável nem a penalidade são criadas
+    carga_turma_prof = defaultdict(int)
+    for item in m.grade_aulas:
+        carga_turma_prof[(item['turma'], item['prof'])] += item['qtd']
+
+    for turma in m.turmas_totais:
+        # Analisar por professor
+        profs_da_turma = set(p for p, mat in m.mapa_conteudo_turma[turma])
+
+        for prof in profs_da_turma:
+            if carga_turma_prof[(turma, prof)] <= 2: continue
+            for d in range(len(m.dias_semana)):
+                vars_dia = m.mapa_turma_prof_horario.get((turma, prof, d), [])
+                if not vars_dia: continue
+
+                # Penalidade se > 2 (permitimos geminadas); o domínio já é >= 0
+                excesso_geminada = m.nova_int(0, m.max_aulas_escola, "exc_gem_{}_{}_{}", turma, prof, d)
+                model.Add(excesso_geminada >= sum(vars_dia) - 2)
+
+                m.penalizar(
+                    "Muitas aulas seguidas",
+                    f"{prof} na {turma} ({m.dias_semana[d]}) > 2 aulas",
+                    excesso_geminada,
+                    PESO_REPETICAO_EXCESSIVA
+                )
+
+def _restricoes_carga_diaria(m):
+    # ==============================================================================
+    # H & I) CARGA DIÁRIA DO PROFESSOR (Excesso e Aula Única)
+    # Agrupamos aqui para calcular 'total_dia' apenas uma vez por prof/dia
+    # ==============================================================================
+    model = m.model
+    max_aulas_escola = m.max_aulas_escola
+
+    carga_prof = defaultdict(int)
+    for item in m.grade_aulas:
+        carga_prof[item['prof']] += item['qtd']
+
+    for prof in m.profs_unicos:
+        for d in range(len(m.dias_semana)):
+
+            # Todas as aulas desse prof no dia (em todas as turmas)
+            vars_dia_prof = m.mapa_prof_dia.get((prof, d))
+            if not vars_dia_prof: continue
+
+            # Variável que conta quantas aulas ele tem no TOTAL neste dia
+            total_dia = m.nova_int(0, max_aulas_escola, "total_prof_{}_{}", prof, d)
+            model.Add(total_dia == sum(vars_dia_prof))
+
+            # --- PARTE H: Penalizar Excesso (Cansaço) ---
+            # Quem não tem mais que LIMITE_SUAVE_DIARIO aulas na semana nunca excede
+            if carga_prof[prof] > LIMITE_SUAVE_DIARIO:
+                excesso = m.nova_int(0, max_aulas_escola, "overload_{}_{}", prof, d)
+                model.Add(excesso >= total_dia - LIMITE_SUAVE_DIARIO)
+
+                m.penalizar(
+                    "Concentração Diária",
+                    f"{prof} sobrecarregado em {m.dias_semana[d]}",
+                    excesso,
+                    PESO_EXCESSO_DIARIO
+                )
+
+            # --- PARTE I: Penalizar Aula Única (Viagem Perdida) ---
+            # Se total_dia == 1, ativa a penalidade.
+            eh_aula_unica = m.nova_bool("single_{}_{}", prof, d)
+
+            # Lógica: Se total == 1, bool é True. Se total != 1 (0, 2, 3...), bool é False.
+            model.Add(total_dia == 1).OnlyEnforceIf(eh_aula_unica)
+            model.Add(total_dia != 1).OnlyEnforceIf(eh_aula_unica.Not())
+
+            m.penalizar(
+                "Aula Isolada",
+                f"{prof} viaja p/ apenas 1 aula ({m.dias_semana[d]})",
+                eh_aula_unica,
+                PESO_AULA_UNICA
+            )
+
+# =========================
+# QUEBRA DE SIMETRIA (opcional)
+# =========================
+def secoes_equivalentes(turmas_totais, grade_aulas):
+    # Turmas com a mesma carga e exatamente os mesmos (prof, matéria, qtd),
+    # ex: "6º Ano A/B/C" com a mesma equipe. Trocar o horário inteiro de duas
+    # delas não muda nenhuma restrição nem o custo.
+    conteudo = defaultdict(list)
+    for item in grade_aulas:
+        conteudo[item['turma']].append((item['prof'], item['materia'], item['qtd']))
+
+    grupos = defaultdict(list)
+    for turma, total in turmas_totais.items():
+        if conteudo.get(turma):
+            grupos[(total, tuple(sorted(conteudo[turma])))].append(turma)
+    return [sorted(g) for g in grupos.values() if len(g) > 1]
+
+def _quebrar_simetrias(m):
+    model = m.model
+    max_aulas_escola = m.max_aulas_escola
+
+    # Seções equivalentes: a primeira aula de uma matéria âncora (mesmo prof
+    # em todas) tem que vir antes na seção A do que na B, e assim por diante.
+    # Nunca empatam porque o professor é o mesmo.
+    secoes = 0
+    for grupo in secoes_equivalentes(m.turmas_totais, m.grade_aulas):
+        itens = [item for item in m.grade_aulas if item['turma'] == grupo[0]]
+        ancora = max(itens, key=lambda item: (item['qtd'], item['prof'], item['materia']))
+        prof, materia = ancora['prof'], ancora['materia']
+
+        primeiras = []
+        for turma in grupo:
+            if m.formulacao == "por_aula":
+                # As cópias já vão em ordem: a primeira aula é a cópia 0
+                copias = m.aulas_por_item[m.indice_item[(turma, prof, materia)]]
+                if not copias:
+                    break
+                primeiras.append(copias[0][0])
+                continue
+            horarios = []
+            slots_possiveis = []
+            for d in range(len(m.dias_semana)):
+                for a in range(max_aulas_escola):
+                    var = m.horario_vars.get((turma, d, a, prof, materia))
+                    horarios.append(0 if var is None else var)
+                    if var is not None:
+                        slots_possiveis.append(d * max_aulas_escola + a)
+            if not slots_possiveis:
+                break
+
+            primeira = m.nova_int_dominio(cp_model.Domain.FromValues(slots_possiveis), "primeira_{}_{}", turma, materia)
+            model.AddElement(primeira, horarios, 1)
+            for idx, var in enumerate(horarios):
+                if not isinstance(var, int):
+                    model.Add(primeira <= idx).OnlyEnforceIf(var)
+            primeiras.append(primeira)
+        else:
+            for anterior, proxima in zip(primeiras, primeiras[1:]):
+                model.Add(anterior < proxima)
+            secoes += len(grupo)
+
+    m.estatisticas["secoes_ordenadas"] = secoes
+
+# =========================
+# 5. PARTIDA A QUENTE (Horário Anterior)
+# =========================
+def _chave(item, slot, max_aulas_escola):
+    # Horário global de uma cópia (formulação "por_aula") -> chave de horario_vars
+    d, a = divmod(slot, max_aulas_escola)
+    return (item['turma'], d, a, item['prof'], item['materia'])
+
+def ler_solucao(m, valor):
+    # Horário resolvido como {(turma, d, a, prof, materia): 1} nas duas
+    # formulações; 'valor' é solver.Value (ou o do callback)
+    if m.formulacao == "por_aula":
+        resultados = {}
+        for item, copias in zip(m.grade_aulas, m.aulas_por_item):
+            for inicio, _ in copias:
+                resultados[_chave(item, valor(inicio), m.max_aulas_escola)] = 1
+        return resultados
+    return {key: 1 for key, var in m.horario_vars.items() if valor(var) == 1}
+
+def aplicar_dicas(m, solucao):
+    # Troca as dicas do modelo pela solução dada (chaves de horario_vars com valor 1)
+    model = m.model
+    model.ClearHints()
+    if m.formulacao == "por_aula":
+        ocupados = set()
+        for item, copias, slots in zip(m.grade_aulas, m.aulas_por_item, m.slots_item):
+            usados = [s for s in slots if solucao.get(_chave(item, s, m.max_aulas_escola)) == 1]
+            for (inicio, no_dia), slot in zip(copias, usados):
+                model.AddHint(inicio, slot)
+                for d, literal in no_dia.items():
+                    model.AddHint(literal, 1 if d == slot // m.max_aulas_escola else 0)
+            ocupados.update(_chave(item, s, m.max_aulas_escola)[1:4] for s in usados)
+        for (prof, d, a), var in m.ocupacao_prof.items():
+            model.AddHint(var, 1 if (d, a, prof) in ocupados else 0)
+        return
+    for key, var in m.horario_vars.items():
+        model.AddHint(var, 1 if solucao.get(key) == 1 else 0)
+
+def _aplicar_solucao_anterior(m, solucao_anterior, peso_mudanca):
+    # solucao_anterior tem as mesmas chaves de horario_vars com valor 1
+    # (o 'vars' salvo no session_state ou lido do JSON exportado).
+    # Vira dica (AddHint) para o CP-SAT começar dela e, se peso_mudanca > 0,
+    # cada aula que sair do lugar antigo entra no custo.
+    aplicar_dicas(m, solucao_anterior)
+    if m.formulacao == "por_aula":
+        _aplicar_solucao_anterior_por_aula(m, solucao_anterior, peso_mudanca)
+        return
+
+    aproveitadas = 0
+    for key, valor in solucao_anterior.items():
+        var = m.horario_vars.get(key)
+        if valor != 1 or var is None:
+            continue
+        aproveitadas += 1
+        if peso_mudanca > 0:
+            turma, d, a, prof, materia = key
+            m.penalizar(
+                "Aula Movida",
+                f"{turma}: {materia} ({prof}) saiu de {m.dias_semana[d]} {a + 1}ª aula",
+                var.Not(),
+                peso_mudanca
+            )
+
+    # Aulas antigas que nem existem mais no modelo (turma removida, novo bloqueio...)
+    m.estatisticas["aulas_anteriores"] = sum(1 for v in solucao_anterior.values() if v == 1)
+    m.estatisticas["aulas_anteriores_possiveis"] = aproveitadas
+
+def _aplicar_solucao_anterior_por_aula(m, solucao_anterior, peso_mudanca):
+    # Sem uma Bool por chave, "a aula continua no lugar" é um literal que
+    # exige alguma cópia do item no horário antigo
+    model = m.model
+    aproveitadas = 0
+    for key, valor in solucao_anterior.items():
+        if valor != 1:
+            continue
+        turma, d, a, prof, materia = key
+        i = m.indice_item.get((turma, prof, materia))
+        slot = d * m.max_aulas_escola + a
+        if i is None or a >= m.aulas_por_turma_idx[turma] or slot not in m.slots_item[i]:
+            continue
+        aproveitadas += 1
+        if peso_mudanca > 0:
+            presentes = []
+            for k, (inicio, _) in enumerate(m.aulas_por_item[i]):
+                aqui = m.nova_bool("fica_{}_{}_{}_{}_{}_{}", turma, prof, materia, d, a, k)
+                model.Add(inicio == slot).OnlyEnforceIf(aqui)
+                presentes.append(aqui)
+            fica = m.nova_bool("fica_{}_{}_{}_{}_{}", turma, prof, materia, d, a)
+            model.Add(fica <= sum(presentes))
+            m.penalizar(
+                "Aula Movida",
+                f"{turma}: {materia} ({prof}) saiu de {m.dias_semana[d]} {a + 1}ª aula",
+                fica.Not(),
+                peso_mudanca
+            )
+
+    m.estatisticas["aulas_anteriores"] = sum(1 for v in solucao_anterior.values() if v == 1)
+    m.estatisticas["aulas_anteriores_possiveis"] = aproveitadas
+
+# ==========================================
+# FIXAÇÃO DE VARIÁVEIS (Re-otimização Parcial)
+# ==========================================
+def _manter_por_aula(m, solucao, manter):
+    # Formulação "por_aula": por item, os horários mantidos com aula e os
+    # liberados. As cópias só podem ir para um desses, e a ocupação do prof
+    # nos mantidos com aula fica em 1 (o único item do prof que alcança esse
+    # horário é o que estava lá). Item todo mantido: cada cópia no seu horário.
+    # Devolve [(IntVar, horários)], as ocupações em 1 e quantas chaves foram mantidas.
+    dominios = []
+    ocupadas = []
+    mantidas = 0
+    for item, copias, slots in zip(m.grade_aulas, m.aulas_por_item, m.slots_item):
+        com_aula, livres = [], []
+        for s in slots:
+            key = _chave(item, s, m.max_aulas_escola)
+            if not manter(key):
+                livres.append(s)
+                continue
+            mantidas += 1
+            if solucao.get(key) == 1:
+                com_aula.append(s)
+                ocupadas.append(m.ocupacao_prof[(key[3], key[1], key[2])])
+        if not livres and len(com_aula) == len(copias):
+            dominios.extend((inicio, [s]) for (inicio, _), s in zip(copias, com_aula))
+        else:
+            dominios.extend((inicio, sorted(com_aula + livres)) for inicio, _ in copias)
+    return dominios, ocupadas, mantidas
+
+def fixar_variaveis(m, solucao, manter):
+    # Fixa no valor de 'solucao' toda variável de horário cuja chave
+    # (turma, d, a, prof, materia) satisfaz manter(chave). Chaves ausentes
+    # da solução são fixadas em 0. Devolve quantas foram fixadas.
+    if m.formulacao == "por_aula":
+        dominios, ocupadas, mantidas = _manter_por_aula(m, solucao, manter)
+        for inicio, valores in dominios:
+            m.model.AddLinearExpressionInDomain(inicio, cp_model.Domain.FromValues(valores))
+        for var in ocupadas:
+            m.model.Add(var == 1)
+        return mantidas
+    fixadas = 0
+    for key, var in m.horario_vars.items():
+        if manter(key):
+            m.model.Add(var == (1 if solucao.get(key) == 1 else 0))
+            fixadas += 1
+    return fixadas
+
+def restringir_dominios(m, solucao, manter):
+    # Como fixar_variaveis, mas mexendo direto no domínio das variáveis do
+    # proto. Não acrescenta restrições, então o mesmo modelo pode ser
+    # reaproveitado em várias rodadas (LNS) chamando liberar_dominios entre elas.
+    variaveis = m.model.Proto().variables
+    if m.formulacao == "por_aula":
+        dominios, ocupadas, mantidas = _manter_por_aula(m, solucao, manter)
+        for inicio, valores in dominios:
+            dominio = variaveis[inicio.Index()].domain
+            dominio.clear()
+            dominio.extend(cp_model.Domain.FromValues(valores).FlattenedIntervals())
+        for var in m.ocupacao_prof.values():
+            variaveis[var.Index()].domain[0] = 0
+        for var in ocupadas:
+            variaveis[var.Index()].domain[0] = 1
+        return mantidas
+    fixadas = 0
+    for key, var in m.horario_vars.items():
+        dominio = variaveis[var.Index()].domain
+        if manter(key):
+            valor = 1 if solucao.get(key) == 1 else 0
+            dominio[0] = valor
+            dominio[1] = valor
+            fixadas += 1
+        else:
+            dominio[0] = 0
+            dominio[1] = 1
+    return fixadas
+
+def liberar_dominios(m):
+    return restringir_dominios(m, {}, lambda key: False)
+
+# ==========================================
+# ESTÁGIOS DO OBJETIVO LEXICOGRÁFICO
+# ==========================================
+def estagios_lexicograficos(m):
+    # As penalidades agrupadas por tipo, da família de maior peso para a de
+    # menor (janelas, aula isolada, concentração, agrupamento, repetição).
+    # Cada estágio é (tipo, lista de itens de detalhes_audit).
+    por_tipo = defaultdict(list)
+    for item in m.detalhes_audit:
+        por_tipo[item["tipo"]].append(item)
+    return sorted(por_tipo.items(), key=lambda kv: -max(item["peso"] for item in kv[1]))
+
+# ==========================================
+# CONSTRUÇÃO DO MODELO
+# ==========================================
+def _medir_familia(m, familia, funcao, *args):
+    # Roda uma família de restrições e anota em estatisticas["familias"]
+    # quanto ela acrescentou ao modelo e quanto tempo levou
+    proto = m.model.Proto()
+    antes = (len(proto.variables), len(proto.constraints), len(m.detalhes_audit))
+    inicio = time.perf_counter()
+    funcao(m, *args)
+    m.estatisticas["familias"].append({
+        "familia": familia,
+        "variaveis": len(proto.variables) - antes[0],
+        "restricoes": len(proto.constraints) - antes[1],
+        "penalidades": len(m.detalhes_audit) - antes[2],
+        "tempo": time.perf_counter() - inicio
+    })
+
+def construir_modelo(
+    turmas_totais,
+    grade_aulas,
+    dias_semana,
+    bloqueios_globais,
+    materias_para_agrupar=None,
+    mapa_aulas_vagas=None,
+    solucao_anterior=None,
+    peso_mudanca=0,
+    quebrar_simetria=False,
+    restricoes_redundantes=False,
+    janelas="span",
+    nomes_variaveis=None,
+    formulacao="booleana"
+):
+    # nomes_variaveis=None segue HORARIO_NOMES_VARIAVEIS (padrão: sem nomes)
+    if formulacao not in FORMULACOES:
+        raise ValueError(f"Formulação desconhecida: {formulacao} (use {', '.join(FORMULACOES)})")
+    if janelas not in CODIFICACOES_JANELA:
+        raise ValueError(f"Codificação de janelas desconhecida: {janelas} (use {', '.join(CODIFICACOES_JANELA)})")
+    materias_para_agrupar = normalizar_agrupamentos(materias_para_agrupar)
+
+    inicio = time.perf_counter()
+    if nomes_variaveis is None:
+        nomes_variaveis = _nomes_padrao()
+    m = ModeloHorario(turmas_totais, grade_aulas, dias_semana, bloqueios_globais, nomes_variaveis, formulacao)
+    m.estatisticas["familias"] = []
+
+    if formulacao == "por_aula":
+        # A quantidade (C) já está no número de cópias de cada item
+        _medir_familia(m, "variaveis", _criar_aulas)
+        _medir_familia(m, "colisao", _restricoes_colisao)
+    else:
+        _medir_familia(m, "variaveis", _criar_variaveis)
+        _medir_familia(m, "colisao", _restricoes_colisao)
+        _medir_familia(m, "quantidade", _restricoes_quantidade)
+    if restricoes_redundantes:
+        _medir_familia(m, "redundantes", _restricoes_redundantes)
+    if janelas == "transicoes":
+        _medir_familia(m, "janelas", _restricoes_janelas_transicoes, mapa_aulas_vagas or {})
+    else:
+        _medir_familia(m, "janelas", _restricoes_janelas, mapa_aulas_vagas or {})
+    if materias_para_agrupar:
+        _medir_familia(m, "agrupamento", _restricoes_agrupamento, materias_para_agrupar)
+    _medir_familia(m, "geminadas", _restricoes_geminadas)
+    _medir_familia(m, "carga_diaria", _restricoes_carga_diaria)
+    if quebrar_simetria and not solucao_anterior:
+        # Com horário anterior as seções deixam de ser intercambiáveis (o
+        # anterior fixa qual é qual)
+        _medir_familia(m, "simetria", _quebrar_simetrias)
+    if solucao_anterior:
+        _medir_familia(m, "solucao_anterior", _aplicar_solucao_anterior, solucao_anterior, peso_mudanca)
+
+    # =========================
+    # 6. OBJETIVO
+    # =========================
+    if m.termos_custo:
+        _medir_familia(m, "objetivo", lambda m: m.model.Minimize(sum(m.termos_custo)))
+
+    proto = m.model.Proto()
+    m.estatisticas.update({
+        "formulacao": formulacao,
+        "janelas": janelas,
+        "nomes_variaveis": nomes_variaveis,
+        "variaveis": len(proto.variables),
+        "restricoes": len(proto.constraints),
+        "tempo_construcao": time.perf_counter() - inicio
+    })
+    return m
@@ -0,0 +1,94 @@
+import os
+
+
+# ==========================================
+# PERFIS DO SOLVER
+# ==========================================
+# O tempo cresce com o tamanho do modelo (segundos por mil variáveis de
+# horário) e fica entre tempo_min e tempo_max. 'estagnacao' é a fração do
+# tempo sem melhora no custo que encerra a busca antes do limite.
+# 'max_workers' só vale para modelos grandes (ver FAIXAS_WORKERS).
+PERFIS = {
+    "rapido": {
+        "nome": "Prévia rápida",
+        "tempo_min": 5,
+        "tempo_max": 30,
+        "segundos_por_mil": 1,
+        "max_workers": 8,
+        "gap": 0.05,
+        "estagnacao": 0.25
+    },
+    "padrao": {
+        "nome": "Padrão",
+        "tempo_min": 20,
+        "tempo_max": 300,
+        "segundos_por_mil": 6,
+        "max_workers": 16,
+        "gap": 0.01,
+        "estagnacao": 0.15
+    },
+    "noturno": {
+        "nome": "Noturno",
+        "tempo_min": 600,
+        "tempo_max": 4 * 3600,
+        "segundos_por_mil": 120,
+        "max_workers": 32,
+        "gap": None,
+        "estagnacao": None
+    },
+}
+
+
+# Workers do CP-SAT pelo tamanho do modelo: (até N variáveis de horário,
+# workers). Uma prévia de poucas turmas não ganha nada com 16 workers e
+# ainda disputa CPU com os outros jobs; acima da última faixa vale o
+# 'max_workers' do perfil.
+FAIXAS_WORKERS = (
+    (2000, 1),
+    (5000, 2),
+    (10000, 4),
+    (20000, 8),
+)
+
+
+def tamanho_estimado(turmas_totais, grade_aulas, dias_semana, bloqueios_globais):
+    # Número de variáveis de horário que construir_modelo vai criar: um por
+    # item da grade e horário da turma, fora os bloqueios do professor
+    n_dias = len(dias_semana)
+    total = 0
+    for item in grade_aulas:
+        if item['turma'] not in turmas_totais:
+            continue
+        aulas_dia = turmas_totais[item['turma']] // 5
+        bloqueios = bloqueios_globais.get(item['prof'], ())
+        total += sum(1 for d in range(n_dias) for a in range(aulas_dia) if (d, a) not in bloqueios)
+    return total
+
+def workers_por_tamanho(variaveis, max_workers, jobs_simultaneos=1):
+    # Workers para um modelo com esse número de variáveis de horário, sem
+    # passar dos CPUs que cabem a cada um dos jobs que rodam ao mesmo tempo
+    workers = max_workers
+    for limite, n in FAIXAS_WORKERS:
+        if variaveis <= limite:
+            workers = min(n, max_workers)
+            break
+    cpus_por_job = (os.cpu_count() or 1) // max(1, jobs_simultaneos)
+    return max(1, min(workers, cpus_por_job))
+
+def parametros_perfil(perfil, turmas_totais, grade_aulas, dias_semana, bloqueios_globais, jobs_simultaneos=1):
+    # Devolve os argumentos de tempo e paralelismo para resolver_horario
+    # (e companhia) conforme o perfil, o tamanho da escola e os CPUs da
+    # máquina. jobs_simultaneos: quantos solves dividem a máquina (o
+    # max_jobs do GerenciadorJobs no app; 1 na linha de comando)
+    if perfil not in PERFIS:
+        raise ValueError(f"Perfil desconhecido: {perfil} (use {', '.join(PERFIS)})")
+    p = PERFIS[perfil]
+    variaveis = tamanho_estimado(turmas_totais, grade_aulas, dias_semana, bloqueios_globais)
+    tempo = p["tempo_min"] + p["segundos_por_mil"] * variaveis / 1000
+    tempo = round(min(p["tempo_max"], tempo), 1)
+    return {
+        "tempo_limite": tempo,
+        "num_workers": workers_por_tamanho(variaveis, p["max_workers"], jobs_simultaneos),
+        "gap_aceitavel": p["gap"],
+        "estagnacao": round(tempo * p["estagnacao"], 1) if p["estagnacao"] else None
+    }
@@ -0,0 +1,212 @@
+import logging
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .modelo import aplicar_dicas, construir_modelo
+from .progresso import calcular_gap
+from .solver import resolver_modelo
+
+
+logger = logging.getLogger("horario.portfolio")
+
+# Cada configuração é um conjunto de parâmetros do CP-SAT aplicado por cima
+# dos de resolver_modelo (linearization_level = 0). Enums vão pelo nome.
+CONFIGURACOES_PORTFOLIO = [
+    {"nome": "padrão", "parametros": {}},
+    {"nome": "lp", "parametros": {"linearization_level": 1}},
+    {"nome": "lp forte", "parametros": {"linearization_level": 2}},
+    {"nome": "reinícios rápidos", "parametros": {"search_branching": "PORTFOLIO_WITH_QUICK_RESTART_SEARCH"}},
+    {"nome": "pseudo-custo", "parametros": {"search_branching": "PSEUDO_COST_SEARCH", "linearization_level": 1}},
+    {"nome": "aleatória", "parametros": {"search_branching": "RANDOMIZED_SEARCH"}},
+]
+
+
+def configuracoes_portfolio(quantidade):
+    # As primeiras 'quantidade' configurações, cada uma com a sua semente;
+    # passando do tamanho da lista, repete a lista
+    configuracoes = []
+    for i in range(quantidade):
+        base = CONFIGURACOES_PORTFOLIO[i % len(CONFIGURACOES_PORTFOLIO)]
+        volta = i // len(CONFIGURACOES_PORTFOLIO)
+        nome = base["nome"] if volta == 0 else f"{base['nome']} #{volta + 1}"
+        configuracoes.append({
+            "nome": nome,
+            "parametros": dict(base["parametros"], random_seed=i)
+        })
+    return configuracoes
+
+def _resolver_configuracao(indice, entrada, opcoes_modelo, dica, parametros_solver,
+                           prazo, num_workers, gap_aceitavel, estagnacao, parar, eventos):
+    # Roda no processo filho: monta o próprio modelo e devolve também as
+    # estatísticas, que resolver_horario não expõe. 'prazo' é o fim da
+    # rodada em time.time(): subir o processo e montar o modelo saem do
+    # tempo do solver, não se somam a ele.
+    m = construir_modelo(*entrada, **opcoes_modelo)
+    if dica:
+        aplicar_dicas(m, dica)
+    resposta = resolver_modelo(
+        m,
+        tempo_limite=max(0.1, prazo - time.time()),
+        num_workers=num_workers,
+        log_progresso=False,
+        parar=parar,
+        publicar=lambda evento: eventos.append((indice, evento)),
+        gap_aceitavel=gap_aceitavel,
+        parametros_solver=parametros_solver,
+        estagnacao=estagnacao
+    )
+    return resposta, m.estatisticas
+
+def resolver_portfolio(
+    turmas_totais,
+    grade_aulas,
+    dias_semana,
+    bloqueios_globais,
+    materias_para_agrupar=None,
+    mapa_aulas_vagas=None,
+    tempo_limite=45,
+    num_workers=8,
+    log_progresso=False,
+    parar=None,
+    publicar=None,
+    gap_aceitavel=None,
+    formulacao="booleana",
+    solucao_anterior=None,
+    peso_mudanca=0,
+    quebrar_simetria=False,
+    restricoes_redundantes=False,
+    janelas="span",
+    estagnacao=None,
+    configuracoes=None,
+    rodadas=1
+):
+    # Roda o mesmo modelo com várias configurações do CP-SAT, cada uma no
+    # seu processo, e fica com o melhor horário. Com rodadas > 1 o tempo é
+    # dividido e, entre uma rodada e outra, o melhor horário até ali vira
+    # dica para todas as configurações (o CP-SAT não troca soluções entre
+    # processos durante a busca).
+    # Devolve a tupla de resolver_horario mais uma linha de estatísticas
+    # por configuração.
+    inicio = time.perf_counter()
+    if configuracoes is None:
+        configuracoes = configuracoes_portfolio(max(1, min(num_workers, len(CONFIGURACOES_PORTFOLIO))))
+    workers_por_config = max(1, num_workers // len(configuracoes))
+    entrada = (turmas_totais, grade_aulas, dias_semana, bloqueios_globais)
+    opcoes_modelo = dict(
+        materias_para_agrupar=materias_para_agrupar,
+        mapa_aulas_vagas=mapa_aulas_vagas,
+        formulacao=formulacao,
+        solucao_anterior=solucao_anterior,
+        peso_mudanca=peso_mudanca,
+        quebrar_simetria=quebrar_simetria,
+        restricoes_redundantes=restricoes_redundantes,
+        janelas=janelas
+    )
+
+    estatisticas = [
+        {
+            "Configuração": config["nome"],
+            "Parâmetros": ", ".join(f"{k}={v}" for k, v in config["parametros"].items()),
+            "Status": None,
+            "Custo": None,
+            "Limite": None,
+            "1ª Solução (s)": None,
+            "Soluções": 0,
+            "Rodadas vencidas": 0
+        }
+        for config in configuracoes
+    ]
+    melhor = None  # (custo, resultados, auditoria)
+    melhor_limite = None
+    melhor_publicado = None
+    publicadas = 0
+
+    contexto = multiprocessing.get_context("spawn")
+    with contexto.Manager() as manager, \
+            ProcessPoolExecutor(max_workers=len(configuracoes), mp_context=contexto) as executor:
+        parar_filhos = manager.Event()
+        for rodada in range(rodadas):
+            restante = tempo_limite - (time.perf_counter() - inicio)
+            if restante <= 0.5 or parar_filhos.is_set():
+                break
+            # Prazo absoluto (relógio de parede, que vale entre processos)
+            prazo = time.time() + restante / (rodadas - rodada)
+            eventos = manager.list()
+            # Encerra a rodada assim que alguma configuração provar o ótimo
+            fim_rodada = manager.Event()
+            dica = melhor[1] if melhor else solucao_anterior
+            futures = [
+                executor.submit(_resolver_configuracao, i, entrada, opcoes_modelo, dica,
+                                config["parametros"], prazo, workers_por_config,
+                                gap_aceitavel, estagnacao, fim_rodada, eventos)
+                for i, config in enumerate(configuracoes)
+            ]
+
+            lidos = 0
+            pendentes = set(futures)
+            while pendentes:
+                prontos, pendentes = wait(pendentes, timeout=0.5, return_when=FIRST_COMPLETED)
+                if parar is not None and parar.is_set():
+                    parar_filhos.set()
+                    fim_rodada.set()
+                # Configuração que falhou (exceção no filho) conta como sem solução
+                if any(f.exception() is None and f.result()[1]["status_solver"] == "OPTIMAL" for f in prontos):
+                    fim_rodada.set()
+                novos = eventos[lidos:]
+                lidos += len(novos)
+                for indice, evento in novos:
+                    if melhor_limite is None or evento["limite"] > melhor_limite:
+                        melhor_limite = evento["limite"]
+                    if melhor_publicado is not None and evento["objetivo"] >= melhor_publicado:
+                        continue
+                    melhor_publicado = evento["objetivo"]
+                    publicadas += 1
+                    if publicar is not None:
+                        publicar({
+                            "solucao": publicadas,
+                            "tempo": round(time.perf_counter() - inicio, 3),
+                            "objetivo": evento["objetivo"],
+                            "limite": melhor_limite,
+                            "gap": round(calcular_gap(evento["objetivo"], melhor_limite), 4),
+                            "configuracao": configuracoes[indice]["nome"],
+                            "penalidades": evento["penalidades"]
+                        })
+
+            vencedor = None
+            for i, future in enumerate(futures):
+                linha = estatisticas[i]
+                if future.exception() is not None:
+                    logger.warning("Configuração %s falhou: %s", configuracoes[i]["nome"], future.exception())
+                    linha["Status"] = "FALHOU"
+                    continue
+                (status, resultados, custo, auditoria), e = future.result()
+                linha["Status"] = e["status_solver"]
+                linha["Soluções"] += e["solucoes"]
+                if rodada == 0:
+                    # Nas rodadas seguintes todas já partem da dica
+                    linha["1ª Solução (s)"] = e["tempo_primeira_solucao"]
+                if status != "OK":
+                    continue
+                if linha["Custo"] is None or custo < linha["Custo"]:
+                    linha["Custo"] = custo
+                if linha["Limite"] is None or e["limite"] > linha["Limite"]:
+                    linha["Limite"] = e["limite"]
+                if melhor_limite is None or e["limite"] > melhor_limite:
+                    melhor_limite = e["limite"]
+                if vencedor is None or custo < vencedor[0]:
+                    vencedor = (custo, resultados, auditoria, i)
+
+            if vencedor is not None:
+                estatisticas[vencedor[3]]["Rodadas vencidas"] += 1
+                if melhor is None or vencedor[0] < melhor[0]:
+                    melhor = vencedor[:3]
+                logger.info("Rodada %d: melhor custo %.0f (%s), limite %s", rodada + 1, melhor[0],
+                            configuracoes[vencedor[3]]["nome"], melhor_limite)
+            # Alguém provou o ótimo (o limite alcançou o custo): acabou
+            if melhor is not None and melhor[0] <= melhor_limite:
+                break
+
+    if melhor is None:
+        return "ERRO", {}, 0, [], estatisticas
+    return "OK", melhor[1], melhor[0], melhor[2], estatisticas
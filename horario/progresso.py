@@ -0,0 +1,54 @@
+import json
+import logging
+import time
+from collections import defaultdict
+
+from ortools.sat.python import cp_model
+
+
+logger = logging.getLogger("horario.progresso")
+
+
+def calcular_gap(objetivo, limite):
+    # Gap relativo entre a melhor solução e o limite inferior provado
+    if objetivo == 0:
+        return 0.0
+    return max(0.0, (objetivo - limite) / abs(objetivo))
+
+
+class CallbackProgresso(cp_model.CpSolverSolutionCallback):
+    # Chamado pelo CP-SAT a cada solução melhor encontrada. Monta um evento
+    # com objetivo, limite, gap, tempo e custo por tipo de penalidade, grava
+    # no log estruturado e repassa para 'publicar' (ex: lista do Manager
+    # lida pela tela).
+    def __init__(self, detalhes_audit, publicar=None):
+        super().__init__()
+        self.detalhes_audit = detalhes_audit
+        self.publicar = publicar
+        self.eventos = []
+        # Relógio da última solução melhor, para a parada por estagnação
+        self.ultima_melhora = time.perf_counter()
+
+    def on_solution_callback(self):
+        objetivo = self.ObjectiveValue()
+        limite = self.BestObjectiveBound()
+
+        penalidades = defaultdict(int)
+        for item in self.detalhes_audit:
+            val = self.Value(item['var'])
+            if val > 0:
+                penalidades[item['tipo']] += val * item['peso']
+
+        evento = {
+            "solucao": len(self.eventos) + 1,
+            "tempo": round(self.WallTime(), 3),
+            "objetivo": objetivo,
+            "limite": limite,
+            "gap": round(calcular_gap(objetivo, limite), 4),
+            "penalidades": dict(penalidades)
+        }
+        self.eventos.append(evento)
+        self.ultima_melhora = time.perf_counter()
+        logger.info(json.dumps(evento, ensure_ascii=False))
+        if self.publicar is not None:
+            self.publicar(evento)
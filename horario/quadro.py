@@ -0,0 +1,55 @@
+import hashlib
+import json
+from collections import defaultdict
+
+
+# ==========================================
+# HORÁRIO INDEXADO (para telas e exportação)
+# ==========================================
+class QuadroHorario:
+    # O horário resolvido ({(turma, d, a, prof, materia): 1}) indexado uma
+    # vez por turma e por professor, para as telas e os relatórios
+    # consultarem cada célula direto em vez de varrer a grade inteira.
+    def __init__(self, vars_resolvidas):
+        # por_turma[turma][(d, a)] = (prof, materia)
+        self.por_turma = defaultdict(dict)
+        # por_prof[prof][(d, a)] = (turma, materia)
+        self.por_prof = defaultdict(dict)
+        for (turma, d, a, prof, materia), valor in vars_resolvidas.items():
+            if valor != 1:
+                continue
+            self.por_turma[turma][(d, a)] = (prof, materia)
+            self.por_prof[prof][(d, a)] = (turma, materia)
+
+    def aula_turma(self, turma, d, a):
+        # (prof, materia) ou None se o horário está vago
+        return self.por_turma.get(turma, {}).get((d, a))
+
+    def aula_prof(self, prof, d, a):
+        # (turma, materia) ou None se o professor está livre
+        return self.por_prof.get(prof, {}).get((d, a))
+
+    def aulas_prof_por_dia(self, prof, n_dias):
+        contagem = [0] * n_dias
+        for d, _ in self.por_prof.get(prof, {}):
+            contagem[d] += 1
+        return contagem
+
+
+def indexar_horario(horario):
+    # Aceita o dict de vars resolvidas ou um QuadroHorario já montado
+    if isinstance(horario, QuadroHorario):
+        return horario
+    return QuadroHorario(horario)
+
+def assinatura_horario(turmas_totais, grade_aulas, dias_semana, vars_resolvidas):
+    # SHA-256 do horário resolvido e das entradas que aparecem nos relatórios.
+    # Mesma assinatura = mesmas telas, PDF e planilhas (chave dos caches do app).
+    conteudo = {
+        "turmas": sorted(turmas_totais.items()),
+        "grade": sorted((i['turma'], i['prof'], i['materia'], i['qtd']) for i in grade_aulas),
+        "dias": list(dias_semana),
+        "aulas": sorted(k for k, v in vars_resolvidas.items() if v == 1)
+    }
+    texto = json.dumps(conteudo, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
@@ -0,0 +1,98 @@
+import io
+import random
+
+import pandas as pd
+
+from .dados import DIAS_SEMANA
+
+
+# Currículo base de uma turma de 25 aulas semanais
+MATERIAS_PADRAO = [
+    ("Português", 5), ("Matemática", 5), ("Ciências", 3), ("História", 2),
+    ("Geografia", 2), ("Inglês", 2), ("Artes", 2), ("Ed. Física", 2),
+    ("Redação", 1), ("Ensino Religioso", 1)
+]
+
+
+def _curriculo(aulas_semana, n_materias=None):
+    # Escala o currículo padrão (ou as n_materias primeiras) para o total de
+    # aulas da turma; a sobra (positiva ou negativa) do arredondamento vai
+    # para Português
+    materias = MATERIAS_PADRAO[:n_materias] if n_materias else MATERIAS_PADRAO
+    base = sum(qtd for _, qtd in materias)
+    curriculo = [(mat, max(1, round(qtd * aulas_semana / base))) for mat, qtd in materias]
+    sobra = aulas_semana - sum(qtd for _, qtd in curriculo)
+    mat, qtd = curriculo[0]
+    curriculo[0] = (mat, max(1, qtd + sobra))
+    return curriculo
+
+def gerar_escola(
+    n_turmas=10,
+    aulas_por_dia=5,
+    carga_max_prof=20,
+    densidade_indisponibilidade=0.0,
+    semente=0,
+    n_materias=None
+):
+    # Gera uma escola no mesmo formato de carregar_dados:
+    # (turmas_totais, grade_aulas, dias_semana, bloqueios_globais).
+    # Cada matéria tem professores suficientes para que ninguém passe de
+    # carga_max_prof; a indisponibilidade sorteada nunca tira a folga do prof.
+    rng = random.Random(semente)
+    dias_semana = list(DIAS_SEMANA)
+    slots_semana = aulas_por_dia * len(dias_semana)
+
+    turmas_totais = {f"Turma {i + 1:03d}": slots_semana for i in range(n_turmas)}
+    lista_turmas = list(turmas_totais)
+
+    grade_aulas = []
+    carga_prof = {}
+    for materia, qtd in _curriculo(slots_semana, n_materias):
+        turmas_por_prof = max(1, carga_max_prof // qtd)
+        for i, turma in enumerate(lista_turmas):
+            prof = f"{materia} {i // turmas_por_prof + 1}"
+            grade_aulas.append({'prof': prof, 'materia': materia, 'turma': turma, 'qtd': qtd})
+            carga_prof[prof] = carga_prof.get(prof, 0) + qtd
+
+    todos_slots = [(d, a) for d in range(len(dias_semana)) for a in range(aulas_por_dia)]
+    bloqueios_globais = {}
+    for prof, carga in carga_prof.items():
+        folga = slots_semana - carga
+        qtd_bloqueios = min(int(densidade_indisponibilidade * slots_semana), max(0, folga - 2))
+        bloqueios_globais[prof] = set(rng.sample(todos_slots, qtd_bloqueios))
+
+    return turmas_totais, grade_aulas, dias_semana, bloqueios_globais
+
+def gerar_planilha_rede(n_linhas=10000, n_turmas=None, semente=0):
+    # Planilha no formato de gerar_modelo_exemplo com n_linhas na aba
+    # Grade_Curricular, no estilo de uma rede inteira: nomes com "Prof.",
+    # várias turmas por linha, professores repetidos e indisponibilidades
+    # variadas. Serve para medir a leitura (ver 'python -m horario medir-leitura').
+    rng = random.Random(semente)
+    n_turmas = n_turmas or max(1, n_linhas // 4)
+    turmas = [f"Turma {i + 1:05d}" for i in range(n_turmas)]
+    n_profs = max(1, n_linhas // 3)
+    prefixos = ["Prof. ", "Profª ", "Profa ", "", "prof. "]
+    dias = ["seg", "ter", "qua", "qui", "sex", "Segunda", "TER"]
+
+    linhas = []
+    for _ in range(n_linhas):
+        prof = f"{rng.choice(prefixos)}Professor {rng.randrange(n_profs):05d} "
+        materia, _ = rng.choice(MATERIAS_PADRAO)
+        alvo = ", ".join(rng.sample(turmas, min(len(turmas), rng.randint(1, 3))))
+        sorteio = rng.random()
+        if sorteio < 0.5:
+            indisp = ""
+        elif sorteio < 0.7:
+            indisp = rng.choice(dias)
+        else:
+            indisp = "; ".join(f"{rng.choice(dias)}:{rng.randint(1, 6)}" for _ in range(rng.randint(1, 4)))
+        linhas.append([prof, materia, alvo, rng.randint(1, 5), indisp])
+
+    df_t = pd.DataFrame({'Turma': turmas, 'Aulas_Semanais': [25] * n_turmas})
+    df_g = pd.DataFrame(linhas, columns=['Professor', 'Materia', 'Turmas_Alvo', 'Aulas_Por_Turma', 'Indisponibilidade'])
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        df_t.to_excel(writer, sheet_name='Turmas', index=False)
+        df_g.to_excel(writer, sheet_name='Grade_Curricular', index=False)
+    return output.getvalue()
@@ -0,0 +1,312 @@
+import threading
+import time
+
+from ortools.sat.python import cp_model
+
+from .modelo import (
+    aplicar_dicas,
+    construir_modelo,
+    estagios_lexicograficos,
+    ler_solucao,
+    liberar_dominios,
+    restringir_dominios,
+)
+from .progresso import CallbackProgresso, calcular_gap
+
+
+# "ponderado": uma soma só com os pesos de modelo.py (o original)
+# "lexicografico": uma família de penalidade por vez, da mais pesada para a
+#                  mais leve, cada uma travada no valor alcançado antes da próxima
+OBJETIVOS = ("ponderado", "lexicografico")
+
+
+# ==========================================
+# MOTOR DE OTIMIZAÇÃO (SOLVER)
+# ==========================================
+def _vigiar_parada(solver, terminou, parar=None, callback=None, estagnacao=None, motivo=None):
+    # 'parar' pode ser um threading.Event ou um Event do multiprocessing.Manager.
+    # Com 'estagnacao' (segundos), também para se o custo não melhora há
+    # esse tempo desde a última solução.
+    while not terminou.is_set():
+        if parar is not None and parar.is_set():
+            motivo.append("pedido")
+            solver.StopSearch()
+            return
+        if estagnacao and callback.eventos and time.perf_counter() - callback.ultima_melhora > estagnacao:
+            motivo.append("estagnacao")
+            solver.StopSearch()
+            return
+        terminou.wait(0.2)
+
+def aplicar_parametros(solver, parametros):
+    # {"linearization_level": 2, "search_branching": "PSEUDO_COST_SEARCH"}:
+    # enums vêm pelo nome para o dict poder ir para outro processo ou JSON
+    for nome, valor in (parametros or {}).items():
+        if isinstance(valor, str):
+            valor = getattr(type(solver.parameters), valor)
+        setattr(solver.parameters, nome, valor)
+
+def resolver_modelo(
+    m,
+    tempo_limite=45,
+    num_workers=8,
+    log_progresso=True,
+    parar=None,
+    publicar=None,
+    gap_aceitavel=None,
+    primeira_solucao=False,
+    parametros_solver=None,
+    estagnacao=None
+):
+    solver = cp_model.CpSolver()
+    # De 45 para 300 segundos (5 minutos) ou até 600 (10 minutos)
+    solver.parameters.max_time_in_seconds = tempo_limite
+    # Se estiver rodando no seu PC, 8 é bom. Na nuvem grátis, deixe 4 ou 8 mesmo
+    solver.parameters.num_search_workers = num_workers
+    # Linearização ajuda em problemas de agendamento
+    solver.parameters.linearization_level = 0
+    # DICA PRO: Habilite o log para ver o progresso no terminal (tela preta)
+    solver.parameters.log_search_progress = log_progresso
+    # Ex: 0.02 aceita qualquer solução a menos de 2% do limite inferior
+    if gap_aceitavel:
+        solver.parameters.relative_gap_limit = gap_aceitavel
+    # Só quer um ponto de partida (ex: a solução inicial do LNS)
+    if primeira_solucao:
+        solver.parameters.stop_after_first_solution = True
+    # Sobrescreve os ajustes acima (ex: configurações do portfólio)
+    aplicar_parametros(solver, parametros_solver)
+
+    callback = CallbackProgresso(m.detalhes_audit, publicar=publicar)
+
+    vigia = None
+    terminou = threading.Event()
+    motivo = []
+    if parar is not None or estagnacao:
+        vigia = threading.Thread(
+            target=_vigiar_parada,
+            args=(solver, terminou, parar, callback, estagnacao, motivo),
+            daemon=True
+        )
+        vigia.start()
+    try:
+        status = solver.Solve(m.model, callback)
+    finally:
+        terminou.set()
+        if vigia is not None:
+            vigia.join()
+
+    encontrou = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    m.estatisticas.update({
+        "status_solver": solver.StatusName(status),
+        "tempo_solver": solver.WallTime(),
+        "tempo_primeira_solucao": callback.eventos[0]["tempo"] if callback.eventos else None,
+        "solucoes": len(callback.eventos),
+        "objetivo": solver.ObjectiveValue() if encontrou else None,
+        "limite": solver.BestObjectiveBound() if encontrou else None,
+        # None quando parou sozinho (ótimo, gap ou tempo)
+        "parada": motivo[0] if motivo else None
+    })
+
+    auditoria = []
+
+    if encontrou:
+        resultados = ler_solucao(m, solver.Value)
+
+        for item in m.detalhes_audit:
+            try:
+                val = solver.Value(item['var'])
+                if val > 0:
+                    auditoria.append({
+                        "Tipo": item["tipo"],
+                        "Descrição": item["desc"],
+                        "Custo": val * item["peso"]
+                    })
+            except: pass
+
+        return "OK", resultados, solver.ObjectiveValue(), auditoria
+
+    return "ERRO", {}, 0, []
+
+def _custo_do_horario(m, resposta, tempo_limite, num_workers, parametros_solver, parar=None):
+    # Custo ponderado e auditoria de um horário pronto. As folgas das
+    # famílias que não foram minimizadas (estágios pulados por tempo,
+    # parada ou estagnação) valem qualquer coisa na solução do estágio;
+    # com o horário fixo nos domínios, uma busca curta as leva ao mínimo.
+    # Roda no que sobrou do tempo (no máximo 10s) e respeita 'parar'; sem
+    # resposta a tempo, fica a do último estágio.
+    # resolver_modelo sobrescreve as estatísticas: as do lexicográfico ficam
+    estatisticas = dict(m.estatisticas)
+    restringir_dominios(m, resposta[1], lambda key: True)
+    aplicar_dicas(m, resposta[1])
+    try:
+        avaliacao = resolver_modelo(m, tempo_limite=min(10, max(0.1, tempo_limite)), num_workers=num_workers,
+                                    log_progresso=False, parar=parar, parametros_solver=parametros_solver)
+    finally:
+        liberar_dominios(m)
+        m.estatisticas.update(estatisticas)
+    return avaliacao if avaliacao[0] == "OK" else resposta
+
+def resolver_lexicografico(
+    m,
+    tempo_limite=45,
+    num_workers=8,
+    log_progresso=True,
+    parar=None,
+    publicar=None,
+    gap_aceitavel=None,
+    parametros_solver=None,
+    estagnacao=None
+):
+    # Mesmo contrato de resolver_modelo. Cada estágio minimiza só uma família
+    # (ver estagios_lexicograficos); o valor alcançado vira restrição (<=) e
+    # a solução vira dica para o estágio seguinte. Cada trava só vale com um
+    # literal fixado em 1 no domínio; no fim eles vão a 0, então o mesmo
+    # modelo pode ser resolvido de novo sem as travas.
+    # Os eventos publicados trazem o estágio em andamento e um custo parcial:
+    # só as famílias já travadas e a atual (as outras ainda não foram
+    # minimizadas e suas variáveis de folga valem qualquer coisa).
+    inicio = time.perf_counter()
+    model = m.model
+    estagios = estagios_lexicograficos(m)
+    resposta = ("ERRO", {}, 0, [])
+    relatorio = []
+    primeira_solucao = None
+    publicados = []
+    # Soma dos limites provados dos estágios já fechados: nenhuma solução
+    # que respeite as travas custa menos que isso nessas famílias
+    limite_fechados = 0
+    travas = []
+
+    for i, (tipo, itens) in enumerate(estagios):
+        restante = tempo_limite - (time.perf_counter() - inicio)
+        if restante <= 0.1 or (parar is not None and parar.is_set()):
+            break
+        termos = sum(item["var"] * item["peso"] for item in itens)
+        model.Minimize(termos)
+
+        def publicar_estagio(evento, tipo=tipo, base=limite_fechados, tipos=[t for t, _ in estagios[:i + 1]]):
+            # Numeração e tempo contínuos entre os estágios
+            publicados.append(evento)
+            penalidades = {t: c for t, c in evento["penalidades"].items() if t in tipos}
+            total = sum(penalidades.values())
+            limite = base + evento["limite"]
+            publicar(dict(evento, solucao=len(publicados), tempo=round(time.perf_counter() - inicio, 3),
+                          objetivo=total, limite=limite, gap=round(calcular_gap(total, limite), 4),
+                          penalidades=penalidades, estagio=tipo, parcial=i + 1 < len(estagios)))
+
+        # Estágios provados ótimos devolvem o tempo que sobrou; o atual fica
+        # com tudo menos uma reserva de 10% do total para cada um dos seguintes
+        seguintes = len(estagios) - i - 1
+        tempo_estagio = max(restante / (seguintes + 1), restante - 0.1 * tempo_limite * seguintes)
+
+        status, resultados, _, auditoria = resolver_modelo(
+            m,
+            tempo_limite=tempo_estagio,
+            num_workers=num_workers,
+            log_progresso=log_progresso,
+            parar=parar,
+            publicar=publicar_estagio if publicar is not None else None,
+            gap_aceitavel=gap_aceitavel,
+            parametros_solver=parametros_solver,
+            estagnacao=estagnacao
+        )
+        e = m.estatisticas
+        if i == 0:
+            primeira_solucao = e["tempo_primeira_solucao"]
+        relatorio.append({
+            "estagio": tipo,
+            "status_solver": e["status_solver"],
+            "objetivo": e["objetivo"],
+            "limite": e["limite"],
+            "tempo_solver": e["tempo_solver"],
+            "solucoes": e["solucoes"]
+        })
+        if status != "OK":
+            # Sem solução no estágio: fica a do estágio anterior (se houver)
+            break
+        resposta = (status, resultados, float(sum(linha["Custo"] for linha in auditoria)), auditoria)
+        trava = m.nova_bool("trava_{}", tipo)
+        model.Add(termos <= int(round(e["objetivo"]))).OnlyEnforceIf(trava)
+        model.Proto().variables[trava.Index()].domain[0] = 1
+        travas.append(trava)
+        limite_fechados += e["limite"]
+        aplicar_dicas(m, resultados)
+
+    # Devolve o objetivo ponderado ao modelo e solta as travas
+    if m.termos_custo:
+        model.Minimize(sum(m.termos_custo))
+    for trava in travas:
+        dominio = model.Proto().variables[trava.Index()].domain
+        dominio[0] = dominio[1] = 0
+    if resposta[0] == "OK":
+        restante = tempo_limite - (time.perf_counter() - inicio)
+        resposta = _custo_do_horario(m, resposta, restante, num_workers, parametros_solver, parar)
+    m.estatisticas.update({
+        "estagios": relatorio,
+        "tempo_solver": sum(r["tempo_solver"] for r in relatorio),
+        "tempo_primeira_solucao": primeira_solucao,
+        "objetivo": resposta[2] if resposta[0] == "OK" else None,
+        "limite": limite_fechados if resposta[0] == "OK" else None
+    })
+    if relatorio:
+        m.estatisticas["status_solver"] = relatorio[-1]["status_solver"]
+    else:
+        # Nenhum estágio rodou (já pediram para parar ou não havia tempo)
+        m.estatisticas.update({
+            "status_solver": "UNKNOWN",
+            "solucoes": 0,
+            "parada": "pedido" if parar is not None and parar.is_set() else None
+        })
+    return resposta
+
+def resolver_horario(
+    turmas_totais,
+    grade_aulas,
+    dias_semana,
+    bloqueios_globais,
+    materias_para_agrupar=None,
+    mapa_aulas_vagas=None,
+    tempo_limite=45,
+    num_workers=8,
+    log_progresso=True,
+    parar=None,
+    publicar=None,
+    gap_aceitavel=None,
+    formulacao="booleana",
+    solucao_anterior=None,
+    peso_mudanca=0,
+    quebrar_simetria=False,
+    restricoes_redundantes=False,
+    janelas="span",
+    parametros_solver=None,
+    estagnacao=None,
+    objetivo="ponderado"
+):
+    if objetivo not in OBJETIVOS:
+        raise ValueError(f"Objetivo desconhecido: {objetivo} (use {', '.join(OBJETIVOS)})")
+    m = construir_modelo(
+        turmas_totais,
+        grade_aulas,
+        dias_semana,
+        bloqueios_globais,
+        materias_para_agrupar=materias_para_agrupar,
+        mapa_aulas_vagas=mapa_aulas_vagas,
+        formulacao=formulacao,
+        solucao_anterior=solucao_anterior,
+        peso_mudanca=peso_mudanca,
+        quebrar_simetria=quebrar_simetria,
+        restricoes_redundantes=restricoes_redundantes,
+        janelas=janelas
+    )
+    resolver = resolver_lexicografico if objetivo == "lexicografico" else resolver_modelo
+    return resolver(
+        m,
+        tempo_limite=tempo_limite,
+        num_workers=num_workers,
+        log_progresso=log_progresso,
+        parar=parar,
+        publicar=publicar,
+        gap_aceitavel=gap_aceitavel,
+        parametros_solver=parametros_solver,
+        estagnacao=estagnacao
+    )